@@ -0,0 +1,155 @@
+from __future__ import annotations
+from datetime import date, datetime
+from typing import Any, Iterable
+from sqlalchemy.orm import Session
+
+from .db import dialect_insert
+from .models import Rota, ShiftType, Staff, RotaEntry
+from . import oncall, live
+
+# Rows per executemany batch
+UPSERT_CHUNK = 500
+
+
+def _parse_item(item: Any) -> dict:
+    """
+    Coerce one raw assignment into typed values. Raises ValueError with a
+    user-facing message on bad input.
+    """
+    if not isinstance(item, dict):
+        raise ValueError("entry must be an object")
+
+    try:
+        rota_id = int(item["rota_id"])
+        shift_type_id = int(item["shift_type_id"])
+    except KeyError as e:
+        raise ValueError(f"missing {e.args[0]}")
+    except (TypeError, ValueError):
+        raise ValueError("rota_id and shift_type_id must be integers")
+
+    raw_date = item.get("shift_date")
+    if isinstance(raw_date, date):
+        shift_date = raw_date
+    else:
+        try:
+            shift_date = datetime.strptime(str(raw_date), "%Y-%m-%d").date()
+        except ValueError:
+            raise ValueError("shift_date must be YYYY-MM-DD")
+
+    raw_staff = item.get("staff_id")
+    if raw_staff in (None, ""):
+        staff_id = None
+    else:
+        try:
+            staff_id = int(raw_staff)
+        except (TypeError, ValueError):
+            raise ValueError("staff_id must be an integer or empty")
+
+    notes = item.get("notes")
+    if notes is not None:
+        notes = str(notes).strip() or None
+
+    return {
+        "rota_id": rota_id,
+        "shift_date": shift_date,
+        "shift_type_id": shift_type_id,
+        "staff_id": staff_id,
+        "notes": notes,
+    }
+
+
+def validate_assignments(db: Session, items: list[Any]) -> tuple[list[dict], list[dict]]:
+    """
+    Validate raw assignment dicts against the database.
+
+    Returns (rows, results): `rows` are the typed values ready for
+    upsert_assignments, `results` has one {"index", "ok", "error"} entry
+    per input item. Reference data is loaded with one query per table for
+    the whole batch.
+    """
+    parsed: list[dict | None] = []
+    results: list[dict] = []
+    for i, item in enumerate(items):
+        try:
+            parsed.append(_parse_item(item))
+            results.append({"index": i, "ok": True, "error": None})
+        except ValueError as e:
+            parsed.append(None)
+            results.append({"index": i, "ok": False, "error": str(e)})
+
+    good = [p for p in parsed if p]
+    rota_ids = {p["rota_id"] for p in good}
+    shift_type_ids = {p["shift_type_id"] for p in good}
+    staff_ids = {p["staff_id"] for p in good if p["staff_id"] is not None}
+
+    known_rotas = (
+        {r for (r,) in db.query(Rota.id).filter(Rota.id.in_(rota_ids))}
+        if rota_ids else set()
+    )
+    shift_type_rota = (
+        dict(db.query(ShiftType.id, ShiftType.rota_id).filter(ShiftType.id.in_(shift_type_ids)))
+        if shift_type_ids else {}
+    )
+    known_staff = (
+        {s for (s,) in db.query(Staff.id).filter(Staff.id.in_(staff_ids))}
+        if staff_ids else set()
+    )
+
+    # Later items win when the same cell appears more than once; the
+    # earlier one is reported as not saved
+    rows: dict[tuple[int, date, int], tuple[dict, dict]] = {}
+    for p, result in zip(parsed, results):
+        if p is None:
+            continue
+        if p["rota_id"] not in known_rotas:
+            error = "unknown rota"
+        elif shift_type_rota.get(p["shift_type_id"]) != p["rota_id"]:
+            error = "shift type does not belong to rota"
+        elif p["staff_id"] is not None and p["staff_id"] not in known_staff:
+            error = "unknown staff member"
+        else:
+            key = (p["rota_id"], p["shift_date"], p["shift_type_id"])
+            if key in rows:
+                earlier = rows[key][1]
+                earlier["ok"] = False
+                earlier["error"] = f"superseded by item {result['index']}"
+            rows[key] = (p, result)
+            continue
+        result["ok"] = False
+        result["error"] = error
+
+    return [p for p, _ in rows.values()], results
+
+
+def upsert_assignments(db: Session, rows: Iterable[dict]) -> int:
+    """
+    Write assignments with INSERT ... ON CONFLICT DO UPDATE against
+    uq_rota_date_shift_type (SQLite and PostgreSQL share the syntax).
+    Does not commit; the caller owns the transaction so a whole batch
+    lands (or fails) together.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+
+    # One statement compiled once and run as an executemany per chunk;
+    # building a multi-row VALUES clause instead costs more to compile
+    # than to execute.
+    stmt = dialect_insert(db)(RotaEntry.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["rota_id", "shift_date", "shift_type_id"],
+        set_={
+            "staff_id": stmt.excluded.staff_id,
+            "notes": stmt.excluded.notes,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    conn = db.connection()
+    now = datetime.utcnow()
+    for i in range(0, len(rows), UPSERT_CHUNK):
+        conn.execute(stmt, [{**r, "updated_at": now} for r in rows[i:i + UPSERT_CHUNK]])
+    # Patched into the on-call map, and announced to open rota pages,
+    # once the caller commits
+    oncall.mark_changed(db, rows)
+    live.record_assignments(db, rows)
+    return len(rows)
@@ -1,18 +1,53 @@
 from __future__ import annotations
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Optional
 from fastapi import Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from itsdangerous import URLSafeSerializer
+import hashlib
 import os
+import secrets
+import threading
+import time
 
+from .db import SessionLocal
 from .models import User
+from . import refdata
 
 SESSION_KEY = "session"
 
+
+@lru_cache(maxsize=1)
 def _serializer() -> URLSafeSerializer:
     secret = os.getenv("APP_SESSION_SECRET", "dev-only-change-me")
     return URLSafeSerializer(secret_key=secret, salt="oncall-rota")
 
+@lru_cache(maxsize=1)
+def _feed_serializer() -> URLSafeSerializer:
+    secret = os.getenv("APP_SESSION_SECRET", "dev-only-change-me")
+    return URLSafeSerializer(secret_key=secret, salt="calendar-feed")
+
+def sign_feed(user: User | CachedUser, kind: str, item_id: int) -> str:
+    """
+    Token for a calendar feed URL made for `user`; calendar apps cannot
+    sign in. It carries the user's feed_version, so bumping that (or
+    deactivating the user) revokes every link they were given.
+    """
+    return _feed_serializer().dumps([kind, item_id, user.id, user.feed_version])
+
+def feed_token_valid(db: Session, token: str, kind: str, item_id: int) -> bool:
+    try:
+        data = _feed_serializer().loads(token)
+    except Exception:
+        return False
+    if not isinstance(data, list) or len(data) != 4 or data[:2] != [kind, item_id]:
+        return False
+    user = _load_user(db, data[2]) if isinstance(data[2], int) else None
+    return user is not None and user.feed_version == data[3]
+
 def sign_session(data: dict) -> str:
     return _serializer().dumps(data)
 
@@ -22,20 +57,164 @@ def unsign_session(token: str) -> dict | None:
     except Exception:
         return None
 
-def get_current_user(request: Request, db: Session) -> Optional[User]:
-    token = request.cookies.get("oncall_session")
-    if not token:
-        return None
-    data = unsign_session(token)
-    if not data:
+
+# -------------------------------------------------
+# User cache
+# -------------------------------------------------
+
+class CachedUser:
+    """
+    Read-only snapshot of an active User, safe to share between requests
+    and threads (a live ORM object is tied to the session that loaded it).
+    """
+
+    __slots__ = ("id", "email", "role", "active", "staff_id", "favourite_rotas", "feed_version")
+
+    def __init__(self, user: User):
+        self.id = user.id
+        self.email = user.email
+        self.role = user.role
+        self.active = user.active
+        self.staff_id = user.staff_id
+        self.favourite_rotas = list(user.favourite_rotas or [])
+        self.feed_version = user.feed_version
+
+
+def get_auth_cache_ttl() -> float:
+    # Seconds a resolved user is trusted before re-reading the users table.
+    # 0 disables the cache. Other workers see /users edits within this TTL.
+    return float(os.getenv("APP_AUTH_CACHE_TTL", "60"))
+
+
+AUTH_CACHE_SIZE = 1024
+
+_user_cache: OrderedDict[int, tuple[float, CachedUser]] = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+
+def invalidate_user(user_id: int | None = None) -> None:
+    """Drop one cached user (or all of them) after a /users change."""
+    with _user_cache_lock:
+        if user_id is None:
+            _user_cache.clear()
+        else:
+            _user_cache.pop(user_id, None)
+
+
+def _cache_get(user_id: int) -> CachedUser | None:
+    if get_auth_cache_ttl() <= 0:
         return None
-    user_id = data.get("user_id")
-    if not user_id:
+    with _user_cache_lock:
+        hit = _user_cache.get(user_id)
+        if hit and hit[0] > time.monotonic():
+            _user_cache.move_to_end(user_id)
+            return hit[1]
+    return None
+
+
+def _cache_put(user_id: int, user: User | None) -> CachedUser | None:
+    if not user:
+        invalidate_user(user_id)
         return None
-    user = db.query(User).filter(User.id == int(user_id), User.active == True).first()
+
+    cached = CachedUser(user)
+    ttl = get_auth_cache_ttl()
+    if ttl > 0:
+        with _user_cache_lock:
+            _user_cache[user_id] = (time.monotonic() + ttl, cached)
+            _user_cache.move_to_end(user_id)
+            while len(_user_cache) > AUTH_CACHE_SIZE:
+                _user_cache.popitem(last=False)
+    return cached
+
+
+def _session_user_id(request: Request) -> int | None:
+    token = request.cookies.get("oncall_session")
+    data = unsign_session(token) if token else None
+    user_id = data.get("user_id") if data else None
+    return int(user_id) if user_id else None
+
+
+def _load_user(db: Session, user_id: int) -> CachedUser | None:
+    cached = _cache_get(user_id)
+    if cached:
+        return cached
+    user = db.query(User).filter(User.id == user_id, User.active == True).first()
+    return _cache_put(user_id, user)
+
+
+def get_current_user(request: Request, db: Session | None = None) -> Optional[CachedUser]:
+    # Resolved at most once per request, however many times it is asked
+    if hasattr(request.state, "current_user"):
+        return request.state.current_user
+
+    user = None
+    user_id = _session_user_id(request)
+    if user_id:
+        if db is None:
+            db = SessionLocal()
+            try:
+                user = _load_user(db, user_id)
+            finally:
+                db.close()
+        else:
+            user = _load_user(db, user_id)
+
+    request.state.current_user = user
+    return user
+
+
+async def get_current_user_async(request: Request, db: AsyncSession) -> Optional[CachedUser]:
+    """get_current_user for handlers running on the async engine."""
+    if hasattr(request.state, "current_user"):
+        return request.state.current_user
+
+    user = None
+    user_id = _session_user_id(request)
+    if user_id:
+        user = _cache_get(user_id)
+        if not user:
+            result = await db.execute(
+                select(User).where(User.id == user_id, User.active == True)
+            )
+            user = _cache_put(user_id, result.scalars().first())
+
+    request.state.current_user = user
     return user
 
-def require_role(user: User | None, roles: set[str]) -> bool:
+
+def current_user(request: Request) -> Optional[CachedUser]:
+    """FastAPI dependency form of get_current_user."""
+    return get_current_user(request)
+
+
+def require_role(user: User | CachedUser | None, roles: set[str]) -> bool:
     if not user:
         return False
     return user.role in roles
+
+
+# -------------------------------------------------
+# API tokens
+# -------------------------------------------------
+
+def hash_api_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def new_api_token() -> tuple[str, str]:
+    """A fresh token and the hash to store for it."""
+    token = secrets.token_urlsafe(32)
+    return token, hash_api_token(token)
+
+
+def api_token_valid(request: Request, db: Session) -> bool:
+    """
+    Check `Authorization: Bearer <token>` against the active API tokens.
+    No cookie or user lookup: the hashes come from the reference-data cache.
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    token = token.strip()
+    if scheme.lower() != "bearer" or not token:
+        return False
+    return hash_api_token(token) in refdata.api_token_hashes(db)
@@ -0,0 +1,357 @@
+from __future__ import annotations
+import heapq
+import uuid
+from datetime import date, datetime, timedelta
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+
+from .models import AutoscheduleJob, RotaEntry
+from . import refdata
+from .availability import Availability, load_availability
+from .assignments import upsert_assignments
+
+
+def _clashes(busy: set[date], day: date, min_rest_days: int) -> bool:
+    """True if `day`, or a day within `min_rest_days` of it, is in `busy`."""
+    if day in busy:
+        return True
+    for gap in range(1, min_rest_days + 1):
+        if day - timedelta(days=gap) in busy or day + timedelta(days=gap) in busy:
+            return True
+    return False
+
+
+class AutoScheduler:
+    """
+    Fill empty rota cells while keeping shift counts level across staff.
+
+    Constraints: nobody works two shifts on one day (across all rotas),
+    nobody works within `min_rest_days` of another shift, and nobody is
+    given a shift while on time off.
+
+    Cells are filled in date order from a min-heap keyed on
+    (load, last shift day, staff id), so each pick is O(log staff) plus
+    whatever ineligible staff have to be skipped. A local search then
+    moves shifts from the most to the least loaded staff until no move
+    narrows the gap.
+    """
+
+    def __init__(
+        self,
+        rota_id: int,
+        cells: list[tuple[date, int]],
+        staff_ids: list[int],
+        busy: dict[int, set[date]],
+        load: dict[int, int],
+        unavailable: Availability,
+        min_rest_days: int = 0,
+    ):
+        self.rota_id = rota_id
+        self.cells = sorted(cells)
+        self.staff_ids = list(staff_ids)
+        self.busy = {sid: set(busy.get(sid, ())) for sid in self.staff_ids}
+        self.load = {sid: load.get(sid, 0) for sid in self.staff_ids}
+        self.unavailable = unavailable
+        self.min_rest_days = max(0, min_rest_days)
+        self.assigned: dict[tuple[date, int], int] = {}
+
+    def _eligible(self, sid: int, day: date) -> bool:
+        if self.unavailable.is_off(sid, day):
+            return False
+        return not _clashes(self.busy[sid], day, self.min_rest_days)
+
+    def _greedy(self) -> None:
+        heap = [(self.load[sid], 0, sid) for sid in self.staff_ids]
+        heapq.heapify(heap)
+
+        for day, st_id in self.cells:
+            skipped = []
+            chosen = None
+            while heap:
+                item = heapq.heappop(heap)
+                if self._eligible(item[2], day):
+                    chosen = item
+                    break
+                skipped.append(item)
+
+            if chosen is not None:
+                sid = chosen[2]
+                self.assigned[(day, st_id)] = sid
+                self.busy[sid].add(day)
+                self.load[sid] += 1
+                heapq.heappush(heap, (self.load[sid], day.toordinal(), sid))
+
+            for item in skipped:
+                heapq.heappush(heap, item)
+
+    def _rebalance(self, max_moves: int) -> None:
+        by_staff: dict[int, list[tuple[date, int]]] = {sid: [] for sid in self.staff_ids}
+        for cell, sid in self.assigned.items():
+            by_staff[sid].append(cell)
+
+        for _ in range(max_moves):
+            order = sorted(self.staff_ids, key=self.load.__getitem__)
+            moved = False
+            for hi in reversed(order):
+                for lo in order:
+                    if self.load[hi] - self.load[lo] <= 1:
+                        break
+                    for cell in by_staff[hi]:
+                        if self._eligible(lo, cell[0]):
+                            by_staff[hi].remove(cell)
+                            by_staff[lo].append(cell)
+                            self.busy[hi].discard(cell[0])
+                            self.busy[lo].add(cell[0])
+                            self.load[hi] -= 1
+                            self.load[lo] += 1
+                            self.assigned[cell] = lo
+                            moved = True
+                            break
+                    if moved:
+                        break
+                if moved or self.load[hi] - self.load[order[0]] <= 1:
+                    break
+            if not moved:
+                break
+
+    def solve(self, max_moves: int = 10_000) -> list[dict]:
+        if self.staff_ids:
+            self._greedy()
+            self._rebalance(max_moves)
+        return [
+            {
+                "rota_id": self.rota_id,
+                "shift_date": day,
+                "shift_type_id": st_id,
+                "staff_id": sid,
+                "notes": None,
+            }
+            for (day, st_id), sid in sorted(self.assigned.items())
+        ]
+
+    @property
+    def unfilled(self) -> list[tuple[date, int]]:
+        return [c for c in self.cells if c not in self.assigned]
+
+
+def _filled_cells(db: Session, rota_id: int, start: date, end: date) -> set[tuple[date, int]]:
+    return {
+        (d, st_id)
+        for d, st_id in db.query(RotaEntry.shift_date, RotaEntry.shift_type_id).filter(
+            RotaEntry.rota_id == rota_id,
+            RotaEntry.shift_date.between(start, end),
+            RotaEntry.staff_id.isnot(None),
+        )
+    }
+
+
+def plan_autoschedule(
+    db: Session,
+    rota_id: int,
+    start: date,
+    end: date,
+    min_rest_days: int = 0,
+) -> dict:
+    """
+    Work out assignments for every empty cell of `rota_id` in [start, end]
+    without writing anything. Returns {"rows", "unfilled", "loads"}.
+    """
+    shift_type_ids = [st.id for st in refdata.active_shift_types(db, rota_id)]
+    staff_ids = [s.id for s in refdata.active_staff(db)]
+
+    # Existing shifts on any rota block the day (and the rest window);
+    # only this rota's shifts in the span count towards load.
+    busy: dict[int, set[date]] = {}
+    load: dict[int, int] = {}
+    window_start = start - timedelta(days=min_rest_days)
+    window_end = end + timedelta(days=min_rest_days)
+    for sid, d, rid in db.query(RotaEntry.staff_id, RotaEntry.shift_date, RotaEntry.rota_id).filter(
+        RotaEntry.shift_date.between(window_start, window_end),
+        RotaEntry.staff_id.isnot(None),
+    ):
+        busy.setdefault(sid, set()).add(d)
+        if rid == rota_id and start <= d <= end:
+            load[sid] = load.get(sid, 0) + 1
+
+    filled = _filled_cells(db, rota_id, start, end)
+    cells = [
+        (start + timedelta(days=i), st_id)
+        for i in range((end - start).days + 1)
+        for st_id in shift_type_ids
+        if (start + timedelta(days=i), st_id) not in filled
+    ]
+
+    scheduler = AutoScheduler(
+        rota_id,
+        cells,
+        staff_ids,
+        busy,
+        load,
+        load_availability(db, start, end),
+        min_rest_days=min_rest_days,
+    )
+    rows = scheduler.solve()
+    return {"rows": rows, "unfilled": scheduler.unfilled, "loads": scheduler.load}
+
+
+def apply_autoschedule(db: Session, rota_id: int, rows: list[dict], min_rest_days: int = 0) -> int:
+    """
+    Write a previewed plan; does not commit. The plan's rules are checked
+    again against the database as it is now, since cells, time off and
+    other rotas may have changed since the preview: rows for cells filled
+    since, for staff now on leave or inactive, or that would give someone
+    a second shift that day (or one inside the rest window) are skipped.
+    """
+    if not rows:
+        return 0
+    start = min(r["shift_date"] for r in rows)
+    end = max(r["shift_date"] for r in rows)
+    filled = _filled_cells(db, rota_id, start, end)
+    staff_ids = {r["staff_id"] for r in rows}
+    active = refdata.active_staff_by_id(db)
+    unavailable = load_availability(db, start, end, staff_ids=staff_ids)
+
+    busy: dict[int, set[date]] = {}
+    for sid, d in db.query(RotaEntry.staff_id, RotaEntry.shift_date).filter(
+        RotaEntry.staff_id.in_(staff_ids),
+        RotaEntry.shift_date.between(
+            start - timedelta(days=min_rest_days), end + timedelta(days=min_rest_days)
+        ),
+    ):
+        busy.setdefault(sid, set()).add(d)
+
+    # Rows of one plan never clash with each other, only with what has
+    # been written since
+    rows = [
+        r
+        for r in rows
+        if (r["shift_date"], r["shift_type_id"]) not in filled
+        and r["staff_id"] in active
+        and not unavailable.is_off(r["staff_id"], r["shift_date"])
+        and not _clashes(busy.get(r["staff_id"], set()), r["shift_date"], min_rest_days)
+    ]
+    return upsert_assignments(db, rows)
+
+
+# -------------------------------------------------
+# Background jobs
+# -------------------------------------------------
+
+# Jobs older than this are deleted when a new one is created
+JOB_MAX_AGE = timedelta(days=1)
+# A job still pending or running after this long lost its worker (killed
+# or restarted mid-plan) and is reported as failed, so it can be rerun
+JOB_TIMEOUT = timedelta(minutes=10)
+
+
+def _plan_to_json(plan: dict) -> dict:
+    return {
+        "rows": [
+            {**r, "shift_date": r["shift_date"].isoformat()}
+            for r in plan["rows"]
+        ],
+        "unfilled": [[d.isoformat(), st_id] for d, st_id in plan["unfilled"]],
+        "loads": {str(sid): n for sid, n in plan["loads"].items()},
+    }
+
+
+def _plan_from_json(data: dict) -> dict:
+    return {
+        "rows": [
+            {**r, "shift_date": date.fromisoformat(r["shift_date"])}
+            for r in data["rows"]
+        ],
+        "unfilled": [(date.fromisoformat(d), st_id) for d, st_id in data["unfilled"]],
+        "loads": {int(sid): n for sid, n in data["loads"].items()},
+    }
+
+
+def create_job(db: Session, rota_id: int, start: date, end: date, min_rest_days: int) -> str:
+    """Record a pending run and return its id. Commits."""
+    db.execute(delete(AutoscheduleJob).where(AutoscheduleJob.created_at < datetime.utcnow() - JOB_MAX_AGE))
+    job = AutoscheduleJob(
+        id=uuid.uuid4().hex,
+        status="pending",
+        rota_id=rota_id,
+        start_date=start,
+        end_date=end,
+        min_rest_days=min_rest_days,
+    )
+    db.add(job)
+    db.commit()
+    return job.id
+
+
+def get_job(db: Session, job_id: str) -> dict | None:
+    job = db.get(AutoscheduleJob, job_id)
+    if job is None:
+        return None
+    status, error = job.status, job.error
+    if status in ("pending", "running"):
+        since = job.started_at or job.created_at
+        if since < datetime.utcnow() - JOB_TIMEOUT:
+            status = "failed"
+            minutes = int(JOB_TIMEOUT.total_seconds() // 60)
+            error = f"not finished after {minutes} minutes (the server may have restarted)"
+    return {
+        "id": job.id,
+        "status": status,
+        "rota_id": job.rota_id,
+        "start": job.start_date,
+        "end": job.end_date,
+        "min_rest_days": job.min_rest_days,
+        "result": _plan_from_json(job.plan) if job.plan else None,
+        "error": error,
+        "applied": job.applied,
+    }
+
+
+def run_job(job_id: str, session_factory) -> None:
+    """Compute the plan for a job in its own session; meant for a background task."""
+    db = session_factory()
+    try:
+        job = db.get(AutoscheduleJob, job_id)
+        if job is None:
+            return
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        db.commit()
+        try:
+            plan = plan_autoschedule(
+                db,
+                job.rota_id,
+                job.start_date,
+                job.end_date,
+                min_rest_days=job.min_rest_days,
+            )
+            job.plan = _plan_to_json(plan)
+            job.status = "ready"
+        except Exception as e:
+            db.rollback()
+            job.error = str(e)
+            job.status = "failed"
+        db.commit()
+    finally:
+        db.close()
+
+
+def apply_job(db: Session, job_id: str) -> None:
+    """
+    Apply a ready job's plan, once. The job is claimed with a conditional
+    UPDATE in the same transaction as the writes, so a repeated or
+    concurrent apply (on any worker) finds it taken and does nothing.
+    """
+    job = get_job(db, job_id)
+    if job is None or job["status"] != "ready" or job["applied"] is not None:
+        return
+    claimed = db.execute(
+        update(AutoscheduleJob)
+        .where(AutoscheduleJob.id == job_id, AutoscheduleJob.applied.is_(None))
+        .values(applied=0)
+    ).rowcount
+    if not claimed:
+        db.rollback()
+        return
+    written = apply_autoschedule(db, job["rota_id"], job["result"]["rows"], job["min_rest_days"])
+    db.execute(update(AutoscheduleJob).where(AutoscheduleJob.id == job_id).values(applied=written))
+    db.commit()
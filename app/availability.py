@@ -0,0 +1,94 @@
+from __future__ import annotations
+from bisect import bisect_right
+from datetime import date, timedelta
+from typing import Iterable
+from sqlalchemy.orm import Session
+
+from .models import TimeOff
+
+
+class Availability:
+    """
+    Interval index over time off.
+
+    Each staff member's TimeOff rows are merged into a sorted list of
+    non-overlapping (start, end) intervals, so lookups are a bisect per
+    staff member instead of a walk over every day of every absence.
+
+    Supports `(staff_id, day) in availability` so it can stand in for the
+    old `unavailable` set in templates.
+    """
+
+    def __init__(self, rows: Iterable[tuple[int, date, date]] = ()):
+        grouped: dict[int, list[tuple[date, date]]] = {}
+        for staff_id, start, end in rows:
+            if end < start:
+                start, end = end, start
+            grouped.setdefault(staff_id, []).append((start, end))
+
+        self._starts: dict[int, list[date]] = {}
+        self._ends: dict[int, list[date]] = {}
+        for staff_id, intervals in grouped.items():
+            intervals.sort()
+            starts: list[date] = []
+            ends: list[date] = []
+            for start, end in intervals:
+                # Merge overlapping or touching intervals
+                if ends and start <= ends[-1] + timedelta(days=1):
+                    if end > ends[-1]:
+                        ends[-1] = end
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            self._starts[staff_id] = starts
+            self._ends[staff_id] = ends
+
+    def __contains__(self, key: tuple[int, date]) -> bool:
+        staff_id, day = key
+        return self.is_off(staff_id, day)
+
+    def intervals(self, staff_id: int) -> list[tuple[date, date]]:
+        return list(zip(self._starts.get(staff_id, ()), self._ends.get(staff_id, ())))
+
+    def is_off(self, staff_id: int | None, day: date) -> bool:
+        if staff_id is None:
+            return False
+        starts = self._starts.get(staff_id)
+        if not starts:
+            return False
+        i = bisect_right(starts, day) - 1
+        return i >= 0 and self._ends[staff_id][i] >= day
+
+    def is_off_between(self, staff_id: int, start: date, end: date) -> bool:
+        starts = self._starts.get(staff_id)
+        if not starts:
+            return False
+        # Last interval starting on/before `end` is the only candidate,
+        # since merged intervals are disjoint and sorted.
+        i = bisect_right(starts, end) - 1
+        return i >= 0 and self._ends[staff_id][i] >= start
+
+    def off_on(self, day: date) -> set[int]:
+        return {sid for sid in self._starts if self.is_off(sid, day)}
+
+    def off_between(self, start: date, end: date) -> set[int]:
+        return {sid for sid in self._starts if self.is_off_between(sid, start, end)}
+
+
+def load_availability(
+    db: Session,
+    start: date,
+    end: date,
+    staff_ids: Iterable[int] | None = None,
+) -> Availability:
+    """
+    Build an Availability index for every TimeOff overlapping [start, end].
+    Only the three columns needed are selected; no ORM objects are loaded.
+    """
+    q = db.query(TimeOff.staff_id, TimeOff.start_date, TimeOff.end_date).filter(
+        TimeOff.start_date <= end,
+        TimeOff.end_date >= start,
+    )
+    if staff_ids is not None:
+        q = q.filter(TimeOff.staff_id.in_(list(staff_ids)))
+    return Availability(q.all())
@@ -0,0 +1,263 @@
+"""
+Rota problems over a date range, across every active rota:
+
+  time_off       someone is on a shift on a day they are on leave
+  double_booked  someone has two or more shifts on one day, on any rotas
+                 (the rule the auto-scheduler keeps)
+  unstaffed      an active shift type has nobody on it that day
+
+Each kind is found by the database with one set-based query (a join of
+rota_entries with time_off, a GROUP BY over the date/staff index, and a
+calendar of days crossed with the active shift types, anti-joined to the
+staffed entries), rather than by loading entries and looping over them.
+Everything is counted, but only the first `limit` of each kind (by date)
+are listed. Names come from the reference-data cache.
+"""
+from __future__ import annotations
+from datetime import date, timedelta
+
+from sqlalchemy import Date, and_, case, func, literal, select, true, union_all
+from sqlalchemy.orm import Session
+
+from .models import Rota, ShiftType, RotaEntry, TimeOff
+from . import refdata
+
+KINDS = ("time_off", "double_booked", "unstaffed")
+
+# Items listed per kind; the rest are only counted
+MAX_ITEMS = 500
+# Longest range one report covers
+MAX_DAYS = 366
+
+
+class ConflictReport:
+    __slots__ = ("first", "last", "rota_id", "counts", "items", "unstaffed_by_shift", "limit")
+
+    def __init__(self, first: date, last: date, rota_id: int | None, limit: int):
+        self.first = first
+        self.last = last
+        self.rota_id = rota_id
+        self.limit = limit
+        self.counts: dict[str, int] = dict.fromkeys(KINDS, 0)
+        self.items: dict[str, list[dict]] = {kind: [] for kind in KINDS}
+        # One row per shift type with any unstaffed days
+        self.unstaffed_by_shift: list[dict] = []
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def as_dict(self) -> dict:
+        def plain(item: dict) -> dict:
+            return {k: v.isoformat() if isinstance(v, date) else v for k, v in item.items()}
+
+        return {
+            "start": self.first.isoformat(),
+            "end": self.last.isoformat(),
+            "rota_id": self.rota_id,
+            "counts": self.counts,
+            "limit": self.limit,
+            **{kind: [plain(i) for i in self.items[kind]] for kind in KINDS},
+            "unstaffed_by_shift": [plain(i) for i in self.unstaffed_by_shift],
+        }
+
+
+def _days(first: date, last: date, postgres: bool):
+    """Every date in [first, last], as a recursive CTE with one column, d."""
+    days = select(literal(first, Date).label("d")).cte("days", recursive=True)
+    if postgres:
+        step = days.c.d + 1
+    else:
+        # SQLite stores dates as ISO text
+        step = func.date(days.c.d, "+1 day")
+    return days.union_all(select(step).where(days.c.d < last))
+
+
+def find_conflicts(
+    db: Session,
+    first: date,
+    last: date,
+    rota_id: int | None = None,
+    limit: int = MAX_ITEMS,
+) -> ConflictReport:
+    """
+    Conflicts on active rotas (or just `rota_id`) over [first, last]; the
+    range is cut to MAX_DAYS.
+    """
+    if last < first:
+        first, last = last, first
+    last = min(last, first + timedelta(days=MAX_DAYS - 1))
+    report = ConflictReport(first, last, rota_id, limit)
+    rotas = {r.id: r for r in refdata.active_rotas(db)}
+    rota_ids = [rota_id] if rota_id is not None else list(rotas)
+    rota_ids = [rid for rid in rota_ids if rid in rotas]
+    if not rota_ids:
+        return report
+
+    shift_types = refdata.shift_types_by_id(db)
+    staff = refdata.staff_by_id(db)
+
+    def names(item: dict) -> dict:
+        st = shift_types.get(item["shift_type_id"])
+        item["rota"] = rotas[item["rota_id"]].name if item["rota_id"] in rotas else None
+        item["shift_type"] = st.name if st else None
+        if "staff_id" in item:
+            person = staff.get(item["staff_id"])
+            item["staff"] = person.full_name if person else None
+        return item
+
+    e = RotaEntry.__table__
+    postgres = db.get_bind().dialect.name == "postgresql"
+
+    # ---- TIME OFF ----
+    # Driven from the (short) list of leave overlapping the range, each
+    # probing one person's entries by (staff_id, shift_date). Bounding
+    # shift_date by the leave clipped to the range, rather than by the
+    # range and the leave separately, is what gets that plan; otherwise
+    # SQLite walks every entry in the range looking for leave. The rota
+    # filter is written as rota_id + 0 so it cannot be used as an index
+    # (otherwise SQLite drives from entries by rota).
+    t = TimeOff.__table__
+    greatest, least = (func.greatest, func.least) if postgres else (func.max, func.min)
+    rows = db.execute(
+        select(
+            e.c.rota_id,
+            e.c.shift_date,
+            e.c.shift_type_id,
+            e.c.staff_id,
+            t.c.start_date,
+            t.c.end_date,
+            t.c.reason,
+            func.count().over().label("total"),
+        )
+        .select_from(
+            t.join(
+                e,
+                and_(
+                    e.c.staff_id == t.c.staff_id,
+                    e.c.shift_date >= greatest(t.c.start_date, first),
+                    e.c.shift_date <= least(t.c.end_date, last),
+                ),
+            )
+        )
+        .where(t.c.end_date >= first, t.c.start_date <= last, (e.c.rota_id + 0).in_(rota_ids))
+        .order_by(e.c.shift_date, e.c.rota_id, e.c.shift_type_id)
+        .limit(limit)
+    ).all()
+    if rows:
+        report.counts["time_off"] = rows[0].total
+    report.items["time_off"] = [
+        names(
+            {
+                "date": r.shift_date,
+                "rota_id": r.rota_id,
+                "shift_type_id": r.shift_type_id,
+                "staff_id": r.staff_id,
+                "time_off_start": r.start_date,
+                "time_off_end": r.end_date,
+                "reason": r.reason,
+            }
+        )
+        for r in rows
+    ]
+
+    # ---- DOUBLE BOOKINGS ----
+    # Grouped straight off the (shift_date, staff_id, rota_id) index (the
+    # rota filter again kept off the rota index). With
+    # a rota filter the other rotas still count, as long as one of the
+    # shifts is on it.
+    busy = (
+        select(e.c.shift_date, e.c.staff_id, func.count().over().label("total"))
+        .where(
+            e.c.shift_date >= first,
+            e.c.shift_date <= last,
+            e.c.staff_id.is_not(None),
+            (e.c.rota_id + 0).in_(list(rotas)),
+        )
+        .group_by(e.c.shift_date, e.c.staff_id)
+        .having(func.count() > 1)
+    )
+    if rota_id is not None:
+        busy = busy.having(func.max(case((e.c.rota_id == rota_id, 1), else_=0)) == 1)
+    busy = busy.order_by(e.c.shift_date, e.c.staff_id).limit(limit).subquery()
+    rows = db.execute(
+        select(busy.c.shift_date, busy.c.staff_id, busy.c.total, e.c.rota_id, e.c.shift_type_id)
+        .join(e, and_(e.c.shift_date == busy.c.shift_date, e.c.staff_id == busy.c.staff_id))
+        .where(e.c.rota_id.in_(list(rotas)))
+    ).all()
+    # At most `limit` groups; sorted here rather than in the join
+    rows.sort(key=lambda r: (r.shift_date, r.staff_id, r.rota_id, r.shift_type_id))
+    if rows:
+        report.counts["double_booked"] = rows[0].total
+    doubles: dict[tuple[date, int], dict] = {}
+    for r in rows:
+        item = doubles.get((r.shift_date, r.staff_id))
+        if item is None:
+            person = staff.get(r.staff_id)
+            item = doubles[(r.shift_date, r.staff_id)] = {
+                "date": r.shift_date,
+                "staff_id": r.staff_id,
+                "staff": person.full_name if person else None,
+                "shifts": [],
+            }
+        item["shifts"].append(names({"rota_id": r.rota_id, "shift_type_id": r.shift_type_id}))
+    report.items["double_booked"] = list(doubles.values())
+
+    # ---- UNSTAFFED ----
+    # Every (day, active shift type) with no staffed entry; each probe is
+    # a lookup on the (rota_id, shift_date, shift_type_id) unique index.
+    # The gaps are found once (a CTE used twice is materialised by SQLite
+    # and PostgreSQL alike) and read both for the per-shift summary and
+    # for the first `limit` by date.
+    days = _days(first, last, postgres)
+    st = ShiftType.__table__
+    r_ = Rota.__table__
+    staffed = (
+        select(e.c.id)
+        .where(
+            e.c.rota_id == st.c.rota_id,
+            e.c.shift_date == days.c.d,
+            e.c.shift_type_id == st.c.id,
+            e.c.staff_id.is_not(None),
+        )
+        .exists()
+    )
+    gaps = (
+        select(days.c.d, st.c.rota_id, st.c.id.label("shift_type_id"))
+        .select_from(days.join(st, true()).join(r_, r_.c.id == st.c.rota_id))
+        .where(st.c.active, r_.c.active, st.c.rota_id.in_(rota_ids), ~staffed)
+        .cte("gaps")
+    )
+    summary = select(
+        literal(False).label("listed"),
+        gaps.c.rota_id,
+        gaps.c.shift_type_id,
+        func.count().label("days"),
+        func.min(gaps.c.d).label("first"),
+        func.max(gaps.c.d).label("last"),
+    ).group_by(gaps.c.rota_id, gaps.c.shift_type_id)
+    listed = (
+        select(literal(True), gaps.c.rota_id, gaps.c.shift_type_id, literal(1), gaps.c.d, gaps.c.d)
+        .order_by(gaps.c.d, gaps.c.rota_id, gaps.c.shift_type_id)
+        .limit(limit)
+        .subquery()
+    )
+    by_shift = []
+    for r in db.execute(union_all(summary, select(listed))):
+        item = names({"rota_id": r.rota_id, "shift_type_id": r.shift_type_id})
+        if r.listed:
+            item["date"] = _as_date(r.first)
+            report.items["unstaffed"].append(item)
+        else:
+            item.update(days=r.days, first=_as_date(r.first), last=_as_date(r.last))
+            by_shift.append(item)
+    report.items["unstaffed"].sort(key=lambda i: (i["date"], i["rota_id"], i["shift_type_id"]))
+    report.unstaffed_by_shift = sorted(by_shift, key=lambda i: (i["rota"] or "", i["shift_type"] or ""))
+    report.counts["unstaffed"] = sum(i["days"] for i in by_shift)
+
+    return report
+
+
+def _as_date(value) -> date:
+    # min()/max() over the SQLite calendar come back as text
+    return value if isinstance(value, date) else date.fromisoformat(value)
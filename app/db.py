@@ -1,29 +1,157 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
 
 def get_db_path() -> str:
     return os.getenv("APP_DB_PATH", "app.db")
 
 def get_db_url() -> str:
+    # Full SQLAlchemy URL (e.g. postgresql+psycopg://...) wins over the
     # SQLite file path
+    url = os.getenv("APP_DB_URL")
+    if url:
+        return url
     path = get_db_path()
     return f"sqlite:///{path}"
 
-engine = create_engine(
-    get_db_url(),
-    connect_args={"check_same_thread": False},
-    pool_pre_ping=True,
-)
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def get_pool_options() -> dict:
+    """QueuePool sizing for client/server databases such as PostgreSQL."""
+    return {
+        "pool_size": int(os.getenv("APP_DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("APP_DB_MAX_OVERFLOW", "10")),
+        "pool_recycle": int(os.getenv("APP_DB_POOL_RECYCLE", "1800")),
+        "pool_timeout": int(os.getenv("APP_DB_POOL_TIMEOUT", "30")),
+        "pool_pre_ping": os.getenv("APP_DB_POOL_PRE_PING", "0") == "1",
+    }
+
+def get_sqlite_pragmas() -> dict[str, str]:
+    """
+    PRAGMAs applied to every new SQLite connection. WAL lets readers carry
+    on while one writer commits; busy_timeout makes writers queue for the
+    lock instead of failing with "database is locked".
+    """
+    return {
+        "journal_mode": os.getenv("APP_SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.getenv("APP_SQLITE_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": os.getenv("APP_SQLITE_BUSY_TIMEOUT_MS", "15000"),
+        "mmap_size": os.getenv("APP_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+        # Negative values are KiB rather than pages
+        "cache_size": os.getenv("APP_SQLITE_CACHE_SIZE", "-65536"),
+    }
+
+def _attach_sqlite_pragmas(eng: Engine, pragmas: dict[str, str]) -> None:
+    @event.listens_for(eng, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, connection_record):
+        cur = dbapi_conn.cursor()
+        try:
+            for name, value in pragmas.items():
+                if value != "":
+                    cur.execute(f"PRAGMA {name}={value}")
+        finally:
+            cur.close()
+
+def create_app_engine(url: str | None = None, **kwargs) -> Engine:
+    url = url or get_db_url()
+
+    if not is_sqlite(url):
+        if "poolclass" not in kwargs:
+            kwargs = {**get_pool_options(), **kwargs}
+        return create_engine(url, **kwargs)
+
+    pragmas = get_sqlite_pragmas()
+    busy_ms = int(pragmas["busy_timeout"] or 0)
+
+    connect_args = {"check_same_thread": False, "timeout": busy_ms / 1000}
+    connect_args.update(kwargs.pop("connect_args", {}))
+    eng = create_engine(url, connect_args=connect_args, **kwargs)
+    _attach_sqlite_pragmas(eng, pragmas)
+    return eng
+
+def get_async_db_url(url: str | None = None) -> str:
+    """
+    Async driver for the configured database: aiosqlite for SQLite, and
+    psycopg (which SQLAlchemy drives natively under asyncio) for PostgreSQL.
+    """
+    url = url or get_db_url()
+    scheme, rest = url.split(":", 1)
+    if scheme in ("sqlite", "sqlite+pysqlite"):
+        return "sqlite+aiosqlite:" + rest
+    if scheme in ("postgresql", "postgres", "postgresql+psycopg2"):
+        return "postgresql+psycopg:" + rest
+    return url
+
+def create_app_async_engine(url: str | None = None, **kwargs) -> AsyncEngine:
+    url = get_async_db_url(url)
+
+    if "poolclass" not in kwargs:
+        kwargs = {**get_pool_options(), **kwargs}
+
+    if not is_sqlite(url):
+        return create_async_engine(url, **kwargs)
+
+    # aiosqlite would otherwise get a NullPool and open a fresh connection
+    # (plus its worker thread) per session
+    kwargs.setdefault("poolclass", AsyncAdaptedQueuePool)
+    pragmas = get_sqlite_pragmas()
+    busy_ms = int(pragmas["busy_timeout"] or 0)
+    connect_args = {"check_same_thread": False, "timeout": busy_ms / 1000}
+    connect_args.update(kwargs.pop("connect_args", {}))
+    eng = create_async_engine(url, connect_args=connect_args, **kwargs)
+    _attach_sqlite_pragmas(eng.sync_engine, pragmas)
+    return eng
+
+engine = create_app_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the read-heavy pages; created on first use so sync-only
+# tools and scripts never need the async driver installed.
+_async_engine: AsyncEngine | None = None
+_AsyncSessionLocal: async_sessionmaker[AsyncSession] | None = None
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        _async_engine = create_app_async_engine()
+        _AsyncSessionLocal = async_sessionmaker(
+            _async_engine, autoflush=False, expire_on_commit=False
+        )
+    return _async_engine
+
 class Base(DeclarativeBase):
     pass
 
+def dialect_insert(db: Session):
+    """
+    The dialect's INSERT construct, which provides on_conflict_do_update()
+    on both SQLite and PostgreSQL.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
 def get_session():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def dispose_async_engine() -> None:
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _AsyncSessionLocal = None
+
+async def get_async_session():
+    get_async_engine()
+    async with _AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,216 @@
+"""
+Conditional GETs for the read-mostly pages, and long-lived caching for
+static assets.
+
+Pages: the ETag is a hash of the data the page is drawn from (the newest
+rota entry and entry count for the span, the time off overlapping it,
+refdata_versions), plus who is asking and today's date. Computing it is
+a few indexed aggregate queries, so a refresh of an unchanged page is
+answered with 304 Not Modified without loading the grid or rendering.
+Responses carry `Cache-Control: private, no-cache`: browsers keep the
+page but revalidate every time, so edits still show up straight away.
+
+Static: static_url() (a template global) puts a hash of the file's
+content into its name, e.g. /static/app.3b5d0c1e9f2a.css.
+FingerprintedStaticFiles strips the hash again when serving and marks
+such responses immutable for a year; a changed file gets a new name.
+"""
+from __future__ import annotations
+import hashlib
+import os
+import re
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+from fastapi.staticfiles import StaticFiles
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .models import RotaEntry, TimeOff, RefDataVersion
+from . import refdata
+from .version import APP_VERSION, APP_BUILD
+
+PAGE_CACHE_CONTROL = "private, no-cache"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+STATIC_CACHE_CONTROL = "no-cache"
+
+# name.<12 hex digits>.ext, as produced by static_url()
+_FINGERPRINT = re.compile(r"^(?P<stem>.+)\.(?P<hash>[0-9a-f]{12})(?P<ext>\.[^./]+)$")
+
+
+def is_etag_enabled() -> bool:
+    return os.getenv("APP_ETAGS", "1") != "0"
+
+
+# -------------------------------------------------
+# Page ETags
+# -------------------------------------------------
+
+def data_version(db: Session, rota_id: int | None = None, first_day=None, last_day=None) -> tuple:
+    """
+    A value that changes whenever the data behind a rota page does:
+    reference data always, and rota entries and time off within
+    [first_day, last_day] when a rota is given.
+
+    Entries are only ever upserted (which bumps updated_at) and time off
+    only added or deleted (which moves the count or the highest id), so
+    aggregates are enough; no row data is read.
+    """
+    versions = tuple(
+        db.execute(
+            select(RefDataVersion.kind, RefDataVersion.version)
+            .where(RefDataVersion.kind.in_(refdata.KINDS))
+            .order_by(RefDataVersion.kind)
+        )
+    )
+    if rota_id is None:
+        return versions
+
+    entries = db.execute(
+        select(func.max(RotaEntry.updated_at), func.count()).where(
+            RotaEntry.rota_id == rota_id,
+            RotaEntry.shift_date.between(first_day, last_day),
+        )
+    ).one()
+    time_off = db.execute(
+        select(func.max(TimeOff.id), func.count()).where(
+            TimeOff.end_date >= first_day,
+            TimeOff.start_date <= last_day,
+        )
+    ).one()
+    return versions, tuple(entries), tuple(time_off)
+
+
+def etag_for(*parts) -> str:
+    """Weak ETag over the repr of `parts`."""
+    return 'W/"' + hashlib.sha1(repr(parts).encode()).hexdigest()[:24] + '"'
+
+
+def make_etag(request: Request, user, *parts) -> str:
+    """Page ETag over `parts` plus everything the layout shows."""
+    state = request.app.state
+    latest = getattr(state, "latest_version", None) or {}
+    return etag_for(
+        APP_VERSION,
+        APP_BUILD,
+        getattr(state, "update_available", False),
+        latest.get("tag"),
+        user.id,
+        user.email,
+        user.role,
+        # The layout and rota pages link to feeds signed with these
+        user.staff_id,
+        user.feed_version,
+        parts,
+    )
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/ prefixes are ignored
+    tag = etag.removeprefix("W/")
+    return any(t.strip().removeprefix("W/") == tag for t in if_none_match.split(","))
+
+
+def http_date(dt: datetime) -> str:
+    """Format a naive UTC datetime for Last-Modified."""
+    return format_datetime(dt.replace(microsecond=0, tzinfo=timezone.utc), usegmt=True)
+
+
+def _not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def not_modified(request: Request, etag: str, last_modified: datetime | None = None) -> Response | None:
+    """
+    A 304 response if the client already has `etag`, else None.
+    If-Modified-Since is only consulted when there is no If-None-Match
+    and `last_modified` is given.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        fresh = _matches(if_none_match, etag)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        fresh = bool(last_modified and if_modified_since and _not_modified_since(if_modified_since, last_modified))
+    if fresh:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": PAGE_CACHE_CONTROL})
+    return None
+
+
+def set_etag(response: Response, etag: str, last_modified: datetime | None = None) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = PAGE_CACHE_CONTROL
+    if last_modified:
+        response.headers["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+# -------------------------------------------------
+# Static assets
+# -------------------------------------------------
+
+_fingerprints: dict[str, tuple[int, int, str]] = {}
+
+
+def _fingerprint(full_path: str) -> str | None:
+    try:
+        st = os.stat(full_path)
+    except OSError:
+        return None
+    cached = _fingerprints.get(full_path)
+    if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2]
+    h = hashlib.sha1()
+    with open(full_path, "rb") as f:
+        for block in iter(lambda: f.read(64 * 1024), b""):
+            h.update(block)
+    digest = h.hexdigest()[:12]
+    _fingerprints[full_path] = (st.st_mtime_ns, st.st_size, digest)
+    return digest
+
+
+def make_static_url(directory: str, prefix: str = "/static"):
+    """Build the static_url(path) template global for files in `directory`."""
+
+    def static_url(path: str) -> str:
+        path = path.lstrip("/")
+        digest = _fingerprint(os.path.join(directory, path))
+        if digest is None:
+            return f"{prefix}/{path}"
+        stem, ext = os.path.splitext(path)
+        return f"{prefix}/{stem}.{digest}{ext}"
+
+    return static_url
+
+
+class FingerprintedStaticFiles(StaticFiles):
+    """
+    StaticFiles that also serves name.<hash>.ext as name.ext. Fingerprinted
+    URLs are cached for a year; plain ones (e.g. fonts referenced from CSS)
+    are revalidated with the ETag StaticFiles already sends.
+    """
+
+    async def get_response(self, path: str, scope) -> Response:
+        match = _FINGERPRINT.match(path)
+        immutable = False
+        if match:
+            real = match["stem"] + match["ext"]
+            full_path, stat_result = self.lookup_path(real)
+            if stat_result is not None:
+                # Only trust the hash if it is the current one; an old URL
+                # still gets the file, just not cached forever
+                immutable = _fingerprint(full_path) == match["hash"]
+                path = real
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if immutable else STATIC_CACHE_CONTROL
+        return response
@@ -0,0 +1,91 @@
+"""
+Minimal iCalendar (RFC 5545) writer for the rota feeds.
+
+Generator based: calendar() yields the document an event at a time as the
+events iterator is consumed, so a feed with years of history never exists
+in memory as a whole.
+"""
+from __future__ import annotations
+from datetime import date, datetime, timedelta
+from typing import Iterable, Iterator
+
+PRODID = "-//On Call Tracker//Rota feed//EN"
+# Content lines are limited to 75 octets, excluding the CRLF
+MAX_LINE = 75
+
+
+def escape_text(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold(line: str) -> str:
+    """Fold a content line at 75 octets, without splitting a UTF-8 character."""
+    if len(line) <= MAX_LINE and line.isascii():
+        return line + "\r\n"
+    parts: list[str] = []
+    current: list[str] = []
+    size = 0
+    limit = MAX_LINE
+    for ch in line:
+        n = len(ch.encode())
+        if size + n > limit:
+            parts.append("".join(current))
+            current, size = [], 0
+            # Continuation lines start with a space, which counts
+            limit = MAX_LINE - 1
+        current.append(ch)
+        size += n
+    parts.append("".join(current))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _date(d: date) -> str:
+    # Hand-rolled: strftime dominates the cost of a large feed
+    return f"{d.year:04d}{d.month:02d}{d.day:02d}"
+
+
+def _utc(dt: datetime) -> str:
+    # Timestamps in the database are naive UTC
+    return f"{dt.year:04d}{dt.month:02d}{dt.day:02d}T{dt.hour:02d}{dt.minute:02d}{dt.second:02d}Z"
+
+
+def event(
+    uid: str,
+    day: date,
+    summary: str,
+    updated_at: datetime,
+    description: str | None = None,
+) -> str:
+    """One all-day VEVENT, as a single string of CRLF-terminated lines."""
+    stamp = _utc(updated_at)
+    lines = [
+        "BEGIN:VEVENT\r\n",
+        fold(f"UID:{uid}"),
+        f"DTSTAMP:{stamp}\r\n",
+        f"LAST-MODIFIED:{stamp}\r\n",
+        f"DTSTART;VALUE=DATE:{_date(day)}\r\n",
+        f"DTEND;VALUE=DATE:{_date(day + timedelta(days=1))}\r\n",
+        fold(f"SUMMARY:{escape_text(summary)}"),
+    ]
+    if description:
+        lines.append(fold(f"DESCRIPTION:{escape_text(description)}"))
+    lines.append("TRANSP:TRANSPARENT\r\nEND:VEVENT\r\n")
+    return "".join(lines)
+
+
+def calendar(name: str, events: Iterable[str]) -> Iterator[str]:
+    """A VCALENDAR around `events` (strings from event())."""
+    yield "BEGIN:VCALENDAR\r\n"
+    yield "VERSION:2.0\r\n"
+    yield fold(f"PRODID:{PRODID}")
+    yield "CALSCALE:GREGORIAN\r\n"
+    yield "METHOD:PUBLISH\r\n"
+    yield fold(f"X-WR-CALNAME:{escape_text(name)}")
+    yield from events
+    yield "END:VCALENDAR\r\n"
@@ -0,0 +1,447 @@
+"""
+Bulk import of staff and rota entries from CSV (or XLSX, if openpyxl is
+installed).
+
+Rows are streamed from the file and handled in batches of IMPORT_BATCH:
+each batch is validated against in-memory maps of names (built once from
+the reference-data cache), and its valid rows are written with Core bulk
+inserts / upsert_assignments and committed, so a large file never sits
+in memory and a bad row costs only its own line. Problems are reported
+per line; with dry_run nothing is written but every row is still checked.
+"""
+from __future__ import annotations
+import codecs
+import csv
+import io
+import os
+from datetime import date, datetime
+from types import SimpleNamespace
+from typing import IO, Iterator
+
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.orm import Session
+
+from .models import Staff
+from .assignments import upsert_assignments
+from . import refdata
+
+# Rows validated and committed together
+IMPORT_BATCH = 5000
+# Per-line errors kept for the report; the rest are only counted
+MAX_REPORTED_ERRORS = 200
+
+STAFF_FIELDS = ("full_name", "email", "phone", "team", "extension", "bleep", "active")
+
+# Accepted header spellings, normalised to the field they fill
+HEADER_ALIASES = {
+    "name": "full_name",
+    "full_name": "full_name",
+    "email": "email",
+    "phone": "phone",
+    "mobile": "phone",
+    "team": "team",
+    "extension": "extension",
+    "ext": "extension",
+    "bleep": "bleep",
+    "active": "active",
+    "rota": "rota",
+    "rota_id": "rota",
+    "date": "date",
+    "shift_date": "date",
+    "shift_type": "shift_type",
+    "shift": "shift_type",
+    "staff": "staff",
+    "staff_id": "staff",
+    "notes": "notes",
+}
+
+TRUE_VALUES = {"1", "y", "yes", "true", "on", "active"}
+FALSE_VALUES = {"0", "n", "no", "false", "off", "inactive"}
+
+
+class ImportFileError(Exception):
+    """The file as a whole cannot be imported (format, headers)."""
+
+    def __init__(self, message: str, line: int | None = None):
+        super().__init__(message)
+        self.line = line
+
+
+class ImportResult:
+    __slots__ = ("rows", "written", "errors", "error_count", "dry_run", "stopped")
+
+    def __init__(self, dry_run: bool):
+        self.rows = 0
+        self.written = 0
+        self.errors: list[tuple[int, str]] = []
+        self.error_count = 0
+        self.dry_run = dry_run
+        # Why the file stopped being readable after some batches were
+        # already committed; `written` says how many rows got in
+        self.stopped: str | None = None
+
+    def error(self, line: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+# -------------------------------------------------
+# Readers
+# -------------------------------------------------
+
+def _header(names) -> list[str | None]:
+    fields = []
+    for name in names:
+        key = str(name or "").strip().lower().replace(" ", "_").replace("-", "_")
+        fields.append(HEADER_ALIASES.get(key))
+    return fields
+
+
+def _check_utf8(f: IO[bytes]) -> None:
+    """
+    Decode the whole file once before any row is read, so a bad byte
+    rejects the file rather than stopping an import halfway through.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    line = 1
+    for chunk in iter(lambda: f.read(1 << 16), b""):
+        try:
+            decoder.decode(chunk)
+        except UnicodeDecodeError as e:
+            line += chunk.count(b"\n", 0, max(0, e.start))
+            raise ImportFileError(f"line {line} is not UTF-8 text; save the file as CSV UTF-8", line)
+        line += chunk.count(b"\n")
+    f.seek(0)
+
+
+def _read_csv(f: IO[bytes]) -> Iterator[tuple[int, dict]]:
+    _check_utf8(f)
+    # utf-8-sig drops the BOM Excel puts at the start of "CSV UTF-8" files
+    text = io.TextIOWrapper(f, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text)
+    try:
+        try:
+            fields = _header(next(reader))
+        except StopIteration:
+            return
+        for values in reader:
+            if not any(v.strip() for v in values):
+                continue
+            yield reader.line_num, {k: v.strip() for k, v in zip(fields, values) if k}
+    except csv.Error as e:
+        raise ImportFileError(f"line {reader.line_num}: {e}", reader.line_num)
+
+
+def _read_xlsx(f: IO[bytes]) -> Iterator[tuple[int, dict]]:
+    try:
+        from openpyxl import load_workbook
+    except ModuleNotFoundError:
+        raise ImportFileError("XLSX import needs the openpyxl package; save the sheet as CSV instead")
+
+    # read_only streams rows instead of loading the whole workbook
+    wb = load_workbook(f, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        try:
+            fields = _header(next(rows))
+        except StopIteration:
+            return
+        for line, values in enumerate(rows, start=2):
+            if not any(v not in (None, "") for v in values):
+                continue
+            row = {}
+            for k, v in zip(fields, values):
+                if not k:
+                    continue
+                if isinstance(v, datetime):
+                    v = v.date()
+                row[k] = v if isinstance(v, date) else ("" if v is None else str(v).strip())
+            yield line, row
+    finally:
+        wb.close()
+
+
+def read_rows(filename: str, f: IO[bytes]) -> Iterator[tuple[int, dict]]:
+    """(line number, {field: value}) for each non-empty data row."""
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext in (".xlsx", ".xlsm"):
+        return _read_xlsx(f)
+    if ext in (".csv", ".txt", ""):
+        return _read_csv(f)
+    raise ImportFileError(f"unsupported file type {ext!r}; use .csv or .xlsx")
+
+
+def _stop(result: ImportResult, e: ImportFileError, committed: bool) -> None:
+    """
+    A file that turns unreadable partway is a whole-file error until a
+    batch has been committed; after that the rows already written are
+    reported along with where and why the import stopped.
+    """
+    if not committed:
+        raise e
+    result.stopped = str(e)
+    result.error(e.line or 0, str(e))
+
+
+def _batches(rows: Iterator[tuple[int, dict]], size: int) -> Iterator[list[tuple[int, dict]]]:
+    batch: list[tuple[int, dict]] = []
+    try:
+        for item in rows:
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+    except ImportFileError:
+        # Hand over the rows read before the bad line first, so "written
+        # up to line N" holds
+        if batch:
+            yield batch
+        raise
+    if batch:
+        yield batch
+
+
+# -------------------------------------------------
+# Value parsing
+# -------------------------------------------------
+
+def _parse_date(value) -> date:
+    if isinstance(value, date):
+        return value
+    value = str(value).strip()
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        pass
+    # Spreadsheets exported with UK settings
+    for fmt in ("%d/%m/%Y", "%d/%m/%y", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"date {value!r} is not YYYY-MM-DD or DD/MM/YYYY")
+
+
+def _parse_bool(value: str, default: bool | None) -> bool | None:
+    value = (value or "").strip().lower()
+    if not value:
+        return default
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f"active {value!r} is not yes/no")
+
+
+# -------------------------------------------------
+# Staff
+# -------------------------------------------------
+
+def import_staff(db: Session, filename: str, f: IO[bytes], dry_run: bool = False) -> ImportResult:
+    """
+    Add staff, or update them when the email matches an existing record.
+    Blank cells leave an existing person's value unchanged.
+    """
+    result = ImportResult(dry_run)
+    by_email = {s.email.lower(): s for s in refdata.staff(db) if s.email}
+    now = datetime.utcnow()
+
+    upd = (
+        update(Staff.__table__)
+        .where(Staff.__table__.c.id == bindparam("_id"))
+        .values({name: bindparam(name) for name in STAFF_FIELDS})
+    )
+
+    committed = False
+    pending = 0
+    try:
+        for batch in _batches(read_rows(filename, f), IMPORT_BATCH):
+            inserts: list[dict] = []
+            updates: dict[int, dict] = {}
+            for line, row in batch:
+                result.rows += 1
+                try:
+                    full_name = row.get("full_name", "")
+                    email = row.get("email", "").lower()
+                    existing = by_email.get(email) if email else None
+                    if not full_name and existing is None:
+                        raise ValueError("full_name is required")
+                    # None (blank, new person) becomes True once repeats are merged
+                    active = _parse_bool(row.get("active", ""), existing.active if existing else None)
+                except ValueError as e:
+                    result.error(line, str(e))
+                    continue
+
+                values = {
+                    "full_name": full_name,
+                    "email": email or None,
+                    "phone": row.get("phone") or None,
+                    "team": row.get("team") or None,
+                    "extension": row.get("extension") or None,
+                    "bleep": row.get("bleep") or None,
+                    "active": active,
+                }
+                if existing is not None:
+                    merged = {k: getattr(existing, k) for k in STAFF_FIELDS}
+                    merged.update({k: v for k, v in values.items() if v not in (None, "")})
+                    merged["active"] = active
+                    updates[existing.id] = {"_id": existing.id, **merged}
+                else:
+                    inserts.append({**values, "created_at": now})
+
+            # Later rows for the same email (in this batch) win, blank cells
+            # keeping the earlier value as they do for existing staff; new
+            # emails are added to the map so a repeat further down updates
+            # instead of inserting twice
+            seen: dict[str, dict] = {}
+            unique_inserts = []
+            for row in inserts:
+                if row["email"]:
+                    if row["email"] in seen:
+                        seen[row["email"]].update({k: v for k, v in row.items() if v not in (None, "")})
+                        continue
+                    seen[row["email"]] = row
+                unique_inserts.append(row)
+            for row in unique_inserts:
+                if row["active"] is None:
+                    row["active"] = True
+
+            result.written += len(unique_inserts) + len(updates)
+            if dry_run:
+                # Nothing is committed, so later batches would not find
+                # this batch's new people the way a real run does; stand
+                # them in, with ids that cannot collide
+                for row in unique_inserts:
+                    if row["email"]:
+                        pending -= 1
+                        by_email[row["email"]] = SimpleNamespace(id=pending, **row)
+                continue
+            if not (unique_inserts or updates):
+                continue
+            conn = db.connection()
+            if unique_inserts:
+                conn.execute(insert(Staff.__table__), unique_inserts)
+            if updates:
+                conn.execute(upd, list(updates.values()))
+            refdata.mark_changed(db, "staff")
+            db.commit()
+            committed = True
+            if seen:
+                by_email = {s.email.lower(): s for s in refdata.staff(db) if s.email}
+    except ImportFileError as e:
+        _stop(result, e, committed)
+
+    return result
+
+
+# -------------------------------------------------
+# Rota entries
+# -------------------------------------------------
+
+class _RotaMaps:
+    """Name -> id lookups for rotas, shift types and staff, built once."""
+
+    def __init__(self, db: Session):
+        self.rotas: dict[str, int] = {}
+        self.rota_ids: set[int] = set()
+        for r in refdata.rotas(db):
+            self.rotas[r.name.strip().lower()] = r.id
+            self.rota_ids.add(r.id)
+
+        self.shift_types: dict[tuple[int, str], int] = {}
+        self.shift_type_ids: dict[int, int] = {}
+        for st in refdata.shift_types_by_id(db).values():
+            self.shift_types[(st.rota_id, st.name.strip().lower())] = st.id
+            self.shift_type_ids[st.id] = st.rota_id
+
+        self.staff_ids: set[int] = set()
+        self.staff_email: dict[str, int] = {}
+        self.staff_name: dict[str, int | None] = {}
+        for s in refdata.staff(db):
+            self.staff_ids.add(s.id)
+            if s.email:
+                self.staff_email[s.email.lower()] = s.id
+            key = s.full_name.strip().lower()
+            # None marks a name shared by several people
+            self.staff_name[key] = None if key in self.staff_name else s.id
+
+    def rota(self, value: str) -> int:
+        key = value.strip().lower()
+        if key in self.rotas:
+            return self.rotas[key]
+        if key.isdigit() and int(key) in self.rota_ids:
+            return int(key)
+        raise ValueError(f"unknown rota {value!r}")
+
+    def shift_type(self, rota_id: int, value: str) -> int:
+        key = value.strip().lower()
+        if (rota_id, key) in self.shift_types:
+            return self.shift_types[(rota_id, key)]
+        if key.isdigit() and self.shift_type_ids.get(int(key)) == rota_id:
+            return int(key)
+        raise ValueError(f"unknown shift type {value!r} for this rota")
+
+    def staff(self, value: str) -> int | None:
+        key = value.strip().lower()
+        if not key:
+            return None
+        if key in self.staff_email:
+            return self.staff_email[key]
+        if key in self.staff_name:
+            staff_id = self.staff_name[key]
+            if staff_id is None:
+                raise ValueError(f"more than one staff member is called {value!r}; use their email")
+            return staff_id
+        if key.isdigit() and int(key) in self.staff_ids:
+            return int(key)
+        raise ValueError(f"unknown staff member {value!r}")
+
+
+def import_rota_entries(db: Session, filename: str, f: IO[bytes], dry_run: bool = False) -> ImportResult:
+    """
+    Upsert assignments: columns rota, date, shift_type, staff (name, email
+    or id; blank leaves the cell unassigned) and notes.
+    """
+    result = ImportResult(dry_run)
+    maps = _RotaMaps(db)
+    # Every cell of a day repeats its date; strptime was most of the
+    # cost of validating a row
+    dates: dict[str, date] = {}
+
+    committed = False
+    try:
+        for batch in _batches(read_rows(filename, f), IMPORT_BATCH):
+            rows: dict[tuple[int, date, int], dict] = {}
+            for line, row in batch:
+                result.rows += 1
+                try:
+                    rota_id = maps.rota(row.get("rota") or "")
+                    raw_date = row.get("date") or ""
+                    shift_date = raw_date if isinstance(raw_date, date) else dates.get(raw_date)
+                    if shift_date is None:
+                        shift_date = dates[raw_date] = _parse_date(raw_date)
+                    shift_type_id = maps.shift_type(rota_id, row.get("shift_type") or "")
+                    staff_id = maps.staff(str(row.get("staff") or ""))
+                except ValueError as e:
+                    result.error(line, str(e))
+                    continue
+                # Later rows for the same cell win
+                rows[(rota_id, shift_date, shift_type_id)] = {
+                    "rota_id": rota_id,
+                    "shift_date": shift_date,
+                    "shift_type_id": shift_type_id,
+                    "staff_id": staff_id,
+                    "notes": (row.get("notes") or "").strip() or None,
+                }
+
+            result.written += len(rows)
+            if dry_run or not rows:
+                continue
+            upsert_assignments(db, rows.values())
+            db.commit()
+            committed = True
+    except ImportFileError as e:
+        _stop(result, e, committed)
+
+    return result
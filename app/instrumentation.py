@@ -0,0 +1,304 @@
+"""
+Per-request instrumentation: SQL statement counts and time, template
+render time, a Server-Timing header, slow-request and N+1 logging, and
+the counters behind /metrics (Prometheus text format).
+
+Everything is keyed off a context variable set by the middleware, so SQL
+run by the update check or other background threads is not attributed to
+a request. Metrics are per process; with several workers each one
+reports its own.
+"""
+from __future__ import annotations
+import os
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+import jinja2
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+# Request latency buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250)
+
+
+def get_slow_request_ms() -> float:
+    # Requests slower than this are logged; 0 disables
+    return float(os.getenv("APP_SLOW_REQUEST_MS", "500"))
+
+
+def get_n_plus_one_threshold() -> int:
+    # The same statement run this many times in one request is logged; 0 disables
+    return int(os.getenv("APP_N_PLUS_ONE_THRESHOLD", "10"))
+
+
+def is_server_timing_enabled() -> bool:
+    return os.getenv("APP_SERVER_TIMING", "1") != "0"
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_time", "render_time", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.statements: Counter[str] = Counter()
+
+    def server_timing(self, total: float, streamed: bool = False) -> str:
+        if streamed:
+            # Headers go out before a streamed body is rendered, so only
+            # the work done until then is known; /metrics has the rest
+            return (
+                f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries before the body", '
+                f'headers;dur={total * 1000:.1f};desc="time to headers"'
+            )
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries", '
+            f"render;dur={self.render_time * 1000:.1f}, "
+            f"total;dur={total * 1000:.1f}"
+        )
+
+
+_current: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> RequestStats | None:
+    return _current.get()
+
+
+# -------------------------------------------------
+# SQL
+# -------------------------------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current.get() is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = getattr(context, "_query_started", None)
+    if stats is None or started is None:
+        return
+    stats.db_time += time.perf_counter() - started
+    stats.queries += 1
+    stats.statements[statement] += 1
+
+
+# -------------------------------------------------
+# Templates
+# -------------------------------------------------
+
+class TimedTemplate(jinja2.Template):
+    """
+    Template that adds its render time to the current request. SQL run
+    while rendering (lazy loads) is counted as db time, not render time.
+    """
+
+    def render(self, *args, **kwargs):
+        stats = _current.get()
+        if stats is None:
+            return super().render(*args, **kwargs)
+        t0 = time.perf_counter()
+        db0 = stats.db_time
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            stats.render_time += time.perf_counter() - t0 - (stats.db_time - db0)
+
+    def generate(self, *args, **kwargs):
+        stats = _current.get()
+        chunks = super().generate(*args, **kwargs)
+        if stats is None:
+            yield from chunks
+            return
+        while True:
+            t0 = time.perf_counter()
+            db0 = stats.db_time
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                stats.render_time += time.perf_counter() - t0 - (stats.db_time - db0)
+            yield chunk
+
+
+# -------------------------------------------------
+# Metrics
+# -------------------------------------------------
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """Per-route counters and histograms, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self.requests: Counter[tuple[str, str, int]] = Counter()
+        self.latency: dict[tuple[str, str], list[float]] = {}
+        self.queries: dict[tuple[str, str], list[float]] = {}
+        self.db_seconds: Counter[tuple[str, str]] = Counter()
+        self.render_seconds: Counter[tuple[str, str]] = Counter()
+
+    @staticmethod
+    def _observe(series: dict, key, buckets, value: float) -> None:
+        # One count per bucket, then sum and total count
+        row = series.get(key)
+        if row is None:
+            row = series[key] = [0] * (len(buckets) + 2)
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                row[i] += 1
+        row[-2] += value
+        row[-1] += 1
+
+    def observe(self, method: str, route: str, status: int, elapsed: float, stats: RequestStats) -> None:
+        key = (method, route)
+        self.requests[(method, route, status)] += 1
+        self._observe(self.latency, key, LATENCY_BUCKETS, elapsed)
+        self._observe(self.queries, key, QUERY_BUCKETS, stats.queries)
+        self.db_seconds[key] += stats.db_time
+        self.render_seconds[key] += stats.render_time
+
+    @staticmethod
+    def _histogram(lines: list[str], name: str, help_text: str, series: dict, buckets) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for (method, route), row in sorted(series.items()):
+            labels = f'method="{method}",route="{_label(route)}"'
+            for bound, count in zip(buckets, row):
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {row[-1]}')
+            lines.append(f"{name}_sum{{{labels}}} {row[-2]}")
+            lines.append(f"{name}_count{{{labels}}} {row[-1]}")
+
+    @staticmethod
+    def _counter(lines: list[str], name: str, help_text: str, series: Counter) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for (method, route), value in sorted(series.items()):
+            lines.append(f'{name}{{method="{method}",route="{_label(route)}"}} {value}')
+
+    def render(self) -> str:
+        lines = [
+            "# HELP trackrota_http_requests_total Requests handled, by route and status.",
+            "# TYPE trackrota_http_requests_total counter",
+        ]
+        for (method, route, status), count in sorted(self.requests.items()):
+            lines.append(
+                f'trackrota_http_requests_total{{method="{method}",route="{_label(route)}",status="{status}"}} {count}'
+            )
+        self._histogram(
+            lines,
+            "trackrota_http_request_duration_seconds",
+            "Time from receiving a request to sending the last byte.",
+            self.latency,
+            LATENCY_BUCKETS,
+        )
+        self._histogram(
+            lines,
+            "trackrota_db_queries_per_request",
+            "SQL statements issued per request.",
+            self.queries,
+            QUERY_BUCKETS,
+        )
+        self._counter(lines, "trackrota_db_seconds_total", "Time spent in SQL statements.", self.db_seconds)
+        self._counter(
+            lines, "trackrota_render_seconds_total", "Time spent rendering templates.", self.render_seconds
+        )
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+# -------------------------------------------------
+# Middleware
+# -------------------------------------------------
+
+def _route_label(scope) -> str:
+    # The route template, never the raw path, so ids do not blow up the
+    # number of series
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path:
+        return path
+    if scope.get("path", "").startswith("/static/"):
+        return "/static"
+    return "unmatched"
+
+
+class InstrumentationMiddleware:
+    """
+    Plain ASGI middleware rather than @app.middleware("http"), so it sees
+    the end of streamed bodies (e.g. /rota/range) and adds no extra task
+    per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.server_timing = is_server_timing_enabled()
+        self.slow_ms = get_slow_request_ms()
+        self.n_plus_one = get_n_plus_one_threshold()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status = 500
+        # Event streams (/rota/events) stay open as long as the page does;
+        # that is not a slow request
+        event_stream = False
+
+        async def send_wrapper(message):
+            nonlocal status, event_stream
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                event_stream = headers.get("content-type", "").startswith("text/event-stream")
+                if self.server_timing:
+                    # No Content-Length means the body is still to be rendered
+                    streamed = "content-length" not in headers and status not in (204, 304)
+                    headers.append("Server-Timing", stats.server_timing(time.perf_counter() - start, streamed))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            elapsed = time.perf_counter() - start
+            method = scope["method"]
+            route = _route_label(scope)
+            metrics.observe(method, route, status, elapsed, stats)
+            if not event_stream:
+                self._log(method, scope["path"], status, elapsed, stats)
+
+    def _log(self, method: str, path: str, status: int, elapsed: float, stats: RequestStats) -> None:
+        if self.slow_ms and elapsed * 1000 >= self.slow_ms:
+            print(
+                f"Slow request: {method} {path} {status} took {elapsed * 1000:.0f}ms "
+                f"({stats.queries} queries, db {stats.db_time * 1000:.0f}ms, "
+                f"render {stats.render_time * 1000:.0f}ms)"
+            )
+        if self.n_plus_one and stats.queries >= self.n_plus_one:
+            for statement, count in stats.statements.items():
+                if count >= self.n_plus_one:
+                    print(f"Possible N+1: {method} {path} ran {count}x: {' '.join(statement.split())[:200]}")
+
+
+def install_instrumentation(app, templates) -> None:
+    """Hook SQL and template timing and wrap `app` in the middleware."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    templates.env.template_class = TimedTemplate
+    app.add_middleware(InstrumentationMiddleware)
@@ -0,0 +1,362 @@
+"""
+Live rota updates: GET /rota/events is a Server-Sent Events stream that
+tells an open rota page when a write touches its rota and dates, so
+viewers see edits without refreshing.
+
+Writes are recorded on the session (upsert_assignments and the time off
+handlers call record()) and announced once the transaction commits, so a
+rolled-back change is never sent. Each worker keeps its subscribers in
+memory (Hub): announcing a change is a dict lookup plus a put_nowait per
+matching subscriber, and an idle subscriber costs a small queue and a
+keepalive comment every KEEPALIVE seconds.
+
+With several workers, APP_LIVE_BACKEND says how changes reach the others:
+  memory  (default) this worker's subscribers only; fine for one process
+  poll    changes are also written to live_events, and each worker with
+          subscribers reads new rows every APP_LIVE_POLL_INTERVAL seconds
+          (SQLite; on PostgreSQL this means notify)
+  notify  PostgreSQL LISTEN/NOTIFY; the notification is sent on commit
+          (PostgreSQL; on SQLite this means poll)
+Every change carries WORKER_ID, so a worker skips its own when they come
+back through the database.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import os
+import secrets
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator
+
+from sqlalchemy import delete, event, func, insert, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .db import engine, get_db_url, is_sqlite
+from .models import LiveEvent
+
+WORKER_ID = secrets.token_hex(4)
+
+# Seconds between keepalive comments on an idle stream (proxies drop
+# connections that stay silent for a minute or so)
+KEEPALIVE = 20
+# How long a browser waits before reconnecting a dropped stream
+RETRY_MS = 3000
+# Changes queued per subscriber; one that is this far behind is reloading
+# its page anyway, so further changes are dropped
+QUEUE_SIZE = 16
+# live_events rows older than this are deleted by the poller
+PRUNE_AFTER = timedelta(minutes=10)
+NOTIFY_CHANNEL = "trackrota_live"
+
+
+def get_live_backend() -> str:
+    backend = os.getenv("APP_LIVE_BACKEND", "memory").strip().lower()
+    sqlite = is_sqlite(get_db_url())
+    if backend == "notify" and sqlite:
+        # LISTEN/NOTIFY is PostgreSQL only
+        return "poll"
+    if backend == "poll" and not sqlite:
+        # Polling reads ids past the last one seen, which relies on them
+        # committing in order: true of SQLite's single writer, but not of
+        # a PostgreSQL sequence, where a late commit would be skipped
+        return "notify"
+    return backend if backend in ("memory", "poll", "notify") else "memory"
+
+
+def get_live_poll_interval() -> float:
+    return float(os.getenv("APP_LIVE_POLL_INTERVAL", "1"))
+
+
+class Change:
+    __slots__ = ("kind", "rota_id", "first", "last", "origin")
+
+    def __init__(self, kind: str, rota_id: int | None, first: date, last: date, origin: str | None = None):
+        self.kind = kind
+        self.rota_id = rota_id
+        self.first = first
+        self.last = last
+        self.origin = origin
+
+    def as_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "rota_id": self.rota_id,
+            "first": self.first.isoformat(),
+            "last": self.last.isoformat(),
+        }
+
+
+# -------------------------------------------------
+# Subscribers (this worker)
+# -------------------------------------------------
+
+class Subscriber:
+    __slots__ = ("rota_id", "first", "last", "client", "queue")
+
+    def __init__(self, rota_id: int, first: date, last: date, client: str | None):
+        self.rota_id = rota_id
+        self.first = first
+        self.last = last
+        self.client = client
+        self.queue: asyncio.Queue[Change] = asyncio.Queue(QUEUE_SIZE)
+
+
+class Hub:
+    """
+    This worker's open streams, by rota. Subscribing and delivery happen
+    on the event loop; publish() may be called from any thread (sync
+    handlers run in the threadpool) and hands over with
+    call_soon_threadsafe.
+    """
+
+    def __init__(self):
+        self._by_rota: dict[int, set[Subscriber]] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._listener: asyncio.Task | None = None
+        self.count = 0
+
+    def subscribe(self, rota_id: int, first: date, last: date, client: str | None) -> Subscriber:
+        self._loop = asyncio.get_running_loop()
+        sub = Subscriber(rota_id, first, last, client)
+        self._by_rota.setdefault(rota_id, set()).add(sub)
+        self.count += 1
+        if self._listener is None and get_live_backend() != "memory":
+            self._listener = self._loop.create_task(_listen(self))
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        subs = self._by_rota.get(sub.rota_id)
+        if subs is None or sub not in subs:
+            return
+        subs.discard(sub)
+        if not subs:
+            del self._by_rota[sub.rota_id]
+        self.count -= 1
+
+    def publish(self, changes: list[Change]) -> None:
+        loop = self._loop
+        if loop is None or not self.count:
+            return
+        try:
+            loop.call_soon_threadsafe(self.deliver, changes)
+        except RuntimeError:
+            # The loop has closed (shutdown, or a test client's loop)
+            self._loop = None
+
+    def deliver(self, changes: list[Change]) -> None:
+        for change in changes:
+            if change.rota_id is None:
+                targets = [sub for subs in self._by_rota.values() for sub in subs]
+            else:
+                targets = self._by_rota.get(change.rota_id, ())
+            for sub in targets:
+                if change.last < sub.first or change.first > sub.last:
+                    continue
+                if change.origin and change.origin == sub.client:
+                    # The page that made the edit has already patched itself
+                    continue
+                try:
+                    sub.queue.put_nowait(change)
+                except asyncio.QueueFull:
+                    pass
+
+
+hub = Hub()
+
+
+async def stream(rota_id: int, first: date, last: date, client: str | None) -> AsyncIterator[str]:
+    """The text/event-stream body for one open rota page."""
+    sub = hub.subscribe(rota_id, first, last, client)
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            try:
+                async with asyncio.timeout(KEEPALIVE):
+                    change = await sub.queue.get()
+            except TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: change\ndata: {json.dumps(change.as_dict())}\n\n"
+    finally:
+        hub.unsubscribe(sub)
+
+
+# -------------------------------------------------
+# Write hooks
+# -------------------------------------------------
+
+def record(db: Session, kind: str, rota_id: int | None, first: date, last: date) -> None:
+    """
+    Note a change to `kind` ("rota_entries" or "time_off") over
+    [first, last] in db's transaction; rota_id None means any rota. Spans
+    are merged per rota, so a bulk write is one change, not one per row.
+    """
+    pending = db.info.setdefault("live_changed", {})
+    key = (kind, rota_id)
+    span = pending.get(key)
+    pending[key] = (first, last) if span is None else (min(span[0], first), max(span[1], last))
+
+
+def record_assignments(db: Session, rows: list[dict]) -> None:
+    spans: dict[int, tuple[date, date]] = {}
+    for r in rows:
+        day = r["shift_date"]
+        span = spans.get(r["rota_id"])
+        spans[r["rota_id"]] = (day, day) if span is None else (min(span[0], day), max(span[1], day))
+    for rota_id, (first, last) in spans.items():
+        record(db, "rota_entries", rota_id, first, last)
+
+
+def set_origin(db: Session, client: str | None) -> None:
+    """The page (its X-Live-Client id) making this session's changes."""
+    if client:
+        db.info["live_origin"] = client[:64]
+
+
+def _pending(session: Session) -> list[Change]:
+    origin = session.info.get("live_origin")
+    return [
+        Change(kind, rota_id, first, last, origin)
+        for (kind, rota_id), (first, last) in session.info.get("live_changed", {}).items()
+    ]
+
+
+@event.listens_for(Session, "before_commit")
+def _share_before_commit(session: Session) -> None:
+    if not session.info.get("live_changed"):
+        return
+    backend = get_live_backend()
+    if backend == "poll":
+        session.execute(
+            insert(LiveEvent),
+            [
+                {
+                    "kind": c.kind,
+                    "rota_id": c.rota_id,
+                    "first_day": c.first,
+                    "last_day": c.last,
+                    "worker": WORKER_ID,
+                    "origin": c.origin,
+                }
+                for c in _pending(session)
+            ],
+        )
+    elif backend == "notify":
+        for c in _pending(session):
+            payload = json.dumps({**c.as_dict(), "worker": WORKER_ID, "origin": c.origin})
+            session.execute(select(func.pg_notify(NOTIFY_CHANNEL, payload)))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_after_commit(session: Session) -> None:
+    if session.info.get("live_changed"):
+        changes = _pending(session)
+        session.info.pop("live_changed", None)
+        hub.publish(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop("live_changed", None)
+
+
+# -------------------------------------------------
+# Other workers' changes
+# -------------------------------------------------
+
+def _from_other_worker(data: dict) -> Change | None:
+    if data.get("worker") == WORKER_ID:
+        return None
+    first, last = data["first"], data["last"]
+    return Change(
+        data["kind"],
+        data["rota_id"],
+        first if isinstance(first, date) else date.fromisoformat(first),
+        last if isinstance(last, date) else date.fromisoformat(last),
+        data.get("origin"),
+    )
+
+
+async def _listen(h: Hub) -> None:
+    """Runs while this worker has subscribers."""
+    try:
+        if get_live_backend() == "notify":
+            await _listen_notify(h)
+        else:
+            await _poll(h)
+    finally:
+        h._listener = None
+
+
+def _latest_id() -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.max(LiveEvent.id))).scalar() or 0
+
+
+def _read_since(last_id: int, prune: bool) -> tuple[list[dict], int]:
+    rows = []
+    with engine.begin() as conn:
+        result = conn.execute(
+            select(
+                LiveEvent.id,
+                LiveEvent.kind,
+                LiveEvent.rota_id,
+                LiveEvent.first_day,
+                LiveEvent.last_day,
+                LiveEvent.worker,
+                LiveEvent.origin,
+            ).where(LiveEvent.id > last_id).order_by(LiveEvent.id)
+        )
+        for r in result:
+            last_id = r.id
+            rows.append(
+                {
+                    "kind": r.kind,
+                    "rota_id": r.rota_id,
+                    "first": r.first_day,
+                    "last": r.last_day,
+                    "worker": r.worker,
+                    "origin": r.origin,
+                }
+            )
+        if prune:
+            conn.execute(delete(LiveEvent).where(LiveEvent.created_at < datetime.utcnow() - PRUNE_AFTER))
+    return rows, last_id
+
+
+async def _poll(h: Hub) -> None:
+    interval = get_live_poll_interval()
+    last_id = await run_in_threadpool(_latest_id)
+    polls = 0
+    while h.count:
+        await asyncio.sleep(interval)
+        polls += 1
+        try:
+            rows, last_id = await run_in_threadpool(_read_since, last_id, polls % 60 == 0)
+        except Exception as e:
+            print(f"Live update poll failed: {e}")
+            continue
+        changes = [c for c in map(_from_other_worker, rows) if c]
+        if changes:
+            h.deliver(changes)
+
+
+async def _listen_notify(h: Hub) -> None:
+    import psycopg
+
+    conninfo = make_url(get_db_url()).set(drivername="postgresql").render_as_string(hide_password=False)
+    while h.count:
+        try:
+            async with await psycopg.AsyncConnection.connect(conninfo, autocommit=True) as conn:
+                await conn.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                while h.count:
+                    # The timeout lets the loop notice it has no subscribers left
+                    async for notify in conn.notifies(timeout=KEEPALIVE):
+                        change = _from_other_worker(json.loads(notify.payload))
+                        if change:
+                            h.deliver([change])
+        except Exception as e:
+            print(f"Live update listener failed: {e}")
+            await asyncio.sleep(RETRY_MS / 1000)
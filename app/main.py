@@ -1,25 +1,22 @@
-from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 import os
 import re
-from .db_migrations import ensure_column_exists
-
-from .db import engine, SessionLocal
-from .models import (
-    Base,
-    User,
-    Staff,
-    ShiftType,
-    RotaEntry,
-    TimeOff,
-    Rota,
-)
+from .migrations import run_migrations
+
+from .db import engine, SessionLocal, dispose_async_engine
+from .models import User
 from .security import hash_password
 from .version import APP_VERSION
 from .version import APP_BUILD
-from .update_check import get_latest_release
+from .instrumentation import install_instrumentation
+from .http_cache import FingerprintedStaticFiles, make_static_url
+from .update_check import (
+    is_update_check_enabled,
+    load_cached_release,
+    start_background_check,
+)
 
 from .routers.auth_routes import router as auth_router
 from .routers.dashboard import router as dashboard_router
@@ -30,6 +27,13 @@ from .routers.users import router as users_router
 from .routers.settings import router as settings_router
 from .routers.time_off import router as time_off_router
 from .routers.rotas import router as rotas_router
+from .routers.patterns import router as patterns_router
+from .routers.autoschedule import router as autoschedule_router
+from .routers.metrics import router as metrics_router
+from .routers.api import router as api_router
+from .routers.calendar import router as calendar_router, calendar_url
+from .routers.imports import router as imports_router
+from .routers.conflicts import router as conflicts_router
 
 
 # -------------------------------------------------
@@ -43,9 +47,13 @@ app = FastAPI()
 # Templates & static
 # -------------------------------------------------
 
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+# Templates link assets via static_url(), which fingerprints the file
+# name so it can be cached for good
+app.mount("/static", FingerprintedStaticFiles(directory="app/static"), name="static")
 
 templates = Jinja2Templates(directory="app/templates")
+templates.env.globals["static_url"] = make_static_url("app/static")
+templates.env.globals["calendar_url"] = calendar_url
 app.state.templates = templates
 
 
@@ -70,53 +78,9 @@ def normalize(v: str) -> tuple[int, ...]:
 # -------------------------------------------------
 
 def bootstrap_defaults(db: Session):
-    # Create tables first
-    Base.metadata.create_all(bind=engine)
-
-    # ---- lightweight migrations ----
-    ensure_column_exists(
-        db,
-        table="users",
-        column="favourite_rotas",
-        column_sql="TEXT",
-    )
-
-    # Ensure at least one rota exists
-    if db.query(Rota).count() == 0:
-        default_rota = Rota(
-            name="Primary On Call",
-            description="Default rota",
-            active=True,
-        )
-        db.add(default_rota)
-        db.commit()
-
-    default_rota = (
-        db.query(Rota)
-        .filter(Rota.active == True)
-        .order_by(Rota.id.asc())
-        .first()
-    )
-
-    # Default shift types
-    if default_rota and db.query(ShiftType).count() == 0:
-        db.add_all(
-            [
-                ShiftType(
-                    rota_id=default_rota.id,
-                    name="Primary",
-                    description="Primary on call",
-                    active=True,
-                ),
-                ShiftType(
-                    rota_id=default_rota.id,
-                    name="Secondary",
-                    description="Secondary on call",
-                    active=True,
-                ),
-            ]
-        )
-        db.commit()
+    # Schema and default rota/shift types are handled by the versioned
+    # migrations (app/migrations), which cost one query when up to date.
+    run_migrations(engine)
 
     # Bootstrap admin user (optional)
     admin_email = os.getenv("APP_BOOTSTRAP_ADMIN_EMAIL")
@@ -153,9 +117,7 @@ def on_startup():
         db.close()
 
 
-@app.on_event("startup")
-def check_for_updates():
-    release = get_latest_release()
+def apply_release(release: dict | None):
     if release:
         latest = normalize(release["tag"])
         current = normalize(APP_VERSION)
@@ -166,16 +128,53 @@ def check_for_updates():
         app.state.update_available = False
 
 
+@app.on_event("startup")
+def check_for_updates():
+    if not is_update_check_enabled():
+        apply_release(None)
+        return
+
+    # Serve straight away from whatever is cached; the GitHub request (which
+    # can sit on a 5s timeout with no network) happens in the background.
+    release, fresh = load_cached_release()
+    apply_release(release)
+    if not fresh:
+        start_background_check(apply_release)
+
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    await dispose_async_engine()
+
+
 # -------------------------------------------------
 # Middleware
 # -------------------------------------------------
 
-@app.middleware("http")
-async def add_version_to_request(request: Request, call_next):
-    request.state.app_version = APP_VERSION
-    request.state.app_build = APP_BUILD
-    response = await call_next(request)
-    return response
+class VersionMiddleware:
+    """
+    Puts the version on request.state for the page footer. Plain ASGI
+    rather than @app.middleware("http"), which adds a task and a buffered
+    stream to every request; that adds up over hundreds of open
+    /rota/events streams.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            state = scope.setdefault("state", {})
+            state["app_version"] = APP_VERSION
+            state["app_build"] = APP_BUILD
+        await self.app(scope, receive, send)
+
+
+app.add_middleware(VersionMiddleware)
+
+
+# SQL/render timing, Server-Timing header and /metrics counters
+install_instrumentation(app, templates)
 
 
 # -------------------------------------------------
@@ -191,3 +190,10 @@ app.include_router(users_router)
 app.include_router(settings_router)
 app.include_router(time_off_router)
 app.include_router(rotas_router)
+app.include_router(patterns_router)
+app.include_router(autoschedule_router)
+app.include_router(metrics_router)
+app.include_router(api_router)
+app.include_router(calendar_router)
+app.include_router(imports_router)
+app.include_router(conflicts_router)
@@ -0,0 +1,3 @@
+from .runner import run_migrations, current_version, LATEST_VERSION
+
+__all__ = ["run_migrations", "current_version", "LATEST_VERSION"]
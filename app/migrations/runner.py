@@ -0,0 +1,84 @@
+from __future__ import annotations
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+
+from .versions import MIGRATIONS
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Arbitrary constant identifying this app's migration advisory lock
+PG_LOCK_KEY = 0x7261746F
+
+_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    _metadata,
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+
+def current_version(engine: Engine) -> int:
+    """One query; 0 when the version table does not exist yet."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(schema_version.c.version)).scalar() or 0
+    except DBAPIError:
+        return 0
+
+
+def _begin_locked(conn: Connection) -> None:
+    """
+    Open a transaction holding the migration lock. On SQLite BEGIN
+    IMMEDIATE takes the database write lock up front (other workers wait
+    on busy_timeout); on PostgreSQL a transaction-scoped advisory lock is
+    used so ordinary traffic is not blocked.
+    """
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    else:
+        conn.exec_driver_sql("BEGIN")
+        if conn.dialect.name == "postgresql":
+            conn.exec_driver_sql(f"SELECT pg_advisory_xact_lock({PG_LOCK_KEY})")
+
+
+def run_migrations(engine: Engine) -> int:
+    """
+    Bring the database up to LATEST_VERSION. When already current this is
+    a single version lookup. Otherwise all pending steps run in one
+    transaction under a lock, so concurrent workers apply them once.
+    Returns the resulting version.
+    """
+    if current_version(engine) >= LATEST_VERSION:
+        return LATEST_VERSION
+
+    # Transactions are driven by hand so the lock, DDL and version bump
+    # share one transaction on every backend.
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        _begin_locked(conn)
+        try:
+            schema_version.create(bind=conn, checkfirst=True)
+            # Another worker may have finished while we waited for the lock
+            version = conn.execute(select(schema_version.c.version)).scalar() or 0
+
+            for step_version, name, step in MIGRATIONS:
+                if step_version > version:
+                    print(f"Applying migration {step_version}: {name}")
+                    step(conn)
+
+            if version < LATEST_VERSION:
+                values = {"version": LATEST_VERSION, "updated_at": datetime.utcnow()}
+                if conn.execute(select(schema_version.c.id)).first():
+                    conn.execute(schema_version.update().values(**values))
+                else:
+                    conn.execute(schema_version.insert().values(id=1, **values))
+
+            conn.exec_driver_sql("COMMIT")
+        except BaseException:
+            conn.exec_driver_sql("ROLLBACK")
+            raise
+
+    return LATEST_VERSION
@@ -0,0 +1,299 @@
+"""
+Ordered schema/data migrations. Append new steps with the next version
+number; never edit or renumber a step that has shipped. Each step runs
+inside the runner's transaction and must be safe on a database that
+already has the change (older installs predate the version table).
+"""
+from __future__ import annotations
+from typing import Callable
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+# Steps carry their own DDL, as it was when they shipped, rather than
+# building from the models: a step must do the same thing whenever it
+# runs, and a fresh database must end up like an upgraded one.
+
+
+def run_ddl(conn: Connection, *statements: str) -> None:
+    """
+    Run fixed DDL. {serial} and {timestamp} stand for the two column
+    types SQLite and PostgreSQL spell differently.
+    """
+    postgres = conn.dialect.name == "postgresql"
+    types = {
+        "serial": "SERIAL" if postgres else "INTEGER",
+        "timestamp": "TIMESTAMP WITHOUT TIME ZONE" if postgres else "DATETIME",
+    }
+    for sql in statements:
+        conn.execute(text(sql.format(**types)))
+
+
+def add_column_if_missing(conn: Connection, table: str, column: str, column_sql: str) -> None:
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column not in existing:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_sql}"))
+
+
+def m0001_initial_schema(conn: Connection) -> None:
+    run_ddl(
+        conn,
+        """CREATE TABLE IF NOT EXISTS rotas (
+            id {serial} NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            description VARCHAR(255),
+            active BOOLEAN NOT NULL,
+            created_at {timestamp} NOT NULL,
+            PRIMARY KEY (id),
+            UNIQUE (name)
+        )""",
+        """CREATE TABLE IF NOT EXISTS staff (
+            id {serial} NOT NULL,
+            full_name VARCHAR(200) NOT NULL,
+            email VARCHAR(254),
+            phone VARCHAR(50),
+            team VARCHAR(100),
+            extension VARCHAR(20),
+            bleep VARCHAR(20),
+            active BOOLEAN NOT NULL,
+            created_at {timestamp} NOT NULL,
+            PRIMARY KEY (id)
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_staff_email ON staff (email)",
+        """CREATE TABLE IF NOT EXISTS shift_types (
+            id {serial} NOT NULL,
+            rota_id INTEGER NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            description VARCHAR(255),
+            active BOOLEAN NOT NULL,
+            PRIMARY KEY (id),
+            CONSTRAINT uq_shift_name_per_rota UNIQUE (rota_id, name),
+            FOREIGN KEY (rota_id) REFERENCES rotas (id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS time_off (
+            id {serial} NOT NULL,
+            staff_id INTEGER NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            reason VARCHAR(255),
+            created_at {timestamp} NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY (staff_id) REFERENCES staff (id)
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_time_off_staff_id ON time_off (staff_id)",
+        "CREATE INDEX IF NOT EXISTS ix_time_off_end_date ON time_off (end_date)",
+        "CREATE INDEX IF NOT EXISTS ix_time_off_start_date ON time_off (start_date)",
+        """CREATE TABLE IF NOT EXISTS users (
+            id {serial} NOT NULL,
+            email VARCHAR(254) NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            role VARCHAR(20) NOT NULL,
+            active BOOLEAN NOT NULL,
+            staff_id INTEGER,
+            created_at {timestamp} NOT NULL,
+            favourite_rotas JSON,
+            PRIMARY KEY (id),
+            FOREIGN KEY (staff_id) REFERENCES staff (id)
+        )""",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)",
+        """CREATE TABLE IF NOT EXISTS rota_entries (
+            id {serial} NOT NULL,
+            rota_id INTEGER NOT NULL,
+            shift_date DATE NOT NULL,
+            shift_type_id INTEGER NOT NULL,
+            staff_id INTEGER,
+            notes TEXT,
+            updated_at {timestamp} NOT NULL,
+            PRIMARY KEY (id),
+            CONSTRAINT uq_rota_date_shift_type UNIQUE (rota_id, shift_date, shift_type_id),
+            FOREIGN KEY (rota_id) REFERENCES rotas (id),
+            FOREIGN KEY (shift_type_id) REFERENCES shift_types (id),
+            FOREIGN KEY (staff_id) REFERENCES staff (id)
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_rota_entries_shift_date ON rota_entries (shift_date)",
+        "CREATE INDEX IF NOT EXISTS ix_rota_entries_rota_id ON rota_entries (rota_id)",
+    )
+
+
+def m0002_users_favourite_rotas(conn: Connection) -> None:
+    # Installs older than the column (created by m0001 on newer ones)
+    add_column_if_missing(conn, "users", "favourite_rotas", "TEXT")
+
+
+def m0003_default_rota(conn: Connection) -> None:
+    if not conn.execute(text("SELECT count(*) FROM rotas")).scalar():
+        conn.execute(
+            text(
+                "INSERT INTO rotas (name, description, active, created_at) "
+                "VALUES ('Primary On Call', 'Default rota', :active, CURRENT_TIMESTAMP)"
+            ),
+            {"active": True},
+        )
+
+    if conn.execute(text("SELECT count(*) FROM shift_types")).scalar():
+        return
+    rota_id = conn.execute(
+        text("SELECT id FROM rotas WHERE active = :active ORDER BY id"), {"active": True}
+    ).scalar()
+    if rota_id is None:
+        return
+    conn.execute(
+        text(
+            "INSERT INTO shift_types (rota_id, name, description, active) "
+            "VALUES (:rota_id, :name, :description, :active)"
+        ),
+        [
+            {"rota_id": rota_id, "name": "Primary", "description": "Primary on call", "active": True},
+            {"rota_id": rota_id, "name": "Secondary", "description": "Secondary on call", "active": True},
+        ],
+    )
+
+
+# Single-column indexes made redundant by the composites in 0004
+SUPERSEDED_INDEXES = [
+    "ix_rota_entries_rota_id",
+    "ix_rota_entries_shift_date",
+    "ix_time_off_staff_id",
+    "ix_time_off_start_date",
+    "ix_time_off_end_date",
+]
+
+
+def m0004_composite_indexes(conn: Connection) -> None:
+    run_ddl(
+        conn,
+        "CREATE INDEX IF NOT EXISTS ix_staff_active_full_name ON staff (active DESC, full_name)",
+        "CREATE INDEX IF NOT EXISTS ix_staff_email ON staff (email)",
+        "CREATE INDEX IF NOT EXISTS ix_shift_types_rota_active_name ON shift_types (rota_id, active DESC, name)",
+        "CREATE INDEX IF NOT EXISTS ix_rota_entries_date_staff_rota ON rota_entries (shift_date, staff_id, rota_id)",
+        "CREATE INDEX IF NOT EXISTS ix_time_off_end_start_staff ON time_off (end_date, start_date, staff_id)",
+        "CREATE INDEX IF NOT EXISTS ix_time_off_staff_dates ON time_off (staff_id, start_date, end_date)",
+        "CREATE INDEX IF NOT EXISTS ix_time_off_start_end ON time_off (start_date, end_date)",
+    )
+    for name in SUPERSEDED_INDEXES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    if conn.dialect.name == "sqlite":
+        # Refresh planner statistics so the new indexes get picked
+        conn.execute(text("ANALYZE"))
+
+
+def _add_versions(conn: Connection, kinds: tuple[str, ...]) -> None:
+    existing = set(conn.execute(text("SELECT kind FROM refdata_versions")).scalars())
+    rows = [{"kind": kind} for kind in kinds if kind not in existing]
+    if rows:
+        conn.execute(text("INSERT INTO refdata_versions (kind, version) VALUES (:kind, 0)"), rows)
+
+
+def m0005_refdata_versions(conn: Connection) -> None:
+    run_ddl(
+        conn,
+        """CREATE TABLE IF NOT EXISTS refdata_versions (
+            kind VARCHAR(32) NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (kind)
+        )""",
+    )
+    _add_versions(conn, ("rotas", "shift_types", "staff"))
+
+
+def m0006_api_tokens(conn: Connection) -> None:
+    run_ddl(
+        conn,
+        """CREATE TABLE IF NOT EXISTS api_tokens (
+            id {serial} NOT NULL,
+            name VARCHAR(120) NOT NULL,
+            token_hash VARCHAR(64) NOT NULL,
+            active BOOLEAN NOT NULL,
+            created_at {timestamp} NOT NULL,
+            PRIMARY KEY (id),
+            UNIQUE (token_hash)
+        )""",
+    )
+    _add_versions(conn, ("api_tokens", "rota_entries"))
+
+
+def m0007_feed_indexes(conn: Connection) -> None:
+    run_ddl(
+        conn,
+        "CREATE INDEX IF NOT EXISTS ix_rota_entries_staff_date ON rota_entries (staff_id, shift_date, updated_at)",
+        "CREATE INDEX IF NOT EXISTS ix_rota_entries_rota_updated ON rota_entries (rota_id, updated_at)",
+    )
+
+
+def m0008_time_off_keyset_indexes(conn: Connection) -> None:
+    # The list pages by (start_date, id); (start_date, end_date) only
+    # served its old unbounded newest-first query. The per-person index
+    # gains id so one person's pages need no sort either.
+    conn.execute(text("DROP INDEX IF EXISTS ix_time_off_start_end"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_time_off_staff_dates"))
+    run_ddl(
+        conn,
+        "CREATE INDEX IF NOT EXISTS ix_time_off_start_id ON time_off (start_date, id)",
+        "CREATE INDEX IF NOT EXISTS ix_time_off_staff_dates ON time_off (staff_id, start_date, id, end_date)",
+    )
+
+
+def m0009_users_staff_index(conn: Connection) -> None:
+    # The user directory finds users by the staff they are linked to
+    run_ddl(conn, "CREATE INDEX IF NOT EXISTS ix_users_staff_id ON users (staff_id)")
+
+
+def m0010_live_events(conn: Connection) -> None:
+    run_ddl(
+        conn,
+        """CREATE TABLE IF NOT EXISTS live_events (
+            id {serial} NOT NULL,
+            kind VARCHAR(32) NOT NULL,
+            rota_id INTEGER,
+            first_day DATE NOT NULL,
+            last_day DATE NOT NULL,
+            worker VARCHAR(16) NOT NULL,
+            origin VARCHAR(64),
+            created_at {timestamp} NOT NULL,
+            PRIMARY KEY (id)
+        )""",
+    )
+
+
+def m0011_autoschedule_jobs(conn: Connection) -> None:
+    run_ddl(
+        conn,
+        """CREATE TABLE IF NOT EXISTS autoschedule_jobs (
+            id VARCHAR(32) NOT NULL,
+            status VARCHAR(16) NOT NULL,
+            rota_id INTEGER NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            min_rest_days INTEGER NOT NULL,
+            plan JSON,
+            error TEXT,
+            applied INTEGER,
+            created_at {timestamp} NOT NULL,
+            PRIMARY KEY (id)
+        )""",
+    )
+
+
+def m0012_users_feed_version(conn: Connection) -> None:
+    add_column_if_missing(conn, "users", "feed_version", "INTEGER NOT NULL DEFAULT 0")
+
+
+def m0013_autoschedule_job_started(conn: Connection) -> None:
+    timestamp = "TIMESTAMP WITHOUT TIME ZONE" if conn.dialect.name == "postgresql" else "DATETIME"
+    add_column_if_missing(conn, "autoschedule_jobs", "started_at", timestamp)
+
+
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "initial schema", m0001_initial_schema),
+    (2, "users.favourite_rotas", m0002_users_favourite_rotas),
+    (3, "default rota and shift types", m0003_default_rota),
+    (4, "composite indexes", m0004_composite_indexes),
+    (5, "reference data versions", m0005_refdata_versions),
+    (6, "api tokens and on-call versions", m0006_api_tokens),
+    (7, "calendar feed indexes", m0007_feed_indexes),
+    (8, "time off keyset indexes", m0008_time_off_keyset_indexes),
+    (9, "users.staff_id index", m0009_users_staff_index),
+    (10, "live update events", m0010_live_events),
+    (11, "auto-schedule jobs", m0011_autoschedule_jobs),
+    (12, "users.feed_version", m0012_users_feed_version),
+    (13, "autoschedule_jobs.started_at", m0013_autoschedule_job_started),
+]
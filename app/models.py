@@ -8,7 +8,9 @@ from sqlalchemy import (
     ForeignKey,
     Date,
     UniqueConstraint,
+    Index,
     Text,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .db import Base
@@ -17,6 +19,11 @@ from sqlalchemy import JSON
 
 class Staff(Base):
     __tablename__ = "staff"
+    __table_args__ = (
+        # Pickers list active staff by name; /staff lists active first.
+        # DESC matches that ordering so neither needs a sort.
+        Index("ix_staff_active_full_name", text("active DESC"), "full_name"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     full_name: Mapped[str] = mapped_column(String(200), nullable=False)
@@ -48,7 +55,7 @@ class User(Base):
     )
     active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
     staff_id: Mapped[int | None] = mapped_column(
-        ForeignKey("staff.id"), nullable=True
+        ForeignKey("staff.id"), nullable=True, index=True
     )
     created_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, nullable=False
@@ -56,6 +63,8 @@ class User(Base):
 
     staff = relationship("Staff", back_populates="user")
     favourite_rotas = mapped_column(JSON, nullable=True)  # list of rota IDs
+    # Signed into this user's calendar feed links; bumping it resets them
+    feed_version: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
 
 class Rota(Base):
     __tablename__ = "rotas"
@@ -85,19 +94,29 @@ class ShiftType(Base):
 
     __table_args__ = (
         UniqueConstraint("rota_id", "name", name="uq_shift_name_per_rota"),
+        Index("ix_shift_types_rota_active_name", "rota_id", text("active DESC"), "name"),
     )
 
 
 class RotaEntry(Base):
     __tablename__ = "rota_entries"
     __table_args__ = (
+        # Also serves rota_id / (rota_id, shift_date) lookups, so rota_id
+        # needs no index of its own
         UniqueConstraint("rota_id", "shift_date", "shift_type_id", name="uq_rota_date_shift_type"),
+        # Covers the cross-rota "who is busy when" scans
+        Index("ix_rota_entries_date_staff_rota", "shift_date", "staff_id", "rota_id"),
+        # Calendar feeds: per person in date order (updated_at makes the
+        # ETag check index-only), and the newest change to a rota as a
+        # single index seek
+        Index("ix_rota_entries_staff_date", "staff_id", "shift_date", "updated_at"),
+        Index("ix_rota_entries_rota_updated", "rota_id", "updated_at"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    rota_id: Mapped[int] = mapped_column(ForeignKey("rotas.id"), nullable=False, index=True)
+    rota_id: Mapped[int] = mapped_column(ForeignKey("rotas.id"), nullable=False)
 
-    shift_date: Mapped[date] = mapped_column(Date, nullable=False, index=True)
+    shift_date: Mapped[date] = mapped_column(Date, nullable=False)
     shift_type_id: Mapped[int] = mapped_column(ForeignKey("shift_types.id"), nullable=False)
     staff_id: Mapped[int | None] = mapped_column(ForeignKey("staff.id"), nullable=True)
 
@@ -116,14 +135,21 @@ class RotaEntry(Base):
 
 class TimeOff(Base):
     __tablename__ = "time_off"
+    __table_args__ = (
+        # Per-person overlap checks, and keyset pages of one person's list
+        Index("ix_time_off_staff_dates", "staff_id", "start_date", "id", "end_date"),
+        # Overlap with a window: end_date >= start only matches recent rows
+        # as history grows, and the index covers the availability query
+        Index("ix_time_off_end_start_staff", "end_date", "start_date", "staff_id"),
+        # Keyset pages of the time-off list, in either direction
+        Index("ix_time_off_start_id", "start_date", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    staff_id: Mapped[int] = mapped_column(
-        ForeignKey("staff.id"), nullable=False, index=True
-    )
+    staff_id: Mapped[int] = mapped_column(ForeignKey("staff.id"), nullable=False)
 
-    start_date: Mapped[date] = mapped_column(Date, nullable=False, index=True)
-    end_date: Mapped[date] = mapped_column(Date, nullable=False, index=True)
+    start_date: Mapped[date] = mapped_column(Date, nullable=False)
+    end_date: Mapped[date] = mapped_column(Date, nullable=False)
 
     reason: Mapped[str | None] = mapped_column(String(255), nullable=True)
     created_at: Mapped[datetime] = mapped_column(
@@ -131,3 +157,76 @@ class TimeOff(Base):
     )
 
     staff = relationship("Staff", back_populates="time_off")
+
+
+class RefDataVersion(Base):
+    """
+    One row per cached data kind (see app/refdata.py, and app/oncall.py
+    for "rota_entries", which is bumped just after the change commits).
+    Bumped in the same transaction as the change so other workers can
+    notice it.
+    """
+    __tablename__ = "refdata_versions"
+
+    kind: Mapped[str] = mapped_column(String(32), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+class LiveEvent(Base):
+    """
+    A rota change for other workers' live streams (app/live.py, with
+    APP_LIVE_BACKEND=poll on SQLite). Written in the same transaction as
+    the change and deleted after a few minutes.
+    """
+    __tablename__ = "live_events"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    kind: Mapped[str] = mapped_column(String(32), nullable=False)
+    # None for time off, which can touch any rota
+    rota_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    first_day: Mapped[date] = mapped_column(Date, nullable=False)
+    last_day: Mapped[date] = mapped_column(Date, nullable=False)
+    worker: Mapped[str] = mapped_column(String(16), nullable=False)
+    origin: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
+
+
+class AutoscheduleJob(Base):
+    """
+    An auto-schedule run and the plan it produced (app/autoschedule.py).
+    Kept in the database so the preview and the apply can be served by
+    any worker; deleted a day after it was created.
+    """
+    __tablename__ = "autoschedule_jobs"
+
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    status: Mapped[str] = mapped_column(String(16), nullable=False)
+    rota_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    start_date: Mapped[date] = mapped_column(Date, nullable=False)
+    end_date: Mapped[date] = mapped_column(Date, nullable=False)
+    min_rest_days: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # {"rows", "unfilled", "loads"} with ISO dates, once the run is ready
+    plan = mapped_column(JSON, nullable=True)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Shifts written by the apply; set once, by whichever request gets there first
+    applied: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
+    # When a worker picked the job up; see JOB_TIMEOUT
+    started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+class ApiToken(Base):
+    """Bearer token for the JSON API. Only a SHA-256 of the token is stored."""
+    __tablename__ = "api_tokens"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(120), nullable=False)
+    token_hash: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
@@ -0,0 +1,205 @@
+"""
+Who is on call, for the JSON API (app/routers/api.py) that paging
+integrations and ward displays poll.
+
+Each worker keeps a map of (rota_id, date) -> {shift_type_id: (staff_id,
+notes)} for a window around today, so a lookup does not touch the
+database. upsert_assignments() records the rows it writes and, once the
+transaction commits, they are patched into the map in place and the
+"rota_entries" row in refdata_versions is bumped in a short transaction of
+its own. A worker that sees that row move (checked at most once per
+APP_REFDATA_SYNC_INTERVAL, like the reference data) reloads its window,
+which is how writes made through other workers arrive. Dates outside the
+window are read from the database.
+
+The bump happens after the write commits rather than inside it: on
+PostgreSQL an UPDATE of the one version row would hold its lock until the
+write's commit and queue every concurrent assignment write behind it.
+Bumping afterwards can only make a reader load twice, never miss a write,
+because the data is already committed when the version moves.
+
+Names and contact details are joined in from the reference-data cache at
+lookup time, so staff and shift type edits need nothing from this module.
+"""
+from __future__ import annotations
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from .db import engine
+from .models import RotaEntry, RefDataVersion
+from . import refdata
+from .utils import now_local
+
+VERSION_KIND = "rota_entries"
+
+# Days before today kept in the map, for "who was on last night"
+PAST_DAYS = 7
+
+Cells = dict[int, tuple[int | None, str | None]]
+
+
+def get_oncall_window_days() -> int:
+    # Days after today kept in memory; later dates are read from the database
+    return int(os.getenv("APP_ONCALL_WINDOW_DAYS", "42"))
+
+
+_lock = threading.Lock()
+_map: dict[tuple[int, date], Cells] = {}
+_window: tuple[date, date] | None = None
+_version: int | None = None
+_last_sync = 0.0
+
+
+def _load(db: Session, first: date, last: date) -> dict[tuple[int, date], Cells]:
+    table: dict[tuple[int, date], Cells] = {}
+    rows = db.execute(
+        select(
+            RotaEntry.rota_id,
+            RotaEntry.shift_date,
+            RotaEntry.shift_type_id,
+            RotaEntry.staff_id,
+            RotaEntry.notes,
+        ).where(RotaEntry.shift_date.between(first, last))
+    )
+    for rota_id, day, shift_type_id, staff_id, notes in rows:
+        table.setdefault((rota_id, day), {})[shift_type_id] = (staff_id, notes)
+    return table
+
+
+def _read_version(db: Session) -> int | None:
+    return db.execute(
+        select(RefDataVersion.version).where(RefDataVersion.kind == VERSION_KIND)
+    ).scalar()
+
+
+def _refresh(db: Session, today: date) -> None:
+    global _map, _window, _version, _last_sync
+    window = (today - timedelta(days=PAST_DAYS), today + timedelta(days=get_oncall_window_days()))
+    stale = _window != window
+    if not stale:
+        interval = refdata.get_refdata_sync_interval()
+        now = time.monotonic()
+        if interval < 0 or (interval and now - _last_sync < interval):
+            return
+        _last_sync = now
+        stale = _read_version(db) != _version
+    if not stale:
+        return
+
+    # Version first: a write committed during the load leaves it behind,
+    # so the next check loads again rather than missing the write
+    version = _read_version(db)
+    table = _load(db, *window)
+    with _lock:
+        _map, _window, _version = table, window, version
+
+
+def invalidate() -> None:
+    """Drop this worker's map; the next lookup reloads it."""
+    global _window
+    with _lock:
+        _window = None
+
+
+def lookup(db: Session, day: date) -> dict[tuple[int, date], Cells]:
+    """The (rota_id, date) -> cells map to read `day` from."""
+    _refresh(db, now_local().date())
+    window, table = _window, _map
+    if window is None or not window[0] <= day <= window[1]:
+        return _load(db, day, day)
+    return table
+
+
+def on_call(db: Session, rota: refdata.RotaRef, day: date) -> list[dict]:
+    """One entry per active shift type of `rota` on `day`, filled or not."""
+    cells = lookup(db, day).get((rota.id, day), {})
+    staff_by_id = refdata.staff_by_id(db)
+    shifts = []
+    for st in refdata.active_shift_types(db, rota.id):
+        staff_id, notes = cells.get(st.id, (None, None))
+        person = staff_by_id.get(staff_id) if staff_id else None
+        shifts.append(
+            {
+                "shift_type_id": st.id,
+                "shift_type": st.name,
+                "staff": None if person is None else {
+                    "id": person.id,
+                    "name": person.full_name,
+                    "email": person.email,
+                    "phone": person.phone,
+                    "extension": person.extension,
+                    "bleep": person.bleep,
+                    "team": person.team,
+                },
+                "notes": notes,
+            }
+        )
+    return shifts
+
+
+# -------------------------------------------------
+# Write hooks
+# -------------------------------------------------
+
+def mark_changed(db: Session, rows: list[dict]) -> None:
+    """
+    Record assignment rows being written in db's transaction (called by
+    upsert_assignments). Nothing is written here; the version row is
+    bumped once the transaction commits.
+    """
+    db.info.setdefault("oncall_changed", []).extend(rows)
+
+
+def _bump_version() -> int | None:
+    # Own connection and transaction, so the row lock lasts one statement
+    with engine.begin() as conn:
+        return conn.execute(
+            update(RefDataVersion)
+            .where(RefDataVersion.kind == VERSION_KIND)
+            .values(version=RefDataVersion.version + 1)
+            .returning(RefDataVersion.version)
+        ).scalar()
+
+
+def _apply(rows: list[dict], version: int | None) -> None:
+    global _version
+    with _lock:
+        window = _window
+        if window is None:
+            return
+        for r in rows:
+            day = r["shift_date"]
+            if not window[0] <= day <= window[1]:
+                continue
+            # Copy-on-write, so readers never see a cell dict change size
+            key = (r["rota_id"], day)
+            cells = dict(_map.get(key, ()))
+            cells[r["shift_type_id"]] = (r["staff_id"], r["notes"])
+            _map[key] = cells
+        # Nobody else wrote since the map was loaded, so it is current
+        if version is not None and _version is not None and version == _version + 1:
+            _version = version
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_after_commit(session: Session) -> None:
+    rows = session.info.pop("oncall_changed", None)
+    if not rows:
+        return
+    try:
+        version = _bump_version()
+    except Exception as e:
+        # The write itself has committed; other workers catch up on the next bump
+        print(f"On-call version bump failed: {e}")
+        version = None
+    _apply(rows, version)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop("oncall_changed", None)
@@ -0,0 +1,120 @@
+from __future__ import annotations
+from datetime import date, timedelta
+from sqlalchemy.orm import Session
+
+from .models import ShiftType, RotaEntry
+from . import refdata
+from .availability import Availability, load_availability
+from .assignments import upsert_assignments
+
+
+def generate_pattern(
+    rota_id: int,
+    shift_type_ids: list[int],
+    staff_cycle: list[int],
+    start: date,
+    end: date,
+    unavailable: Availability,
+    period_days: int = 7,
+    skip: set[tuple[date, int]] | None = None,
+) -> list[dict]:
+    """
+    Compute RotaEntry rows for a rotating pattern, entirely in memory.
+
+    The cycle advances one place every `period_days` days (7 = weekly
+    rotation, 1 = daily). On a given day shift type j goes to
+    staff_cycle[(block + j) % n]; if that person is off or already has a
+    shift that day, the next person in the cycle is tried. Cells nobody
+    can cover, and cells in `skip`, are left out.
+    """
+    n = len(staff_cycle)
+    if n == 0 or not shift_type_ids or end < start:
+        return []
+    period_days = max(1, period_days)
+    skip = skip or set()
+
+    rows: list[dict] = []
+    day = start
+    offset = 0
+    while day <= end:
+        block = offset // period_days
+        used: set[int] = set()
+        for j, st_id in enumerate(shift_type_ids):
+            if (day, st_id) in skip:
+                continue
+            base = block + j
+            for k in range(n):
+                sid = staff_cycle[(base + k) % n]
+                if sid in used or unavailable.is_off(sid, day):
+                    continue
+                used.add(sid)
+                rows.append(
+                    {
+                        "rota_id": rota_id,
+                        "shift_date": day,
+                        "shift_type_id": st_id,
+                        "staff_id": sid,
+                        "notes": None,
+                    }
+                )
+                break
+        day += timedelta(days=1)
+        offset += 1
+    return rows
+
+
+def apply_pattern(
+    db: Session,
+    rota_id: int,
+    shift_type_ids: list[int],
+    staff_cycle: list[int],
+    start: date,
+    end: date,
+    period_days: int = 7,
+    overwrite: bool = False,
+) -> int:
+    """
+    Generate a pattern for `rota_id` and write it in a single transaction.
+    Shift types not belonging to the rota are ignored. Unless `overwrite`
+    is set, cells that already have someone assigned are left alone.
+    Returns the number of rows written; raises ValueError, writing
+    nothing, if the cycle names anyone who is not active staff.
+    """
+    active_staff = refdata.active_staff_by_id(db)
+    unknown = [sid for sid in staff_cycle if sid not in active_staff]
+    if unknown:
+        raise ValueError(f"unknown or inactive staff member: {', '.join(map(str, unknown))}")
+
+    valid = {
+        st_id
+        for (st_id,) in db.query(ShiftType.id).filter(
+            ShiftType.rota_id == rota_id,
+            ShiftType.id.in_(shift_type_ids),
+        )
+    }
+    shift_type_ids = [st_id for st_id in shift_type_ids if st_id in valid]
+
+    skip: set[tuple[date, int]] = set()
+    if not overwrite:
+        skip = {
+            (d, st_id)
+            for d, st_id in db.query(RotaEntry.shift_date, RotaEntry.shift_type_id).filter(
+                RotaEntry.rota_id == rota_id,
+                RotaEntry.shift_date.between(start, end),
+                RotaEntry.staff_id.isnot(None),
+            )
+        }
+
+    rows = generate_pattern(
+        rota_id,
+        shift_type_ids,
+        staff_cycle,
+        start,
+        end,
+        load_availability(db, start, end, staff_cycle),
+        period_days=period_days,
+        skip=skip,
+    )
+    written = upsert_assignments(db, rows)
+    db.commit()
+    return written
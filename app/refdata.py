@@ -0,0 +1,339 @@
+"""
+In-process cache of the reference lists most pages need: rotas, shift
+types and staff (plus the API token hashes). They change a few times a
+week but were re-queried on every request.
+
+Each kind has a generation counter. Handlers that change a kind call
+mark_changed(db, kind) before committing; once the commit lands the
+local generation is bumped and the next request reloads. mark_changed
+also increments the kind's row in refdata_versions inside the same
+transaction. Every worker polls that table (one tiny query, at most once
+per APP_REFDATA_SYNC_INTERVAL seconds), so edits made through another
+worker or host are picked up too.
+
+Cached values are read-only __slots__ snapshots, never ORM objects, so
+they can be shared between requests and threads.
+"""
+from __future__ import annotations
+import os
+import threading
+import time
+from bisect import bisect_right
+
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from .models import Rota, ShiftType, Staff, RefDataVersion, ApiToken
+
+KINDS = ("rotas", "shift_types", "staff", "api_tokens")
+
+
+def is_refdata_cache_enabled() -> bool:
+    return os.getenv("APP_REFDATA_CACHE", "1") != "0"
+
+
+def get_refdata_sync_interval() -> float:
+    # Seconds between checks of refdata_versions; 0 checks on every use and
+    # a negative value never checks (single-process deployments)
+    return float(os.getenv("APP_REFDATA_SYNC_INTERVAL", "1"))
+
+
+# -------------------------------------------------
+# Snapshots
+# -------------------------------------------------
+
+class _Snapshot:
+    __slots__ = ()
+
+    def __init__(self, row):
+        for name, value in zip(self.__slots__, row):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __repr__(self):
+        return f"{type(self).__name__}(id={self.id!r})"
+
+
+class RotaRef(_Snapshot):
+    __slots__ = ("id", "name", "description", "active")
+    columns = (Rota.id, Rota.name, Rota.description, Rota.active)
+
+
+class ShiftTypeRef(_Snapshot):
+    __slots__ = ("id", "rota_id", "name", "description", "active")
+    columns = (ShiftType.id, ShiftType.rota_id, ShiftType.name, ShiftType.description, ShiftType.active)
+
+
+class StaffRef(_Snapshot):
+    __slots__ = ("id", "full_name", "email", "phone", "team", "extension", "bleep", "active")
+    columns = (
+        Staff.id,
+        Staff.full_name,
+        Staff.email,
+        Staff.phone,
+        Staff.team,
+        Staff.extension,
+        Staff.bleep,
+        Staff.active,
+    )
+
+
+# -------------------------------------------------
+# Loaders (one query per kind)
+# -------------------------------------------------
+
+def _load_rotas(db: Session) -> dict:
+    rows = tuple(RotaRef(r) for r in db.execute(select(*RotaRef.columns).order_by(Rota.name.asc())))
+    return {"all": rows, "active": tuple(r for r in rows if r.active)}
+
+
+# Staff and shift types are read in index order (active first, then by
+# name), so loading them needs no sort.
+
+def _load_shift_types(db: Session) -> dict:
+    by_rota: dict[int, list[ShiftTypeRef]] = {}
+    rows = db.execute(
+        select(*ShiftTypeRef.columns).order_by(
+            ShiftType.rota_id, ShiftType.active.desc(), ShiftType.name.asc()
+        )
+    )
+    for r in rows:
+        st = ShiftTypeRef(r)
+        by_rota.setdefault(st.rota_id, []).append(st)
+    return {
+        "by_rota": {rid: tuple(items) for rid, items in by_rota.items()},
+        "active_by_rota": {rid: tuple(st for st in items if st.active) for rid, items in by_rota.items()},
+        "by_id": {st.id: st for items in by_rota.values() for st in items},
+    }
+
+
+def _load_staff(db: Session) -> dict:
+    rows = tuple(
+        StaffRef(r)
+        for r in db.execute(select(*StaffRef.columns).order_by(Staff.active.desc(), Staff.full_name.asc()))
+    )
+    active = tuple(s for s in rows if s.active)
+    return {
+        "all": rows,
+        "active": active,
+        "by_id": {s.id: s for s in rows},
+        "active_by_id": {s.id: s for s in active},
+        "position": {s.id: i for i, s in enumerate(rows)},
+        **_search_index(rows),
+    }
+
+
+def _search_index(rows: tuple[StaffRef, ...]) -> dict:
+    """
+    The lowercased name, email and team of everyone, one line each, as a
+    single string, with the offset where each person's line starts.
+    search_staff finds matches with str.find (C speed) and maps each hit
+    back to a person with a bisect, rather than testing people one by one.
+    """
+    haystacks = [" ".join(v for v in (s.full_name, s.email, s.team) if v).lower() for s in rows]
+    offsets = []
+    pos = 0
+    for h in haystacks:
+        offsets.append(pos)
+        pos += len(h) + 1
+    return {"haystacks": haystacks, "search_text": "\n".join(haystacks), "offsets": offsets}
+
+
+def _load_api_tokens(db: Session) -> dict:
+    hashes = db.execute(select(ApiToken.token_hash).where(ApiToken.active == True)).scalars()
+    return {"hashes": frozenset(hashes)}
+
+
+_LOADERS = {
+    "rotas": _load_rotas,
+    "shift_types": _load_shift_types,
+    "staff": _load_staff,
+    "api_tokens": _load_api_tokens,
+}
+
+
+# -------------------------------------------------
+# Cache
+# -------------------------------------------------
+
+_generation = {kind: 0 for kind in KINDS}
+_cache: dict[str, tuple[int, dict]] = {}
+_lock = threading.Lock()
+_seen_versions: dict[str, int] = {}
+_last_sync = 0.0
+
+
+def invalidate(*kinds: str) -> None:
+    """Drop the given kinds (all of them by default) from this process."""
+    with _lock:
+        for kind in kinds or KINDS:
+            _generation[kind] += 1
+            _cache.pop(kind, None)
+
+
+def _sync(db: Session) -> None:
+    global _last_sync
+    interval = get_refdata_sync_interval()
+    if interval < 0:
+        return
+    now = time.monotonic()
+    if interval and now - _last_sync < interval:
+        return
+    _last_sync = now
+
+    changed = []
+    for kind, version in db.execute(select(RefDataVersion.kind, RefDataVersion.version)):
+        if _seen_versions.get(kind) != version:
+            _seen_versions[kind] = version
+            changed.append(kind)
+    changed = [k for k in changed if k in _generation]
+    if changed:
+        invalidate(*changed)
+
+
+def _get(db: Session, kind: str) -> dict:
+    if not is_refdata_cache_enabled():
+        return _LOADERS[kind](db)
+
+    _sync(db)
+    with _lock:
+        generation = _generation[kind]
+        hit = _cache.get(kind)
+    if hit and hit[0] == generation:
+        return hit[1]
+
+    value = _LOADERS[kind](db)
+    with _lock:
+        # Skip storing if a change landed while we were loading
+        if _generation[kind] == generation:
+            _cache[kind] = (generation, value)
+    return value
+
+
+def mark_changed(db: Session, *kinds: str) -> None:
+    """
+    Record that `kinds` are being changed in db's transaction. Other
+    workers see the version bump; this one drops its copy on commit.
+    """
+    db.execute(
+        update(RefDataVersion)
+        .where(RefDataVersion.kind.in_(kinds))
+        .values(version=RefDataVersion.version + 1)
+    )
+    db.info.setdefault("refdata_changed", set()).update(kinds)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    kinds = session.info.pop("refdata_changed", None)
+    if kinds:
+        invalidate(*kinds)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop("refdata_changed", None)
+
+
+# -------------------------------------------------
+# Accessors
+# -------------------------------------------------
+
+def rotas(db: Session) -> tuple[RotaRef, ...]:
+    """All rotas by name."""
+    return _get(db, "rotas")["all"]
+
+
+def active_rotas(db: Session) -> tuple[RotaRef, ...]:
+    return _get(db, "rotas")["active"]
+
+
+def shift_types(db: Session, rota_id: int) -> tuple[ShiftTypeRef, ...]:
+    """All shift types of a rota, active first, then by name."""
+    return _get(db, "shift_types")["by_rota"].get(rota_id, ())
+
+
+def active_shift_types(db: Session, rota_id: int) -> tuple[ShiftTypeRef, ...]:
+    return _get(db, "shift_types")["active_by_rota"].get(rota_id, ())
+
+
+def shift_types_by_id(db: Session) -> dict[int, ShiftTypeRef]:
+    return _get(db, "shift_types")["by_id"]
+
+
+def staff(db: Session) -> tuple[StaffRef, ...]:
+    """All staff, active first, then by name."""
+    return _get(db, "staff")["all"]
+
+
+def active_staff(db: Session) -> tuple[StaffRef, ...]:
+    return _get(db, "staff")["active"]
+
+
+def staff_by_id(db: Session) -> dict[int, StaffRef]:
+    """All staff, including leavers still named on old entries."""
+    return _get(db, "staff")["by_id"]
+
+
+def active_staff_by_id(db: Session) -> dict[int, StaffRef]:
+    return _get(db, "staff")["active_by_id"]
+
+
+def search_staff(
+    db: Session,
+    query: str = "",
+    after: int | None = None,
+    limit: int = 50,
+    active_only: bool = False,
+) -> tuple[list[StaffRef], int | None]:
+    """
+    One page of staff, in list order, whose name, email or team contains
+    every word of `query`. `after` is the id of the last person on the
+    previous page; returns (page, id to pass as `after` for the next
+    page, or None on the last page). Scans the cached list, stopping as
+    soon as the page is full.
+    """
+    data = _get(db, "staff")
+    rows = data["all"]
+    start = data["position"].get(after, -1) + 1 if after is not None else 0
+    terms = query.lower().split()
+
+    page: list[StaffRef] = []
+    if not terms:
+        for s in rows[start:start + limit + 1]:
+            if active_only and not s.active:
+                # Active people come first, so the rest are all inactive
+                break
+            page.append(s)
+        return (page[:limit], page[limit - 1].id) if len(page) > limit else (page, None)
+
+    # Jump between occurrences of the longest word; the others are
+    # checked on the matching person only
+    text, offsets, haystacks = data["search_text"], data["offsets"], data["haystacks"]
+    longest = max(terms, key=len)
+    others = [t for t in terms if t is not longest]
+    pos = offsets[start] if start < len(rows) else len(text)
+    while (pos := text.find(longest, pos)) >= 0:
+        i = bisect_right(offsets, pos) - 1
+        s = rows[i]
+        if active_only and not s.active:
+            break
+        if all(t in haystacks[i] for t in others):
+            if len(page) == limit:
+                return page, page[-1].id
+            page.append(s)
+        # On to the next person's line
+        pos = offsets[i + 1] if i + 1 < len(rows) else len(text)
+    return page, None
+
+
+def api_token_hashes(db: Session) -> frozenset[str]:
+    """SHA-256 hex digests of the active API tokens."""
+    return _get(db, "api_tokens")["hashes"]
+
+
+def active_first(items):
+    """Active items first, keeping the name order within each group."""
+    return sorted(items, key=lambda item: not item.active)
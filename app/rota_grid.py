@@ -0,0 +1,54 @@
+from __future__ import annotations
+from datetime import date
+from typing import Iterable
+from markupsafe import Markup, escape
+
+from .availability import Availability
+
+
+class StaffOptions:
+    """
+    Pre-rendered <option> lists for the rota grid's staff pickers.
+
+    The option list only varies by day (the "(unavailable)" marker), so it
+    is rendered once per day of the view and reused by every cell in that
+    column. Marking the selected staff member is a single string replace
+    rather than a loop over staff in the template.
+    """
+
+    def __init__(self, staff: Iterable, days: Iterable[date], unavailable: Availability):
+        staff = list(staff)
+        self._by_day: dict[date, str] = {}
+        for d in days:
+            parts = ['<option value="">Unassigned</option>']
+            for s in staff:
+                label = escape(s.full_name)
+                if unavailable.is_off(s.id, d):
+                    label += " (unavailable)"
+                parts.append(f'<option value="{s.id}">{label}</option>')
+            self._by_day[d] = "".join(parts)
+
+    def __call__(self, day: date, selected_id: int | None = None) -> Markup:
+        html = self._by_day[day]
+        if selected_id:
+            needle = f'<option value="{selected_id}">'
+            html = html.replace(needle, f'<option value="{selected_id}" selected>', 1)
+        return Markup(html)
+
+
+def cell_contact(staff) -> Markup:
+    """
+    The phone / extension / bleep line under an editable cell's picker.
+    Plain Python rather than a template macro: it runs once per cell, and
+    /rota/cell renders it on its own after an edit.
+    """
+    if staff is None:
+        return Markup("")
+    parts = []
+    if staff.phone:
+        parts.append(f"📞 {escape(staff.phone)}")
+    if staff.extension:
+        parts.append(f"Ext {escape(staff.extension)}")
+    if staff.bleep:
+        parts.append(f"📟 {escape(staff.bleep)}")
+    return Markup(f'<div class="small text-muted mt-1 rota-cell-contact">{" · ".join(parts)}</div>')
@@ -0,0 +1,96 @@
+from __future__ import annotations
+from datetime import date, timedelta
+
+from fastapi import APIRouter, Request, Query, Depends
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..db import get_async_session
+from ..auth import api_token_valid
+from .. import oncall, refdata
+from ..conflicts import find_conflicts
+from ..utils import now_local
+
+router = APIRouter(prefix="/api", tags=["api"])
+
+
+def _unauthorized() -> JSONResponse:
+    return JSONResponse(
+        {"detail": "missing or invalid API token"},
+        status_code=401,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _oncall_response(db: Session, request: Request, rota_id: int | None, day: date | None) -> JSONResponse:
+    # Everything here is served from in-process caches; the database is
+    # only touched for periodic version checks or dates outside the window
+    if not api_token_valid(request, db):
+        return _unauthorized()
+
+    rotas = refdata.active_rotas(db)
+    if rota_id is not None:
+        rotas = tuple(r for r in rotas if r.id == rota_id)
+        if not rotas:
+            return JSONResponse({"detail": "unknown rota"}, status_code=404)
+
+    day = day or now_local().date()
+    return JSONResponse(
+        {
+            "date": day.isoformat(),
+            "rotas": [
+                {"id": rota.id, "name": rota.name, "shifts": oncall.on_call(db, rota, day)}
+                for rota in rotas
+            ],
+        }
+    )
+
+
+@router.get("/oncall/now")
+async def oncall_now(
+    request: Request,
+    rota_id: int | None = Query(default=None),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """Today's on-call (APP_TIMEZONE) for one rota, or every active rota."""
+    return await db.run_sync(_oncall_response, request, rota_id, None)
+
+
+@router.get("/oncall")
+async def oncall_on(
+    request: Request,
+    rota_id: int | None = Query(default=None),
+    day: date | None = Query(default=None, alias="date"),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """On-call for `date` (YYYY-MM-DD, default today)."""
+    return await db.run_sync(_oncall_response, request, rota_id, day)
+
+
+def _conflicts_response(
+    db: Session, request: Request, start: date | None, end: date | None, rota_id: int | None
+) -> JSONResponse:
+    if not api_token_valid(request, db):
+        return _unauthorized()
+    if rota_id is not None and not any(r.id == rota_id for r in refdata.active_rotas(db)):
+        return JSONResponse({"detail": "unknown rota"}, status_code=404)
+
+    first = start or now_local().date()
+    last = end or first + timedelta(days=27)
+    return JSONResponse(find_conflicts(db, first, last, rota_id=rota_id).as_dict())
+
+
+@router.get("/conflicts")
+async def conflicts(
+    request: Request,
+    start: date | None = Query(default=None),
+    end: date | None = Query(default=None),
+    rota_id: int | None = Query(default=None),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    Time off clashes, double bookings and unstaffed shifts from `start`
+    (default today) to `end` (default four weeks on, at most a year).
+    """
+    return await db.run_sync(_conflicts_response, request, start, end, rota_id)
@@ -0,0 +1,133 @@
+from __future__ import annotations
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Request, Form, Query, BackgroundTasks, Depends
+from fastapi.responses import RedirectResponse
+from sqlalchemy.orm import Session
+
+from ..db import SessionLocal, get_session
+from ..auth import get_current_user, require_role
+from .. import refdata
+from ..autoschedule import create_job, get_job, run_job, apply_job
+from ..utils import now_local, start_of_week
+
+router = APIRouter(prefix="/autoschedule", tags=["autoschedule"])
+
+# Longest span a single run may cover (a quarter plus change)
+MAX_AUTOSCHEDULE_DAYS = 7 * 14
+
+
+@router.get("")
+def autoschedule_form(
+    request: Request,
+    rota_id: int | None = Query(default=None),
+    db: Session = Depends(get_session),
+):
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
+
+    rotas = refdata.active_rotas(db)
+    if not rotas:
+        return RedirectResponse("/", status_code=303)
+
+    current_rota = next((r for r in rotas if r.id == rota_id), rotas[0])
+    start = start_of_week(now_local().date())
+
+    return request.app.state.templates.TemplateResponse(
+        "autoschedule.html",
+        {
+            "request": request,
+            "user": user,
+            "rotas": rotas,
+            "current_rota": current_rota,
+            "job": None,
+            "default_start": start,
+            "default_end": start + timedelta(weeks=4, days=-1),
+        },
+    )
+
+
+@router.post("")
+def autoschedule_start(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    rota_id: int = Form(...),
+    start_date: str = Form(...),
+    end_date: str = Form(...),
+    min_rest_days: int = Form(0),
+    db: Session = Depends(get_session),
+):
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
+
+    sd = datetime.strptime(start_date, "%Y-%m-%d").date()
+    ed = datetime.strptime(end_date, "%Y-%m-%d").date()
+    if ed < sd:
+        sd, ed = ed, sd
+    ed = min(ed, sd + timedelta(days=MAX_AUTOSCHEDULE_DAYS - 1))
+
+    job_id = create_job(db, rota_id, sd, ed, max(0, min_rest_days))
+    # The job runs after the response, so it opens its own session
+    background_tasks.add_task(run_job, job_id, SessionLocal)
+    return RedirectResponse(f"/autoschedule/{job_id}", status_code=303)
+
+
+@router.get("/{job_id}")
+def autoschedule_preview(request: Request, job_id: str, db: Session = Depends(get_session)):
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
+
+    job = get_job(db, job_id)
+    if not job:
+        return RedirectResponse("/autoschedule", status_code=303)
+
+    rotas = refdata.active_rotas(db)
+    current_rota = next((r for r in rotas if r.id == job["rota_id"]), None)
+
+    shift_types = {}
+    staff_by_id = {}
+    if job["status"] == "ready":
+        shift_types = {st.id: st for st in refdata.shift_types(db, job["rota_id"])}
+        staff_by_id = refdata.active_staff_by_id(db)
+
+    return request.app.state.templates.TemplateResponse(
+        "autoschedule.html",
+        {
+            "request": request,
+            "user": user,
+            "rotas": rotas,
+            "current_rota": current_rota,
+            "job": job,
+            "shift_types": shift_types,
+            "staff_by_id": staff_by_id,
+        },
+    )
+
+
+@router.post("/{job_id}/apply")
+def autoschedule_apply(request: Request, job_id: str, db: Session = Depends(get_session)):
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
+
+    job = get_job(db, job_id)
+    if not job or job["status"] != "ready":
+        return RedirectResponse("/autoschedule", status_code=303)
+
+    apply_job(db, job_id)
+
+    return RedirectResponse(
+        f"/rota/range?rota_id={job['rota_id']}&start={job['start'].isoformat()}"
+        f"&end={job['end'].isoformat()}",
+        status_code=303,
+    )
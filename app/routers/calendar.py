@@ -0,0 +1,199 @@
+from __future__ import annotations
+from datetime import datetime
+from typing import Callable, Iterator
+
+from fastapi import APIRouter, Request, Query, Depends
+from fastapi.responses import PlainTextResponse, RedirectResponse, StreamingResponse
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from ..db import engine, get_session
+from ..auth import get_current_user, sign_feed, feed_token_valid, invalidate_user
+from ..models import RotaEntry, User
+from .. import ics, refdata
+from ..http_cache import data_version, etag_for, not_modified, set_etag
+from ..utils import buffered
+
+router = APIRouter(prefix="/calendar", tags=["calendar"])
+
+ICS_MEDIA_TYPE = "text/calendar; charset=utf-8"
+
+# Rows fetched per round trip while streaming a feed
+FEED_BATCH = 500
+
+FEED_COLUMNS = (
+    RotaEntry.id,
+    RotaEntry.rota_id,
+    RotaEntry.shift_date,
+    RotaEntry.shift_type_id,
+    RotaEntry.staff_id,
+    RotaEntry.notes,
+    RotaEntry.updated_at,
+)
+
+
+def calendar_url(user, kind: str, item_id: int) -> str:
+    """
+    Subscribable feed URL (kind is "staff" or "rota") signed for `user`,
+    who can reset their links; a template global.
+    """
+    return f"/calendar/{kind}/{item_id}.ics?token={sign_feed(user, kind, item_id)}"
+
+
+def _stream(name: str, stmt, make_event: Callable) -> Iterator[str]:
+    # Runs while the response is being sent, after the request's session
+    # has closed, so it has its own connection. yield_per streams rows
+    # (a server-side cursor on PostgreSQL) instead of fetching them all.
+    with engine.connect() as conn:
+        rows = conn.execution_options(yield_per=FEED_BATCH).execute(stmt)
+        yield from buffered(ics.calendar(name, (make_event(row) for row in rows)))
+
+
+def _feed(
+    request: Request,
+    db: Session,
+    kind: str,
+    item_id: int,
+    name: str,
+    where: tuple,
+    order_by: tuple,
+    make_event: Callable,
+    version_where: tuple,
+    use_last_modified: bool,
+):
+    """
+    Stream `where` as a feed, or answer 304. With use_last_modified, every
+    change moves max(updated_at) over `version_where`, so that alone
+    versions the feed and If-Modified-Since is honoured; otherwise the row
+    count goes into the ETag as well.
+    """
+    if use_last_modified:
+        last_modified = db.execute(select(func.max(RotaEntry.updated_at)).where(*version_where)).scalar()
+        count = None
+    else:
+        last_modified, count = db.execute(
+            select(func.max(RotaEntry.updated_at), func.count()).where(*version_where)
+        ).one()
+    etag = etag_for("ics", kind, item_id, last_modified, count, data_version(db))
+    if last_modified is None:
+        last_modified = datetime.utcnow()
+
+    cached = not_modified(request, etag, last_modified if use_last_modified else None)
+    if cached:
+        return cached
+
+    stmt = select(*FEED_COLUMNS).where(*where).order_by(*order_by)
+    response = StreamingResponse(_stream(name, stmt, make_event), media_type=ICS_MEDIA_TYPE)
+    response.headers["Content-Disposition"] = f'inline; filename="{kind}-{item_id}.ics"'
+    return set_etag(response, etag, last_modified)
+
+
+def _authorised(request: Request, db: Session, kind: str, item_id: int, token: str | None) -> bool:
+    if token and feed_token_valid(db, token, kind, item_id):
+        return True
+    # Signed-in users can see every rota, so any of them may read a feed
+    return get_current_user(request, db) is not None
+
+
+def _uid(entry_id: int) -> str:
+    return f"rota-entry-{entry_id}@oncall-tracker"
+
+
+def reset_feeds(db: Session, user_id: int) -> None:
+    """Revoke every feed link signed for a user; new links use the next version."""
+    db.execute(update(User).where(User.id == user_id).values(feed_version=User.feed_version + 1))
+    db.commit()
+    invalidate_user(user_id)
+
+
+@router.post("/reset")
+def reset_my_feeds(request: Request, db: Session = Depends(get_session)):
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+    reset_feeds(db, user.id)
+    return RedirectResponse("/", status_code=303)
+
+
+@router.get("/staff/{staff_id}.ics")
+def staff_feed(
+    request: Request,
+    staff_id: int,
+    token: str | None = Query(default=None),
+    db: Session = Depends(get_session),
+):
+    if not _authorised(request, db, "staff", staff_id, token):
+        return PlainTextResponse("Unauthorized", status_code=401)
+    person = refdata.staff_by_id(db).get(staff_id)
+    if person is None:
+        return PlainTextResponse("Not Found", status_code=404)
+
+    rotas = {r.id: r for r in refdata.rotas(db)}
+    shift_types = refdata.shift_types_by_id(db)
+
+    def make_event(row):
+        rota = rotas.get(row.rota_id)
+        st = shift_types.get(row.shift_type_id)
+        summary = f"{rota.name if rota else 'Rota'}: {st.name if st else 'Shift'}"
+        return ics.event(_uid(row.id), row.shift_date, summary, row.updated_at, row.notes)
+
+    # Entries leave a person's feed by being reassigned, which moves the
+    # count but not max(updated_at), so Last-Modified alone cannot say
+    # "unchanged" here; only the ETag can.
+    return _feed(
+        request,
+        db,
+        "staff",
+        staff_id,
+        f"On call: {person.full_name}",
+        (RotaEntry.staff_id == staff_id,),
+        (RotaEntry.staff_id, RotaEntry.shift_date),
+        make_event,
+        version_where=(RotaEntry.staff_id == staff_id,),
+        use_last_modified=False,
+    )
+
+
+@router.get("/rota/{rota_id}.ics")
+def rota_feed(
+    request: Request,
+    rota_id: int,
+    token: str | None = Query(default=None),
+    db: Session = Depends(get_session),
+):
+    if not _authorised(request, db, "rota", rota_id, token):
+        return PlainTextResponse("Unauthorized", status_code=401)
+    rota = next((r for r in refdata.rotas(db) if r.id == rota_id), None)
+    if rota is None:
+        return PlainTextResponse("Not Found", status_code=404)
+
+    staff = refdata.staff_by_id(db)
+    shift_types = refdata.shift_types_by_id(db)
+
+    def make_event(row):
+        person = staff.get(row.staff_id)
+        st = shift_types.get(row.shift_type_id)
+        summary = f"{st.name if st else 'Shift'}: {person.full_name if person else 'Unknown'}"
+        contact = []
+        if person:
+            for label, value in (("Phone", person.phone), ("Ext", person.extension), ("Bleep", person.bleep)):
+                if value:
+                    contact.append(f"{label} {value}")
+        description = "\n".join(part for part in (", ".join(contact), row.notes) if part)
+        return ics.event(_uid(row.id), row.shift_date, summary, row.updated_at, description)
+
+    # Unassigned cells are left out of the feed but not of the version:
+    # entries are updated in place, never deleted, so max(updated_at) over
+    # the whole rota moves with every change, unassignments included.
+    return _feed(
+        request,
+        db,
+        "rota",
+        rota_id,
+        f"{rota.name} rota",
+        (RotaEntry.rota_id == rota_id, RotaEntry.staff_id.is_not(None)),
+        (RotaEntry.rota_id, RotaEntry.shift_date, RotaEntry.shift_type_id),
+        make_event,
+        version_where=(RotaEntry.rota_id == rota_id,),
+        use_last_modified=True,
+    )
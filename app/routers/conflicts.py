@@ -0,0 +1,56 @@
+from __future__ import annotations
+from datetime import date, datetime, timedelta
+from fastapi import APIRouter, Request, Query, Depends
+from fastapi.responses import RedirectResponse
+from sqlalchemy.orm import Session
+
+from ..db import get_session
+from ..auth import get_current_user, require_role
+from .. import refdata
+from ..conflicts import find_conflicts, MAX_DAYS
+from ..utils import now_local, start_of_week
+
+router = APIRouter(prefix="/conflicts", tags=["conflicts"])
+
+
+def _parse_date(value: str | None, default: date) -> date:
+    if not value:
+        return default
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        return default
+
+
+@router.get("")
+def conflicts_report(
+    request: Request,
+    start: str | None = Query(default=None),
+    end: str | None = Query(default=None),
+    rota_id: int | None = Query(default=None),
+    db: Session = Depends(get_session),
+):
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
+
+    # Four weeks from today unless asked otherwise
+    today = now_local().date()
+    first = _parse_date(start, today)
+    last = _parse_date(end, first + timedelta(days=27))
+    report = find_conflicts(db, first, last, rota_id=rota_id)
+
+    return request.app.state.templates.TemplateResponse(
+        "conflicts.html",
+        {
+            "request": request,
+            "user": user,
+            "rotas": refdata.active_rotas(db),
+            "report": report,
+            "max_days": MAX_DAYS,
+            # Rows link to the rota week they fall in
+            "week_of": start_of_week,
+        },
+    )
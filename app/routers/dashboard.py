@@ -1,51 +1,54 @@
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, Depends
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..db import SessionLocal
-from ..auth import get_current_user
-from ..models import Rota
+from ..db import get_async_session
+from ..auth import get_current_user_async
+from .. import refdata
 from ..utils import now_local
+from ..http_cache import is_etag_enabled, data_version, make_etag, not_modified, set_etag
 
 router = APIRouter()
 
 @router.get("/")
-def dashboard(request: Request):
-    db: Session = SessionLocal()
-    try:
-        user = get_current_user(request, db)
-        if not user:
-            return RedirectResponse("/login", status_code=303)
-
-        # Load all active rotas
-        rotas = (
-            db.query(Rota)
-            .filter(Rota.active == True)
-            .order_by(Rota.name.asc())
-            .all()
-        )
-
-        favourite_ids = user.favourite_rotas or []
-
-        favourite_rotas = []
-        other_rotas = []
-
-        for rota in rotas:
-            if rota.id in favourite_ids:
-                favourite_rotas.append(rota)
-            else:
-                other_rotas.append(rota)
-
-        return request.app.state.templates.TemplateResponse(
-            "dashboard.html",
-            {
-                "request": request,
-                "user": user,
-                "today": now_local().date(),
-                "favourite_rotas": favourite_rotas,
-                "other_rotas": other_rotas,
-            },
-        )
-
-    finally:
-        db.close()
+async def dashboard(request: Request, db: AsyncSession = Depends(get_async_session)):
+    user = await get_current_user_async(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+
+    favourite_ids = user.favourite_rotas or []
+    today = now_local().date()
+
+    etag = None
+    if is_etag_enabled():
+        version = await db.run_sync(data_version)
+        etag = make_etag(request, user, "dashboard", tuple(favourite_ids), today, version)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+
+    # Load all active rotas
+    rotas = await db.run_sync(refdata.active_rotas)
+
+    favourite_rotas = []
+    other_rotas = []
+
+    for rota in rotas:
+        if rota.id in favourite_ids:
+            favourite_rotas.append(rota)
+        else:
+            other_rotas.append(rota)
+
+    response = request.app.state.templates.TemplateResponse(
+        "dashboard.html",
+        {
+            "request": request,
+            "user": user,
+            "today": today,
+            "favourite_rotas": favourite_rotas,
+            "other_rotas": other_rotas,
+        },
+    )
+    if etag:
+        set_etag(response, etag)
+    return response
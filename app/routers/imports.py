@@ -0,0 +1,62 @@
+from __future__ import annotations
+from fastapi import APIRouter, Request, Form, File, UploadFile, Depends
+from fastapi.responses import RedirectResponse
+from sqlalchemy.orm import Session
+
+from ..db import get_session
+from ..auth import get_current_user, require_role
+from ..importer import ImportFileError, import_rota_entries, import_staff
+
+router = APIRouter(prefix="/import", tags=["import"])
+
+IMPORTERS = {
+    "staff": import_staff,
+    "rota": import_rota_entries,
+}
+
+
+def _render(request: Request, user, **extra):
+    return request.app.state.templates.TemplateResponse(
+        "import.html",
+        {"request": request, "user": user, "result": None, "kind": None, "error": None, **extra},
+    )
+
+
+@router.get("")
+def import_form(request: Request, db: Session = Depends(get_session)):
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
+    return _render(request, user)
+
+
+@router.post("")
+def import_upload(
+    request: Request,
+    kind: str = Form(...),
+    file: UploadFile = File(...),
+    dry_run: str = Form(None),
+    db: Session = Depends(get_session),
+):
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
+
+    importer = IMPORTERS.get(kind)
+    if importer is None:
+        return RedirectResponse("/import", status_code=303)
+
+    # The upload is spooled to a temporary file; the importer reads it a
+    # row at a time
+    try:
+        result = importer(db, file.filename or "", file.file, dry_run=(dry_run == "on"))
+    except ImportFileError as e:
+        # Raised only before anything is committed; a file that goes bad
+        # later comes back as a partial result (result.stopped)
+        db.rollback()
+        return _render(request, user, kind=kind, error=str(e))
+    return _render(request, user, kind=kind, result=result, filename=file.filename)
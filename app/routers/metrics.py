@@ -0,0 +1,26 @@
+import hmac
+import os
+from fastapi import APIRouter, Request
+from fastapi.responses import PlainTextResponse
+
+from ..instrumentation import metrics
+
+router = APIRouter(tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics")
+async def metrics_endpoint(request: Request):
+    # Scraped by Prometheus, so no session cookie; APP_METRICS_TOKEN must
+    # be sent as a bearer token instead. Without one configured the
+    # endpoint does not exist, so metrics are never public by accident.
+    token = os.getenv("APP_METRICS_TOKEN", "").strip()
+    if os.getenv("APP_METRICS", "1") == "0" or not token:
+        return PlainTextResponse("Not Found", status_code=404)
+
+    supplied = request.headers.get("authorization", "")
+    if not hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode()):
+        return PlainTextResponse("Unauthorized", status_code=401)
+
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,113 @@
+from __future__ import annotations
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Request, Form, Query, Depends
+from fastapi.responses import RedirectResponse
+from sqlalchemy.orm import Session
+
+from ..db import get_session
+from ..auth import get_current_user, require_role
+from .. import refdata
+from ..patterns import apply_pattern
+from ..utils import now_local, start_of_week
+
+router = APIRouter(prefix="/patterns", tags=["patterns"])
+
+# Number of staff slots offered in the cycle form
+CYCLE_SLOTS = 8
+# Longest span a single generation may cover
+MAX_PATTERN_DAYS = 366 * 2
+
+
+def _render_form(request: Request, db: Session, user, rota_id: int | None, error: str | None = None):
+    rotas = refdata.active_rotas(db)
+
+    if not rotas:
+        return RedirectResponse("/", status_code=303)
+
+    if rota_id:
+        current_rota = next((r for r in rotas if r.id == rota_id), None)
+    else:
+        current_rota = None
+
+    if current_rota is None:
+        current_rota = rotas[0]
+
+    shift_types = refdata.active_shift_types(db, current_rota.id)
+
+    start = start_of_week(now_local().date())
+    return request.app.state.templates.TemplateResponse(
+        "patterns.html",
+        {
+            "request": request,
+            "user": user,
+            "rotas": rotas,
+            "current_rota": current_rota,
+            "shift_types": shift_types,
+            "slots": range(CYCLE_SLOTS),
+            "default_start": start,
+            "default_end": start + timedelta(weeks=26, days=-1),
+            "error": error,
+        },
+    )
+
+
+@router.get("")
+def pattern_form(
+    request: Request,
+    rota_id: int | None = Query(default=None),
+    db: Session = Depends(get_session),
+):
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
+
+    return _render_form(request, db, user, rota_id)
+
+
+@router.post("")
+def pattern_apply(
+    request: Request,
+    rota_id: int = Form(...),
+    start_date: str = Form(...),
+    end_date: str = Form(...),
+    shift_type_ids: list[int] = Form([]),
+    staff_ids: list[str] = Form([]),
+    period: str = Form("weekly"),
+    overwrite: str = Form(None),
+    db: Session = Depends(get_session),
+):
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
+
+    sd = datetime.strptime(start_date, "%Y-%m-%d").date()
+    ed = datetime.strptime(end_date, "%Y-%m-%d").date()
+    if ed < sd:
+        sd, ed = ed, sd
+    ed = min(ed, sd + timedelta(days=MAX_PATTERN_DAYS - 1))
+
+    # Empty slots are skipped; order of the remaining slots is the cycle
+    cycle = [int(s) for s in staff_ids if s.strip()]
+
+    try:
+        apply_pattern(
+            db,
+            rota_id,
+            shift_type_ids,
+            cycle,
+            sd,
+            ed,
+            period_days=1 if period == "daily" else 7,
+            overwrite=(overwrite == "on"),
+        )
+    except ValueError as e:
+        return _render_form(request, db, user, rota_id, error=f"Nothing was generated: {e}.")
+
+    return RedirectResponse(
+        f"/rota/range?rota_id={rota_id}&start={sd.isoformat()}",
+        status_code=303,
+    )
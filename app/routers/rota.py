@@ -1,146 +1,265 @@
 from __future__ import annotations
 
 from datetime import date, timedelta, datetime
-from fastapi import APIRouter, Request, Form, Query
-from fastapi.responses import RedirectResponse
+from fastapi import APIRouter, Request, Form, Query, Body, Depends
+from fastapi.responses import RedirectResponse, StreamingResponse, JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from ..db import SessionLocal
-from ..auth import get_current_user, require_role
-from ..models import Rota, ShiftType, Staff, RotaEntry, TimeOff
-from ..utils import week_dates, start_of_week, now_local
+from ..db import get_session, get_async_session
+from ..auth import get_current_user, get_current_user_async, require_role
+from ..models import RotaEntry
+from .. import refdata, live
+from ..availability import load_availability
+from ..assignments import validate_assignments, upsert_assignments
+from ..rota_grid import StaffOptions, cell_contact
+from ..http_cache import is_etag_enabled, data_version, make_etag, not_modified, set_etag
+from ..utils import week_dates, start_of_week, now_local, buffered
 
 router = APIRouter(prefix="/rota", tags=["rota"])
 
+# Longest span /rota/range will render (a quarter plus change)
+MAX_RANGE_DAYS = 7 * 14
+
+
+def _parse_date(value: str | None, default: date) -> date:
+    if not value:
+        return default
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        return default
+
+
+def _load_grid(db: Session, rota_id: int, days: list[date], can_edit: bool) -> dict:
+    """
+    Load everything the rota grid needs for `days`. Shift types and staff
+    come from the reference-data cache; entries are fetched with a BETWEEN
+    on the indexed shift_date column rather than an IN list that grows with
+    the span.
+    """
+    first_day, last_day = days[0], days[-1]
+
+    # ---- SHIFT TYPES (per rota) / STAFF ----
+    shift_types = refdata.active_shift_types(db, rota_id)
+    staff = refdata.active_staff(db)
+
+    # ---- ROTA ENTRIES (per rota + span) ----
+    entries = (
+        db.query(RotaEntry)
+        .filter(
+            RotaEntry.rota_id == rota_id,
+            RotaEntry.shift_date.between(first_day, last_day),
+        )
+        .all()
+    )
+    entry_map = {(e.shift_date, e.shift_type_id): e for e in entries}
+
+    # ---- TIME OFF / CONFLICTS ----
+    unavailable = load_availability(db, first_day, last_day)
+
+    conflicts: set[tuple[date, int]] = set()
+    for (day, shift_type_id), e in entry_map.items():
+        if e and e.staff_id and unavailable.is_off(e.staff_id, day):
+            conflicts.add((day, shift_type_id))
+
+    return {
+        "shift_types": shift_types,
+        "staff": staff,
+        "staff_by_id": refdata.active_staff_by_id(db),
+        "staff_options": StaffOptions(staff, days, unavailable) if can_edit else None,
+        "cell_contact": cell_contact,
+        "entry_map": entry_map,
+        "unavailable": unavailable,
+        "conflicts": conflicts,
+    }
+
 
 @router.get("")
-def rota_week(
+async def rota_week(
     request: Request,
     week: str | None = Query(default=None),
     rota_id: int | None = Query(default=None),
+    db: AsyncSession = Depends(get_async_session),
 ):
-    db: Session = SessionLocal()
-    try:
-        user = get_current_user(request, db)
-        if not user:
-            return RedirectResponse("/login", status_code=303)
-
-        can_edit = require_role(user, {"Admin", "Manager"})
-
-        # Resolve date
-        if week:
-            try:
-                d = datetime.strptime(week, "%Y-%m-%d").date()
-            except ValueError:
-                d = now_local().date()
-        else:
-            d = now_local().date()
-
-        days = week_dates(d)
-        today = now_local().date()
-        week_start = start_of_week(d)
-        prev_week = (week_start - timedelta(days=7)).isoformat()
-        next_week = (week_start + timedelta(days=7)).isoformat()
-
-        # ---- ROTAS ----
-        rotas = (
-            db.query(Rota)
-            .filter(Rota.active == True)
-            .order_by(Rota.name.asc())
-            .all()
-        )
+    user = await get_current_user_async(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
 
-        if not rotas:
-            return RedirectResponse("/", status_code=303)
-
-        if rota_id:
-            current_rota = next((r for r in rotas if r.id == rota_id), None)
-        else:
-            current_rota = None
-
-        if current_rota is None:
-            current_rota = rotas[0]
-
-        # ---- SHIFT TYPES (per rota) ----
-        shift_types = (
-            db.query(ShiftType)
-            .filter(
-                ShiftType.active == True,
-                ShiftType.rota_id == current_rota.id,
-            )
-            .order_by(ShiftType.name.asc())
-            .all()
-        )
+    can_edit = require_role(user, {"Admin", "Manager"})
 
-        # ---- STAFF ----
-        staff = (
-            db.query(Staff)
-            .filter(Staff.active == True)
-            .order_by(Staff.full_name.asc())
-            .all()
-        )
+    # Resolve date
+    today = now_local().date()
+    d = _parse_date(week, today)
 
-        # ---- ROTA ENTRIES (per rota + week) ----
-        entries = (
-            db.query(RotaEntry)
-            .filter(
-                RotaEntry.rota_id == current_rota.id,
-                RotaEntry.shift_date.in_(days),
-            )
-            .all()
-        )
-        entry_map = {(e.shift_date, e.shift_type_id): e for e in entries}
-
-        # ---- TIME OFF / CONFLICTS ----
-        week_start_day = days[0]
-        week_end_day = days[-1]
-
-        time_off_items = (
-            db.query(TimeOff)
-            .filter(
-                TimeOff.start_date <= week_end_day,
-                TimeOff.end_date >= week_start_day,
-            )
-            .all()
-        )
+    days = week_dates(d)
+    week_start = start_of_week(d)
+    prev_week = (week_start - timedelta(days=7)).isoformat()
+    next_week = (week_start + timedelta(days=7)).isoformat()
 
-        unavailable: set[tuple[int, date]] = set()
-        for t in time_off_items:
-            cur = t.start_date
-            while cur <= t.end_date:
-                if week_start_day <= cur <= week_end_day:
-                    unavailable.add((t.staff_id, cur))
-                cur += timedelta(days=1)
-
-        conflicts: set[tuple[date, int]] = set()
-        for (day, shift_type_id), e in entry_map.items():
-            if e and e.staff_id and (e.staff_id, day) in unavailable:
-                conflicts.add((day, shift_type_id))
-
-        return request.app.state.templates.TemplateResponse(
-            "rota_week.html",
-            {
-                "request": request,
-                "user": user,
-                "can_edit": can_edit,
-                "days": days,
-                "today": today,
-                "week_start": week_start,
-                "prev_week": prev_week,
-                "next_week": next_week,
-                "rotas": rotas,
-                "current_rota": current_rota,
-                "rota_id": current_rota.id,
-                "shift_types": shift_types,
-                "staff": staff,
-                "entry_map": entry_map,
-                "unavailable": unavailable,
-                "conflicts": conflicts,
-            },
-        )
+    # ---- ROTAS ----
+    rotas = await db.run_sync(refdata.active_rotas)
+
+    if not rotas:
+        return RedirectResponse("/", status_code=303)
+
+    if rota_id:
+        current_rota = next((r for r in rotas if r.id == rota_id), None)
+    else:
+        current_rota = None
+
+    if current_rota is None:
+        current_rota = rotas[0]
+
+    # A refresh of an unchanged week is answered from the ETag alone
+    etag = None
+    if is_etag_enabled():
+        version = await db.run_sync(data_version, current_rota.id, days[0], days[-1])
+        etag = make_etag(request, user, "rota", current_rota.id, week_start, today, version)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+
+    # The grid loader is shared with the sync range view; run_sync drives
+    # it over the async connection.
+    grid = await db.run_sync(_load_grid, current_rota.id, days, can_edit)
+
+    # Rendering a large grid is CPU-bound; keep it off the event loop
+    response = await run_in_threadpool(
+        request.app.state.templates.TemplateResponse,
+        "rota_week.html",
+        {
+            "request": request,
+            "user": user,
+            "can_edit": can_edit,
+            "days": days,
+            "today": today,
+            "week_start": week_start,
+            "prev_week": prev_week,
+            "next_week": next_week,
+            "rotas": rotas,
+            "current_rota": current_rota,
+            "rota_id": current_rota.id,
+            **grid,
+        },
+    )
+    if etag:
+        set_etag(response, etag)
+    return response
+
+
+@router.get("/range")
+def rota_range(
+    request: Request,
+    start: str | None = Query(default=None),
+    end: str | None = Query(default=None),
+    rota_id: int | None = Query(default=None),
+    db: Session = Depends(get_session),
+):
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+
+    can_edit = require_role(user, {"Admin", "Manager"})
+
+    # Resolve span: whole weeks, Monday to Sunday, defaulting to four
+    today = now_local().date()
+    start_day = start_of_week(_parse_date(start, today))
+    end_day = _parse_date(end, start_day + timedelta(days=27))
+    if end_day < start_day:
+        end_day = start_day
+    end_day = start_of_week(end_day) + timedelta(days=6)
+    if (end_day - start_day).days >= MAX_RANGE_DAYS:
+        end_day = start_day + timedelta(days=MAX_RANGE_DAYS - 1)
 
-    finally:
-        db.close()
+    n_days = (end_day - start_day).days + 1
+    days = [start_day + timedelta(days=i) for i in range(n_days)]
+    weeks = [days[i:i + 7] for i in range(0, n_days, 7)]
+
+    # ---- ROTAS ----
+    rotas = refdata.active_rotas(db)
+
+    if not rotas:
+        return RedirectResponse("/", status_code=303)
+
+    if rota_id:
+        current_rota = next((r for r in rotas if r.id == rota_id), None)
+    else:
+        current_rota = None
+
+    if current_rota is None:
+        current_rota = rotas[0]
+
+    etag = None
+    if is_etag_enabled():
+        version = data_version(db, current_rota.id, start_day, end_day)
+        etag = make_etag(request, user, "rota_range", current_rota.id, start_day, end_day, today, version)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+
+    context = {
+        "request": request,
+        "user": user,
+        "can_edit": can_edit,
+        "days": days,
+        "weeks": weeks,
+        "today": today,
+        "start": start_day,
+        "end": end_day,
+        "prev_start": (start_day - timedelta(days=n_days)).isoformat(),
+        "prev_end": (start_day - timedelta(days=1)).isoformat(),
+        "next_start": (end_day + timedelta(days=1)).isoformat(),
+        "next_end": (end_day + timedelta(days=n_days)).isoformat(),
+        "n_weeks": len(weeks),
+        "rotas": rotas,
+        "current_rota": current_rota,
+        "rota_id": current_rota.id,
+        **_load_grid(db, current_rota.id, days, can_edit),
+    }
+
+    # Everything the template touches is loaded above, so the page can be
+    # streamed out after the request's session has been closed.
+    template = request.app.state.templates.get_template("rota_range.html")
+    response = StreamingResponse(
+        buffered(template.generate(context)),
+        media_type="text/html",
+    )
+    if etag:
+        set_etag(response, etag)
+    return response
+
+
+@router.get("/events")
+async def rota_events(
+    request: Request,
+    rota_id: int = Query(...),
+    start: str | None = Query(default=None),
+    end: str | None = Query(default=None),
+    client: str | None = Query(default=None),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    Server-Sent Events for an open rota page: a "change" event whenever an
+    assignment on this rota, or anyone's time off, is written for a day in
+    [start, end]. `client` is the page's id, so its own /rota/cell saves
+    are not echoed back to it.
+    """
+    user = await get_current_user_async(request, db)
+    if not user:
+        return JSONResponse({"error": "not authenticated"}, status_code=401)
+
+    first = _parse_date(start, start_of_week(now_local().date()))
+    last = _parse_date(end, first + timedelta(days=6))
+    last = min(max(last, first), first + timedelta(days=MAX_RANGE_DAYS - 1))
+
+    return StreamingResponse(
+        live.stream(rota_id, first, last, client),
+        media_type="text/event-stream",
+        # No caching, and no buffering by a proxy in front (nginx)
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/assign")
@@ -151,51 +270,107 @@ def assign(
     shift_type_id: int = Form(...),
     staff_id: str = Form(""),
     notes: str = Form(""),
+    db: Session = Depends(get_session),
 ):
-    db: Session = SessionLocal()
-    try:
-        user = get_current_user(request, db)
-        if not user:
-            return RedirectResponse("/login", status_code=303)
-
-        if not require_role(user, {"Admin", "Manager"}):
-            return RedirectResponse("/rota", status_code=303)
-
-        d = datetime.strptime(shift_date, "%Y-%m-%d").date()
-        st_id = int(shift_type_id)
-        rid = int(rota_id)
-        staff_id_val = int(staff_id) if staff_id.strip() else None
-
-        entry = (
-            db.query(RotaEntry)
-            .filter(
-                RotaEntry.rota_id == rid,
-                RotaEntry.shift_date == d,
-                RotaEntry.shift_type_id == st_id,
-            )
-            .first()
-        )
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
 
-        if not entry:
-            entry = RotaEntry(
-                rota_id=rid,
-                shift_date=d,
-                shift_type_id=st_id,
-                staff_id=staff_id_val,
-                notes=notes.strip() or None,
-            )
-            db.add(entry)
-        else:
-            entry.staff_id = staff_id_val
-            entry.notes = notes.strip() or None
-
-        db.commit()
-
-        week_start = (d - timedelta(days=d.weekday())).isoformat()
-        return RedirectResponse(
-            f"/rota?rota_id={rid}&week={week_start}",
-            status_code=303,
-        )
+    if not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/rota", status_code=303)
+
+    d = datetime.strptime(shift_date, "%Y-%m-%d").date()
+    rid = int(rota_id)
+
+    upsert_assignments(
+        db,
+        [
+            {
+                "rota_id": rid,
+                "shift_date": d,
+                "shift_type_id": int(shift_type_id),
+                "staff_id": int(staff_id) if staff_id.strip() else None,
+                "notes": notes.strip() or None,
+            }
+        ],
+    )
+    db.commit()
+
+    week_start = (d - timedelta(days=d.weekday())).isoformat()
+    return RedirectResponse(
+        f"/rota?rota_id={rid}&week={week_start}",
+        status_code=303,
+    )
+
+
+@router.post("/cell")
+def save_cell(
+    request: Request,
+    item: dict = Body(...),
+    db: Session = Depends(get_session),
+):
+    """
+    Save one grid cell from app.js. Body: {"rota_id", "shift_date",
+    "shift_type_id", "staff_id", "notes"}. Answers with what changes in
+    that cell (the conflict flag, recomputed for the one staff member and
+    day, and the contact line) so the page is patched rather than reloaded.
+    """
+    user = get_current_user(request, db)
+    if not user:
+        return JSONResponse({"error": "not authenticated"}, status_code=401)
+
+    if not require_role(user, {"Admin", "Manager"}):
+        return JSONResponse({"error": "forbidden"}, status_code=403)
+
+    rows, results = validate_assignments(db, [item])
+    if not rows:
+        return JSONResponse({"error": results[0]["error"]}, status_code=400)
+    row = rows[0]
+    # The page saving this has patched itself; /rota/events skips it
+    live.set_origin(db, request.headers.get("x-live-client"))
+    upsert_assignments(db, rows)
+    db.commit()
+
+    staff_id, d = row["staff_id"], row["shift_date"]
+    conflict = bool(staff_id) and load_availability(db, d, d, staff_ids=[staff_id]).is_off(staff_id, d)
+    staff = refdata.active_staff_by_id(db).get(staff_id) if staff_id else None
+    return JSONResponse(
+        {
+            "ok": True,
+            "staff_id": staff_id,
+            "notes": row["notes"],
+            "conflict": conflict,
+            "contact_html": str(cell_contact(staff)),
+        }
+    )
+
+
+@router.post("/assign/bulk")
+def assign_bulk(
+    request: Request,
+    entries: list = Body(..., embed=True),
+    db: Session = Depends(get_session),
+):
+    """
+    JSON bulk assignment. Body: {"entries": [{"rota_id", "shift_date",
+    "shift_type_id", "staff_id", "notes"}, ...]}. Valid rows are written
+    in one transaction; every row gets a result.
+    """
+    user = get_current_user(request, db)
+    if not user:
+        return JSONResponse({"error": "not authenticated"}, status_code=401)
+
+    if not require_role(user, {"Admin", "Manager"}):
+        return JSONResponse({"error": "forbidden"}, status_code=403)
+
+    rows, results = validate_assignments(db, entries)
+    applied = upsert_assignments(db, rows)
+    db.commit()
 
-    finally:
-        db.close()
+    return JSONResponse(
+        {
+            "applied": applied,
+            "failed": sum(1 for r in results if not r["ok"]),
+            "results": results,
+        }
+    )
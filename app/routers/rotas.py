@@ -1,34 +1,31 @@
-from fastapi import APIRouter, Request, Form
+from fastapi import APIRouter, Request, Form, Depends
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 
-from ..db import SessionLocal
+from ..db import get_session
 from ..auth import get_current_user, require_role
 from ..models import Rota
+from .. import refdata
 
 router = APIRouter(prefix="/rotas", tags=["rotas"])
 
 
 @router.get("")
-def list_rotas(request: Request):
-    db: Session = SessionLocal()
-    try:
-        user = get_current_user(request, db)
-        if not user or not require_role(user, {"Admin", "Manager"}):
-            return RedirectResponse("/", status_code=303)
+def list_rotas(request: Request, db: Session = Depends(get_session)):
+    user = get_current_user(request, db)
+    if not user or not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
 
-        rotas = db.query(Rota).order_by(Rota.active.desc(), Rota.name.asc()).all()
+    rotas = refdata.active_first(refdata.rotas(db))
 
-        return request.app.state.templates.TemplateResponse(
-            "rotas.html",
-            {
-                "request": request,
-                "user": user,
-                "rotas": rotas,
-            },
-        )
-    finally:
-        db.close()
+    return request.app.state.templates.TemplateResponse(
+        "rotas.html",
+        {
+            "request": request,
+            "user": user,
+            "rotas": rotas,
+        },
+    )
 
 
 @router.post("/new")
@@ -37,24 +34,22 @@ def create_rota(
     name: str = Form(...),
     description: str = Form(""),
     active: str = Form("on"),
+    db: Session = Depends(get_session),
 ):
-    db: Session = SessionLocal()
-    try:
-        user = get_current_user(request, db)
-        if not user or not require_role(user, {"Admin", "Manager"}):
-            return RedirectResponse("/", status_code=303)
+    user = get_current_user(request, db)
+    if not user or not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
 
-        db.add(
-            Rota(
-                name=name.strip(),
-                description=description.strip() or None,
-                active=(active == "on"),
-            )
+    db.add(
+        Rota(
+            name=name.strip(),
+            description=description.strip() or None,
+            active=(active == "on"),
         )
-        db.commit()
-        return RedirectResponse("/rotas", status_code=303)
-    finally:
-        db.close()
+    )
+    refdata.mark_changed(db, "rotas")
+    db.commit()
+    return RedirectResponse("/rotas", status_code=303)
 
 
 @router.post("/{rota_id}")
@@ -64,20 +59,18 @@ def update_rota(
     name: str = Form(...),
     description: str = Form(""),
     active: str = Form(None),
+    db: Session = Depends(get_session),
 ):
-    db: Session = SessionLocal()
-    try:
-        user = get_current_user(request, db)
-        if not user or not require_role(user, {"Admin", "Manager"}):
-            return RedirectResponse("/", status_code=303)
+    user = get_current_user(request, db)
+    if not user or not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
 
-        rota = db.query(Rota).filter(Rota.id == rota_id).first()
-        if rota:
-            rota.name = name.strip()
-            rota.description = description.strip() or None
-            rota.active = (active == "on")
-            db.commit()
+    rota = db.query(Rota).filter(Rota.id == rota_id).first()
+    if rota:
+        rota.name = name.strip()
+        rota.description = description.strip() or None
+        rota.active = (active == "on")
+        refdata.mark_changed(db, "rotas")
+        db.commit()
 
-        return RedirectResponse("/rotas", status_code=303)
-    finally:
-        db.close()
+    return RedirectResponse("/rotas", status_code=303)
@@ -1,30 +1,67 @@
 import os
-from fastapi import APIRouter, Request, Form
+from fastapi import APIRouter, Request, Form, Depends
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
-from ..db import SessionLocal
-from ..auth import get_current_user, require_role
+from ..db import get_session
+from ..auth import get_current_user, require_role, new_api_token
+from ..models import ApiToken
+from .. import refdata
 
 router = APIRouter(prefix="/settings", tags=["settings"])
 
+
+def _render(request: Request, user, db: Session, **extra):
+    org_name = os.getenv("APP_ORG_NAME", "Your Organisation")
+    tz = os.getenv("APP_TIMEZONE", "Europe/London")
+    api_tokens = db.query(ApiToken).order_by(ApiToken.active.desc(), ApiToken.created_at.desc()).all()
+    return request.app.state.templates.TemplateResponse(
+        "settings.html",
+        {"request": request, "user": user, "org_name": org_name, "tz": tz, "api_tokens": api_tokens, **extra},
+    )
+
 @router.get("")
-def settings_page(request: Request):
-    db: Session = SessionLocal()
-    try:
-        user = get_current_user(request, db)
-        if not user:
-            return RedirectResponse("/login", status_code=303)
-        if not require_role(user, {"Admin"}):
-            return RedirectResponse("/", status_code=303)
-
-        org_name = os.getenv("APP_ORG_NAME", "Your Organisation")
-        tz = os.getenv("APP_TIMEZONE", "Europe/London")
-        return request.app.state.templates.TemplateResponse("settings.html", {"request": request, "user": user, "org_name": org_name, "tz": tz})
-    finally:
-        db.close()
+def settings_page(request: Request, db: Session = Depends(get_session)):
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(user, {"Admin"}):
+        return RedirectResponse("/", status_code=303)
+
+    return _render(request, user, db)
 
 @router.post("")
 def update_settings(request: Request, org_name: str = Form(...), timezone: str = Form(...)):
     # For ALPHA v1 we store settings in environment variables; next version will store in DB.
     # This endpoint simply redirects with a note.
     return RedirectResponse("/settings?note=Settings+are+environment-based+in+ALPHA+v1", status_code=303)
+
+@router.post("/api-tokens")
+def create_api_token(request: Request, name: str = Form(...), db: Session = Depends(get_session)):
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(user, {"Admin"}):
+        return RedirectResponse("/", status_code=303)
+
+    token, token_hash = new_api_token()
+    db.add(ApiToken(name=name.strip() or "API token", token_hash=token_hash, active=True))
+    refdata.mark_changed(db, "api_tokens")
+    db.commit()
+
+    # Only the hash is kept, so this is the one time the token is shown
+    return _render(request, user, db, new_token=token)
+
+@router.post("/api-tokens/{token_id}/revoke")
+def revoke_api_token(request: Request, token_id: int, db: Session = Depends(get_session)):
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(user, {"Admin"}):
+        return RedirectResponse("/", status_code=303)
+
+    item = db.get(ApiToken, token_id)
+    if item and item.active:
+        item.active = False
+        refdata.mark_changed(db, "api_tokens")
+        db.commit()
+    return RedirectResponse("/settings", status_code=303)
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Request, Form, Query
+from fastapi import APIRouter, Request, Form, Query, Depends
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 
-from ..db import SessionLocal
+from ..db import get_session
 from ..auth import get_current_user, require_role
-from ..models import Rota, ShiftType
+from ..models import ShiftType
+from .. import refdata
 
 router = APIRouter(prefix="/shift-types", tags=["shift-types"])
 
@@ -13,57 +14,43 @@ router = APIRouter(prefix="/shift-types", tags=["shift-types"])
 def list_shift_types(
     request: Request,
     rota_id: int | None = Query(default=None),
+    db: Session = Depends(get_session),
 ):
-    db: Session = SessionLocal()
-    try:
-        user = get_current_user(request, db)
-        if not user:
-            return RedirectResponse("/login", status_code=303)
-
-        if not require_role(user, {"Admin", "Manager"}):
-            return RedirectResponse("/", status_code=303)
-
-        # Load rotas
-        rotas = (
-            db.query(Rota)
-            .filter(Rota.active == True)
-            .order_by(Rota.name.asc())
-            .all()
-        )
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
 
-        if not rotas:
-            return RedirectResponse("/", status_code=303)
+    if not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
 
-        # Resolve current rota
-        if rota_id:
-            current_rota = next((r for r in rotas if r.id == rota_id), None)
-        else:
-            current_rota = None
+    # Load rotas
+    rotas = refdata.active_rotas(db)
 
-        if current_rota is None:
-            current_rota = rotas[0]
+    if not rotas:
+        return RedirectResponse("/", status_code=303)
 
-        # Load shift types for rota
-        items = (
-            db.query(ShiftType)
-            .filter(ShiftType.rota_id == current_rota.id)
-            .order_by(ShiftType.active.desc(), ShiftType.name.asc())
-            .all()
-        )
+    # Resolve current rota
+    if rota_id:
+        current_rota = next((r for r in rotas if r.id == rota_id), None)
+    else:
+        current_rota = None
 
-        return request.app.state.templates.TemplateResponse(
-            "shift_types.html",
-            {
-                "request": request,
-                "user": user,
-                "rotas": rotas,
-                "current_rota": current_rota,
-                "items": items,
-            },
-        )
+    if current_rota is None:
+        current_rota = rotas[0]
 
-    finally:
-        db.close()
+    # Load shift types for rota
+    items = refdata.shift_types(db, current_rota.id)
+
+    return request.app.state.templates.TemplateResponse(
+        "shift_types.html",
+        {
+            "request": request,
+            "user": user,
+            "rotas": rotas,
+            "current_rota": current_rota,
+            "items": items,
+        },
+    )
 
 
 @router.post("/new")
@@ -73,32 +60,29 @@ def create_shift_type(
     name: str = Form(...),
     description: str = Form(""),
     active: str = Form("on"),
+    db: Session = Depends(get_session),
 ):
-    db: Session = SessionLocal()
-    try:
-        user = get_current_user(request, db)
-        if not user:
-            return RedirectResponse("/login", status_code=303)
-
-        if not require_role(user, {"Admin", "Manager"}):
-            return RedirectResponse("/", status_code=303)
-
-        st = ShiftType(
-            rota_id=rota_id,
-            name=name.strip(),
-            description=description.strip() or None,
-            active=(active == "on"),
-        )
-        db.add(st)
-        db.commit()
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
 
-        return RedirectResponse(
-            f"/shift-types?rota_id={rota_id}",
-            status_code=303,
-        )
+    if not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
 
-    finally:
-        db.close()
+    st = ShiftType(
+        rota_id=rota_id,
+        name=name.strip(),
+        description=description.strip() or None,
+        active=(active == "on"),
+    )
+    db.add(st)
+    refdata.mark_changed(db, "shift_types")
+    db.commit()
+
+    return RedirectResponse(
+        f"/shift-types?rota_id={rota_id}",
+        status_code=303,
+    )
 
 
 @router.post("/{shift_type_id}")
@@ -109,39 +93,34 @@ def update_shift_type(
     name: str = Form(...),
     description: str = Form(""),
     active: str = Form(None),
+    db: Session = Depends(get_session),
 ):
-    db: Session = SessionLocal()
-    try:
-        user = get_current_user(request, db)
-        if not user:
-            return RedirectResponse("/login", status_code=303)
-
-        if not require_role(user, {"Admin", "Manager"}):
-            return RedirectResponse("/", status_code=303)
-
-        st = (
-            db.query(ShiftType)
-            .filter(
-                ShiftType.id == shift_type_id,
-                ShiftType.rota_id == rota_id,
-            )
-            .first()
-        )
-
-        if not st:
-            return RedirectResponse("/shift-types", status_code=303)
-
-        st.name = name.strip()
-        st.description = description.strip() or None
-        st.active = (active == "on")
-        db.commit()
-
-        return RedirectResponse(
-            f"/shift-types?rota_id={rota_id}",
-            status_code=303,
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+
+    if not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
+
+    st = (
+        db.query(ShiftType)
+        .filter(
+            ShiftType.id == shift_type_id,
+            ShiftType.rota_id == rota_id,
         )
-    
-    
-
-    finally:
-        db.close()
+        .first()
+    )
+
+    if not st:
+        return RedirectResponse("/shift-types", status_code=303)
+
+    st.name = name.strip()
+    st.description = description.strip() or None
+    st.active = (active == "on")
+    refdata.mark_changed(db, "shift_types")
+    db.commit()
+
+    return RedirectResponse(
+        f"/shift-types?rota_id={rota_id}",
+        status_code=303,
+    )
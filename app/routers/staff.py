@@ -1,52 +1,86 @@
-from fastapi import APIRouter, Request, Form
-from fastapi.responses import RedirectResponse
+from urllib.parse import urlencode
+from fastapi import APIRouter, Request, Form, Query, Depends
+from fastapi.responses import JSONResponse, RedirectResponse
 from sqlalchemy.orm import Session
-from ..db import SessionLocal
+from ..db import get_session
 from ..auth import get_current_user, require_role
 from ..models import Staff
+from .. import refdata
 
 router = APIRouter(prefix="/staff", tags=["staff"])
 
 
+# Rows per page of the directory, and the most a picker may ask for
+PAGE_SIZE = 50
+MAX_SEARCH_RESULTS = 50
+
+
 @router.get("")
-def list_staff(request: Request):
-    db: Session = SessionLocal()
-    try:
-        user = get_current_user(request, db)
-        if not user:
-            return RedirectResponse("/login", status_code=303)
-        if not require_role(user, {"Admin", "Manager"}):
-            return RedirectResponse("/", status_code=303)
-
-        staff = (
-            db.query(Staff)
-            .order_by(Staff.active.desc(), Staff.full_name.asc())
-            .all()
-        )
-        return request.app.state.templates.TemplateResponse(
-            "staff_list.html",
-            {"request": request, "user": user, "staff": staff},
-        )
-    finally:
-        db.close()
+def list_staff(
+    request: Request,
+    q: str = Query(default=""),
+    after: int | None = Query(default=None),
+    db: Session = Depends(get_session),
+):
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
+
+    q = q.strip()
+    staff, next_after = refdata.search_staff(db, q, after, PAGE_SIZE)
+    params = {"q": q} if q else {}
+    return request.app.state.templates.TemplateResponse(
+        "staff_list.html",
+        {
+            "request": request,
+            "user": user,
+            "staff": staff,
+            "q": q,
+            "first_url": "/staff?" + urlencode(params),
+            "next_url": "/staff?" + urlencode({**params, "after": next_after}) if next_after else None,
+            "paged": after is not None,
+        },
+    )
+
+
+@router.get("/search")
+def search_staff(
+    request: Request,
+    q: str = Query(default=""),
+    limit: int = Query(default=10, ge=1, le=MAX_SEARCH_RESULTS),
+    active: bool = Query(default=True),
+    db: Session = Depends(get_session),
+):
+    """Typeahead for staff pickers: [{id, full_name, team, email, active}]."""
+    user = get_current_user(request, db)
+    if not user:
+        return JSONResponse({"error": "not authenticated"}, status_code=401)
+    if not require_role(user, {"Admin", "Manager"}):
+        return JSONResponse({"error": "forbidden"}, status_code=403)
+
+    staff, _ = refdata.search_staff(db, q.strip(), limit=limit, active_only=active)
+    return JSONResponse(
+        [
+            {"id": s.id, "full_name": s.full_name, "team": s.team, "email": s.email, "active": s.active}
+            for s in staff
+        ]
+    )
 
 
 @router.get("/new")
-def new_staff_form(request: Request):
-    db: Session = SessionLocal()
-    try:
-        user = get_current_user(request, db)
-        if not user:
-            return RedirectResponse("/login", status_code=303)
-        if not require_role(user, {"Admin", "Manager"}):
-            return RedirectResponse("/", status_code=303)
-
-        return request.app.state.templates.TemplateResponse(
-            "staff_form.html",
-            {"request": request, "user": user, "staff_member": None},
-        )
-    finally:
-        db.close()
+def new_staff_form(request: Request, db: Session = Depends(get_session)):
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
+
+    return request.app.state.templates.TemplateResponse(
+        "staff_form.html",
+        {"request": request, "user": user, "staff_member": None},
+    )
 
 
 @router.post("/new")
@@ -59,51 +93,45 @@ def create_staff(
     extension: str = Form(""),
     bleep: str = Form(""),
     active: str = Form("on"),
+    db: Session = Depends(get_session),
 ):
-    db: Session = SessionLocal()
-    try:
-        user = get_current_user(request, db)
-        if not user:
-            return RedirectResponse("/login", status_code=303)
-        if not require_role(user, {"Admin", "Manager"}):
-            return RedirectResponse("/", status_code=303)
-
-        s = Staff(
-            full_name=full_name.strip(),
-            email=email.strip() or None,
-            phone=phone.strip() or None,
-            team=team.strip() or None,
-            extension=extension.strip() or None,
-            bleep=bleep.strip() or None,
-            active=(active == "on"),
-        )
-        db.add(s)
-        db.commit()
-        return RedirectResponse("/staff", status_code=303)
-    finally:
-        db.close()
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
+
+    s = Staff(
+        full_name=full_name.strip(),
+        email=email.strip() or None,
+        phone=phone.strip() or None,
+        team=team.strip() or None,
+        extension=extension.strip() or None,
+        bleep=bleep.strip() or None,
+        active=(active == "on"),
+    )
+    db.add(s)
+    refdata.mark_changed(db, "staff")
+    db.commit()
+    return RedirectResponse("/staff", status_code=303)
 
 
 @router.get("/{staff_id}")
-def edit_staff_form(request: Request, staff_id: int):
-    db: Session = SessionLocal()
-    try:
-        user = get_current_user(request, db)
-        if not user:
-            return RedirectResponse("/login", status_code=303)
-        if not require_role(user, {"Admin", "Manager"}):
-            return RedirectResponse("/", status_code=303)
-
-        s = db.query(Staff).filter(Staff.id == staff_id).first()
-        if not s:
-            return RedirectResponse("/staff", status_code=303)
-
-        return request.app.state.templates.TemplateResponse(
-            "staff_form.html",
-            {"request": request, "user": user, "staff_member": s},
-        )
-    finally:
-        db.close()
+def edit_staff_form(request: Request, staff_id: int, db: Session = Depends(get_session)):
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
+
+    s = db.query(Staff).filter(Staff.id == staff_id).first()
+    if not s:
+        return RedirectResponse("/staff", status_code=303)
+
+    return request.app.state.templates.TemplateResponse(
+        "staff_form.html",
+        {"request": request, "user": user, "staff_member": s},
+    )
 
 
 @router.post("/{staff_id}")
@@ -117,28 +145,26 @@ def update_staff(
     extension: str = Form(""),
     bleep: str = Form(""),
     active: str = Form(None),
+    db: Session = Depends(get_session),
 ):
-    db: Session = SessionLocal()
-    try:
-        user = get_current_user(request, db)
-        if not user:
-            return RedirectResponse("/login", status_code=303)
-        if not require_role(user, {"Admin", "Manager"}):
-            return RedirectResponse("/", status_code=303)
-
-        s = db.query(Staff).filter(Staff.id == staff_id).first()
-        if not s:
-            return RedirectResponse("/staff", status_code=303)
-
-        s.full_name = full_name.strip()
-        s.email = email.strip() or None
-        s.phone = phone.strip() or None
-        s.team = team.strip() or None
-        s.extension = extension.strip() or None
-        s.bleep = bleep.strip() or None
-        s.active = (active == "on")
-
-        db.commit()
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
+
+    s = db.query(Staff).filter(Staff.id == staff_id).first()
+    if not s:
         return RedirectResponse("/staff", status_code=303)
-    finally:
-        db.close()
+
+    s.full_name = full_name.strip()
+    s.email = email.strip() or None
+    s.phone = phone.strip() or None
+    s.team = team.strip() or None
+    s.extension = extension.strip() or None
+    s.bleep = bleep.strip() or None
+    s.active = (active == "on")
+
+    refdata.mark_changed(db, "staff")
+    db.commit()
+    return RedirectResponse("/staff", status_code=303)
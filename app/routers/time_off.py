@@ -1,41 +1,146 @@
 from __future__ import annotations
-from datetime import datetime
-from fastapi import APIRouter, Request, Form
+from datetime import date, datetime
+from urllib.parse import urlencode
+from fastapi import APIRouter, Request, Form, Query, Depends
 from fastapi.responses import RedirectResponse
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from ..db import SessionLocal
-from ..auth import get_current_user, require_role
-from ..models import TimeOff, Staff
+from ..db import get_session, get_async_session
+from ..auth import get_current_user, get_current_user_async, require_role
+from ..models import TimeOff
+from .. import refdata, live
+from ..utils import now_local
 
 router = APIRouter(prefix="/time-off", tags=["time-off"])
 
 
-@router.get("")
-def time_off_list(request: Request):
-    db: Session = SessionLocal()
+# Rows per page of the list
+PAGE_SIZE = 50
+
+
+def _parse_date(value: str | None) -> date | None:
+    if not value:
+        return None
     try:
-        user = get_current_user(request, db)
-        if not user:
-            return RedirectResponse("/login", status_code=303)
-        if not require_role(user, {"Admin", "Manager"}):
-            return RedirectResponse("/", status_code=303)
-
-        staff = db.query(Staff).filter(Staff.active == True).order_by(Staff.full_name.asc()).all()
-        items = (
-            db.query(TimeOff)
-            .order_by(TimeOff.start_date.desc(), TimeOff.end_date.desc())
-            .all()
-        )
-
-        # preload staff names
-        staff_map = {s.id: s for s in staff}
-        return request.app.state.templates.TemplateResponse(
-            "time_off.html",
-            {"request": request, "user": user, "staff": staff, "items": items, "staff_map": staff_map},
-        )
-    finally:
-        db.close()
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def _parse_int(value: str | None) -> int | None:
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def _parse_cursor(value: str | None) -> tuple[date, int] | None:
+    """`after` is "<start_date>.<id>" of the last row of the previous page."""
+    if not value:
+        return None
+    day, _, item_id = value.partition(".")
+    sd, tid = _parse_date(day), _parse_int(item_id)
+    return (sd, tid) if sd and tid is not None else None
+
+
+@router.get("")
+async def time_off_list(
+    request: Request,
+    view: str = Query(default="upcoming"),
+    staff_id: str | None = Query(default=None),
+    team: str | None = Query(default=None),
+    start: str | None = Query(default=None),
+    end: str | None = Query(default=None),
+    after: str | None = Query(default=None),
+    db: AsyncSession = Depends(get_async_session),
+):
+    user = await get_current_user_async(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
+
+    all_staff = await db.run_sync(refdata.staff)
+    staff_map = await db.run_sync(refdata.staff_by_id)
+
+    today = now_local().date()
+    past = view == "past"
+    filters = {
+        "view": "past" if past else "upcoming",
+        "staff_id": _parse_int(staff_id),
+        "team": (team or "").strip() or None,
+        "start": _parse_date(start),
+        "end": _parse_date(end),
+    }
+
+    # Both views walk (start_date, id) and stop at the LIMIT. The start_date
+    # bounds are implied by the end_date ones but give the walk a starting
+    # point: "past" starts at today instead of at the latest booking, and
+    # "upcoming" at the earliest start among leave that has not ended
+    # instead of at the oldest row.
+    upcoming_total = None
+    if past:
+        conds = [TimeOff.end_date < today, TimeOff.start_date < today]
+        order = (TimeOff.start_date.desc(), TimeOff.id.desc())
+    else:
+        # The count is shown, and also keeps SQLite from answering a bare
+        # min() by walking start_date up from the oldest row; with it the
+        # covering end_date index is read instead
+        earliest, upcoming_total = (
+            await db.execute(
+                select(func.min(TimeOff.start_date), func.count()).where(TimeOff.end_date >= today)
+            )
+        ).one()
+        conds = [TimeOff.end_date >= today, TimeOff.start_date >= (earliest or today)]
+        order = (TimeOff.start_date.asc(), TimeOff.id.asc())
+    # The window keeps entries overlapping [start, end]
+    if filters["start"]:
+        conds.append(TimeOff.end_date >= filters["start"])
+    if filters["end"]:
+        conds.append(TimeOff.start_date <= filters["end"])
+    if filters["staff_id"] is not None:
+        conds.append(TimeOff.staff_id == filters["staff_id"])
+    elif filters["team"]:
+        # Resolved from the cached staff list rather than joining staff
+        ids = [s.id for s in all_staff if s.team == filters["team"]]
+        conds.append(TimeOff.staff_id.in_(ids))
+
+    cursor = _parse_cursor(after)
+    if cursor:
+        key = tuple_(TimeOff.start_date, TimeOff.id)
+        conds.append(key < tuple_(*cursor) if past else key > tuple_(*cursor))
+
+    rows = (
+        await db.execute(select(TimeOff).where(*conds).order_by(*order).limit(PAGE_SIZE + 1))
+    ).scalars().all()
+    items = rows[:PAGE_SIZE]
+
+    params = {k: v for k, v in filters.items() if v is not None}
+    next_url = None
+    if len(rows) > PAGE_SIZE:
+        last = items[-1]
+        next_url = "/time-off?" + urlencode({**params, "after": f"{last.start_date.isoformat()}.{last.id}"})
+
+    teams = sorted({s.team for s in all_staff if s.team})
+    return request.app.state.templates.TemplateResponse(
+        "time_off.html",
+        {
+            "request": request,
+            "user": user,
+            "teams": teams,
+            "items": items,
+            "staff_map": staff_map,
+            "filters": filters,
+            "first_url": "/time-off?" + urlencode(params),
+            "next_url": next_url,
+            "paged": cursor is not None,
+            "upcoming_total": upcoming_total,
+            "upcoming_url": "/time-off?" + urlencode({**params, "view": "upcoming"}),
+            "past_url": "/time-off?" + urlencode({**params, "view": "past"}),
+        },
+    )
 
 
 @router.post("/new")
@@ -45,48 +150,43 @@ def time_off_create(
     start_date: str = Form(...),
     end_date: str = Form(...),
     reason: str = Form(""),
+    db: Session = Depends(get_session),
 ):
-    db: Session = SessionLocal()
-    try:
-        user = get_current_user(request, db)
-        if not user:
-            return RedirectResponse("/login", status_code=303)
-        if not require_role(user, {"Admin", "Manager"}):
-            return RedirectResponse("/", status_code=303)
-
-        sd = datetime.strptime(start_date, "%Y-%m-%d").date()
-        ed = datetime.strptime(end_date, "%Y-%m-%d").date()
-        if ed < sd:
-            # swap if user entered backwards
-            sd, ed = ed, sd
-
-        item = TimeOff(
-            staff_id=int(staff_id),
-            start_date=sd,
-            end_date=ed,
-            reason=reason.strip() or None,
-        )
-        db.add(item)
-        db.commit()
-        return RedirectResponse("/time-off", status_code=303)
-    finally:
-        db.close()
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
+
+    sd = datetime.strptime(start_date, "%Y-%m-%d").date()
+    ed = datetime.strptime(end_date, "%Y-%m-%d").date()
+    if ed < sd:
+        # swap if user entered backwards
+        sd, ed = ed, sd
+
+    item = TimeOff(
+        staff_id=int(staff_id),
+        start_date=sd,
+        end_date=ed,
+        reason=reason.strip() or None,
+    )
+    db.add(item)
+    live.record(db, "time_off", None, sd, ed)
+    db.commit()
+    return RedirectResponse("/time-off", status_code=303)
 
 
 @router.post("/{time_off_id}/delete")
-def time_off_delete(request: Request, time_off_id: int):
-    db: Session = SessionLocal()
-    try:
-        user = get_current_user(request, db)
-        if not user:
-            return RedirectResponse("/login", status_code=303)
-        if not require_role(user, {"Admin", "Manager"}):
-            return RedirectResponse("/", status_code=303)
-
-        item = db.query(TimeOff).filter(TimeOff.id == time_off_id).first()
-        if item:
-            db.delete(item)
-            db.commit()
-        return RedirectResponse("/time-off", status_code=303)
-    finally:
-        db.close()
+def time_off_delete(request: Request, time_off_id: int, db: Session = Depends(get_session)):
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(user, {"Admin", "Manager"}):
+        return RedirectResponse("/", status_code=303)
+
+    item = db.query(TimeOff).filter(TimeOff.id == time_off_id).first()
+    if item:
+        db.delete(item)
+        live.record(db, "time_off", None, item.start_date, item.end_date)
+        db.commit()
+    return RedirectResponse("/time-off", status_code=303)
@@ -1,55 +1,87 @@
-from fastapi import APIRouter, Request, Form
+from urllib.parse import urlencode
+from fastapi import APIRouter, Request, Form, Query, Depends
 from fastapi.responses import RedirectResponse
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
-from ..db import SessionLocal
-from ..auth import get_current_user, require_role
-from ..models import User, Staff
+from ..db import get_session
+from ..auth import get_current_user, require_role, invalidate_user
+from ..models import User
+from .. import refdata
 from ..security import hash_password
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+# Users per page
+PAGE_SIZE = 50
+# Staff matched by name beyond this many are not searched for linked users
+MAX_STAFF_MATCHES = 500
+
 @router.get("")
-def list_users(request: Request):
-    db: Session = SessionLocal()
-    try:
-        current = get_current_user(request, db)
-        if not current:
-            return RedirectResponse("/login", status_code=303)
-        if not require_role(current, {"Admin"}):
-            return RedirectResponse("/", status_code=303)
+def list_users(request: Request,
+               q: str = Query(default=""),
+               after: str | None = Query(default=None),
+               db: Session = Depends(get_session)):
+    current = get_current_user(request, db)
+    if not current:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(current, {"Admin"}):
+        return RedirectResponse("/", status_code=303)
+
+    # Keyset pages by email, walking its unique index
+    query = db.query(User)
+    q = q.strip()
+    if q:
+        # Email prefix, as a range on its index, or linked to someone whose
+        # name, email or team matches (found in the cached staff list, then
+        # by the staff_id index)
+        prefix = q.lower()
+        match = and_(User.email >= prefix, User.email < prefix[:-1] + chr(ord(prefix[-1]) + 1))
+        staff_ids = [s.id for s in refdata.search_staff(db, q, limit=MAX_STAFF_MATCHES)[0]]
+        query = query.filter(or_(match, User.staff_id.in_(staff_ids)) if staff_ids else match)
+    if after:
+        query = query.filter(User.email > after)
+    users = query.order_by(User.email.asc()).limit(PAGE_SIZE + 1).all()
 
-        users = db.query(User).order_by(User.active.desc(), User.email.asc()).all()
-        staff = db.query(Staff).order_by(Staff.full_name.asc()).all()
-        return request.app.state.templates.TemplateResponse("users.html", {"request": request, "user": current, "users": users, "staff": staff})
-    finally:
-        db.close()
+    params = {"q": q} if q else {}
+    next_url = None
+    if len(users) > PAGE_SIZE:
+        users = users[:PAGE_SIZE]
+        next_url = "/users?" + urlencode({**params, "after": users[-1].email})
+
+    return request.app.state.templates.TemplateResponse("users.html", {
+        "request": request,
+        "user": current,
+        "users": users,
+        "staff_by_id": refdata.staff_by_id(db),
+        "q": q,
+        "first_url": "/users?" + urlencode(params),
+        "next_url": next_url,
+        "paged": bool(after),
+    })
 
 @router.post("/new")
 def create_user(request: Request,
                 email: str = Form(...),
                 password: str = Form(...),
                 role: str = Form(...),
-                staff_id: str = Form("")):
-    db: Session = SessionLocal()
-    try:
-        current = get_current_user(request, db)
-        if not current:
-            return RedirectResponse("/login", status_code=303)
-        if not require_role(current, {"Admin"}):
-            return RedirectResponse("/", status_code=303)
+                staff_id: str = Form(""),
+                db: Session = Depends(get_session)):
+    current = get_current_user(request, db)
+    if not current:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(current, {"Admin"}):
+        return RedirectResponse("/", status_code=303)
 
-        u = User(
-            email=email.lower().strip(),
-            password_hash=hash_password(password),
-            role=role,
-            staff_id=int(staff_id) if staff_id.strip() else None,
-            active=True,
-        )
-        db.add(u)
-        db.commit()
-        return RedirectResponse("/users", status_code=303)
-    finally:
-        db.close()
+    u = User(
+        email=email.lower().strip(),
+        password_hash=hash_password(password),
+        role=role,
+        staff_id=int(staff_id) if staff_id.strip() else None,
+        active=True,
+    )
+    db.add(u)
+    db.commit()
+    return RedirectResponse("/users", status_code=303)
 
 @router.post("/{user_id}")
 def update_user(request: Request,
@@ -58,26 +90,28 @@ def update_user(request: Request,
                 role: str = Form(...),
                 staff_id: str = Form(""),
                 active: str = Form(None),
-                new_password: str = Form("")):
-    db: Session = SessionLocal()
-    try:
-        current = get_current_user(request, db)
-        if not current:
-            return RedirectResponse("/login", status_code=303)
-        if not require_role(current, {"Admin"}):
-            return RedirectResponse("/", status_code=303)
-
-        u = db.query(User).filter(User.id == user_id).first()
-        if not u:
-            return RedirectResponse("/users", status_code=303)
+                new_password: str = Form(""),
+                reset_feeds: str = Form(None),
+                db: Session = Depends(get_session)):
+    current = get_current_user(request, db)
+    if not current:
+        return RedirectResponse("/login", status_code=303)
+    if not require_role(current, {"Admin"}):
+        return RedirectResponse("/", status_code=303)
 
-        u.email = email.lower().strip()
-        u.role = role
-        u.staff_id = int(staff_id) if staff_id.strip() else None
-        u.active = (active == "on")
-        if new_password.strip():
-            u.password_hash = hash_password(new_password.strip())
-        db.commit()
+    u = db.query(User).filter(User.id == user_id).first()
+    if not u:
         return RedirectResponse("/users", status_code=303)
-    finally:
-        db.close()
+
+    u.email = email.lower().strip()
+    u.role = role
+    u.staff_id = int(staff_id) if staff_id.strip() else None
+    u.active = (active == "on")
+    if new_password.strip():
+        u.password_hash = hash_password(new_password.strip())
+    if reset_feeds == "on":
+        # Calendar feed links signed for this user stop working
+        u.feed_version += 1
+    db.commit()
+    invalidate_user(u.id)
+    return RedirectResponse("/users", status_code=303)
@@ -1,2 +1,236 @@
-// Placeholder for ALPHA v1 enhancements.
-// Future: autosave rota changes, drag/drop assignments, conflict highlighting.
+// Staff pickers (_staff_picker.html): a text box that asks /staff/search
+// as you type and fills in the hidden staff_id beside it, so pages no
+// longer carry an <option> per member of staff.
+(function ($) {
+  var DELAY_MS = 150;
+  var LIMIT = 10;
+
+  function parts($el) {
+    var $picker = $el.closest(".staff-picker");
+    return {
+      picker: $picker,
+      id: $picker.find("input[type=hidden]"),
+      input: $picker.find(".staff-picker-input"),
+      menu: $picker.find(".staff-picker-menu")
+    };
+  }
+
+  function close(p) {
+    p.menu.removeClass("show").empty();
+  }
+
+  function choose(p, person) {
+    p.id.val(person.id);
+    p.input.val(person.full_name);
+    p.input[0].setCustomValidity("");
+    close(p);
+  }
+
+  function show(p, people) {
+    p.menu.empty();
+    if (!people.length) {
+      p.menu.append($('<span class="dropdown-item-text text-muted small"></span>').text("No matches"));
+    }
+    people.forEach(function (person) {
+      var $item = $('<a href="#" class="dropdown-item"></a>').text(person.full_name);
+      var detail = [person.team, person.email].filter(Boolean).join(" · ");
+      if (detail) {
+        $item.append($('<small class="text-muted ml-2"></small>').text(detail));
+      }
+      p.menu.append($item.data("person", person));
+    });
+    p.menu.addClass("show");
+  }
+
+  $(document).on("input", ".staff-picker-input", function () {
+    var p = parts($(this));
+    var q = p.input.val().trim();
+    // Typing invalidates the previous choice until a new one is picked
+    p.id.val("");
+    this.setCustomValidity(q ? "Choose someone from the list" : "");
+    clearTimeout(p.picker.data("timer"));
+    if (!q) {
+      close(p);
+      return;
+    }
+    p.picker.data("timer", setTimeout(function () {
+      var seq = (p.picker.data("seq") || 0) + 1;
+      p.picker.data("seq", seq);
+      $.getJSON("/staff/search", { q: q, limit: LIMIT, active: p.input.data("active") }, function (people) {
+        // Ignore answers to queries the user has already typed past
+        if (p.picker.data("seq") === seq) {
+          show(p, people);
+        }
+      });
+    }, DELAY_MS));
+  });
+
+  $(document).on("keydown", ".staff-picker-input", function (e) {
+    var p = parts($(this));
+    if (e.key === "Enter" && p.menu.hasClass("show")) {
+      var $first = p.menu.find(".dropdown-item").first();
+      if ($first.length) {
+        e.preventDefault();
+        choose(p, $first.data("person"));
+      }
+    } else if (e.key === "ArrowDown") {
+      e.preventDefault();
+      p.menu.find(".dropdown-item").first().trigger("focus");
+    } else if (e.key === "Escape") {
+      close(p);
+    }
+  });
+
+  $(document).on("keydown", ".staff-picker-menu .dropdown-item", function (e) {
+    if (e.key === "ArrowDown") {
+      e.preventDefault();
+      $(this).next(".dropdown-item").trigger("focus");
+    } else if (e.key === "ArrowUp") {
+      e.preventDefault();
+      var $prev = $(this).prev(".dropdown-item");
+      ($prev.length ? $prev : parts($(this)).input).trigger("focus");
+    }
+  });
+
+  $(document).on("click", ".staff-picker-menu .dropdown-item", function (e) {
+    e.preventDefault();
+    var p = parts($(this));
+    choose(p, $(this).data("person"));
+    p.input.trigger("focus");
+  });
+
+  $(document).on("click", function (e) {
+    $(".staff-picker-menu.show").each(function () {
+      if (!$.contains(this.parentNode, e.target)) {
+        close(parts($(this)));
+      }
+    });
+  });
+})(jQuery);
+
+// Rota grid cells (_rota_cell.html): a change is posted to /rota/cell as
+// JSON and the answer patches that one cell (conflict colour, contact
+// line), instead of the form posting to /rota/assign and the whole week
+// being fetched and rendered again.
+//
+// The page also follows /rota/events (the .rota-live notice in
+// rota_week.html / rota_range.html) and reloads when someone else changes
+// the rota, or shows the notice instead while a cell is being edited.
+(function ($) {
+  var NOTES_DELAY_MS = 600;
+  // Changes come in bursts (a pattern applied, an import); reload once
+  // they have settled
+  var RELOAD_DELAY_MS = 1000;
+  // Sent with saves so this page's own edits are not echoed back to it
+  var CLIENT_ID = Math.random().toString(36).slice(2, 10);
+  var saving = 0;
+
+  function state($form, text, cls) {
+    $form.find(".rota-cell-state")
+      .removeClass("text-muted text-success text-danger")
+      .addClass(cls)
+      .text(text);
+  }
+
+  function save($form) {
+    var seq = ($form.data("seq") || 0) + 1;
+    $form.data("seq", seq);
+    clearTimeout($form.data("timer"));
+    state($form, "Saving…", "text-muted");
+
+    saving += 1;
+    var body = {};
+    $.each($form.serializeArray(), function (_, field) {
+      body[field.name] = field.value;
+    });
+
+    $.ajax({
+      url: "/rota/cell",
+      method: "POST",
+      contentType: "application/json",
+      headers: { "X-Live-Client": CLIENT_ID },
+      data: JSON.stringify(body),
+      dataType: "json"
+    }).done(function (data) {
+      // A later edit of the same cell has been sent; its answer wins
+      if ($form.data("seq") !== seq) {
+        return;
+      }
+      $form.closest("td").toggleClass("bg-warning", data.conflict);
+      // Unassigned cells have no contact line, so it is re-added after
+      // the picker rather than replaced in place
+      $form.find(".rota-cell-contact").remove();
+      $form.find("select").after(data.contact_html);
+      state($form, "Saved", "text-success");
+    }).fail(function (xhr) {
+      if ($form.data("seq") !== seq) {
+        return;
+      }
+      if (xhr.status === 401) {
+        window.location = "/login";
+        return;
+      }
+      var error = xhr.responseJSON && xhr.responseJSON.error;
+      state($form, "Not saved" + (error ? ": " + error : ""), "text-danger");
+    }).always(function () {
+      saving -= 1;
+    });
+  }
+
+  function editing() {
+    return saving > 0 || $(document.activeElement).closest(".rota-cell-form").length > 0;
+  }
+
+  function follow($notice) {
+    var timer = null;
+    var stale = false;
+
+    function refresh() {
+      if (document.hidden || editing()) {
+        stale = true;
+        $notice.removeClass("d-none");
+      } else {
+        window.location.reload();
+      }
+    }
+
+    var source = new EventSource($notice.data("events") + "&client=" + CLIENT_ID);
+    source.addEventListener("change", function () {
+      clearTimeout(timer);
+      timer = setTimeout(refresh, RELOAD_DELAY_MS);
+    });
+
+    $(document).on("visibilitychange", function () {
+      if (stale && !document.hidden && !editing()) {
+        window.location.reload();
+      }
+    });
+  }
+
+  $(function () {
+    $(".rota-cell-form").each(function () {
+      $(this).find("button[type=submit]").addClass("d-none");
+      $(this).append('<div class="small rota-cell-state"></div>');
+    });
+
+    var $notice = $(".rota-live");
+    if ($notice.length && window.EventSource) {
+      follow($notice);
+    }
+  });
+
+  $(document).on("change", ".rota-cell-form select", function () {
+    save($(this).closest("form"));
+  });
+
+  $(document).on("input", ".rota-cell-form input[name=notes]", function () {
+    var $form = $(this).closest("form");
+    clearTimeout($form.data("timer"));
+    $form.data("timer", setTimeout(function () { save($form); }, NOTES_DELAY_MS));
+  });
+
+  $(document).on("submit", ".rota-cell-form", function (e) {
+    e.preventDefault();
+    save($(this));
+  });
+})(jQuery);
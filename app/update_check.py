@@ -1,8 +1,25 @@
+import json
+import os
 import requests
 import re
+import threading
+import time
+
+from .db import get_db_path
 
 GITHUB_REPO = "anthonyhales/TrackRota"
 
+def is_update_check_enabled() -> bool:
+    return os.getenv("APP_UPDATE_CHECK", "1") != "0"
+
+def get_update_cache_path() -> str:
+    # Defaults to living next to the SQLite file (the /data volume in Docker)
+    default = os.path.join(os.path.dirname(os.path.abspath(get_db_path())), "update_check.json")
+    return os.getenv("APP_UPDATE_CACHE_PATH", default)
+
+def get_update_check_ttl() -> float:
+    return float(os.getenv("APP_UPDATE_CHECK_TTL", str(6 * 60 * 60)))
+
 def get_latest_release():
     try:
         r = requests.get(
@@ -19,6 +36,41 @@ def get_latest_release():
         print("GitHub update check failed:", e)
         return None
 
+def load_cached_release() -> tuple[dict | None, bool]:
+    """
+    Returns (release, fresh). `fresh` is False when there is no cache or it
+    is older than the TTL. A failed check is cached too, so an air-gapped
+    install does not retry on every restart.
+    """
+    try:
+        with open(get_update_cache_path()) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None, False
+    fresh = time.time() - data.get("checked_at", 0) < get_update_check_ttl()
+    return data.get("release"), fresh
+
+def refresh_latest_release() -> dict | None:
+    release = get_latest_release()
+    try:
+        with open(get_update_cache_path(), "w") as f:
+            json.dump({"checked_at": time.time(), "release": release}, f)
+    except OSError as e:
+        print("Could not write update check cache:", e)
+    return release
+
+def start_background_check(on_result) -> threading.Thread:
+    """
+    Fetch the latest release on a daemon thread and pass it to
+    `on_result`, so neither startup nor shutdown waits on the network.
+    """
+    def run():
+        on_result(refresh_latest_release())
+
+    t = threading.Thread(target=run, name="update-check", daemon=True)
+    t.start()
+    return t
+
 def normalize(v: str) -> tuple[int, ...]:
     parts = re.findall(r"\d+", v)
     return tuple(int(p) for p in parts)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 from datetime import date, datetime, timedelta
+from typing import Iterator
 import os
 import pytz
 
@@ -20,3 +21,17 @@ def week_dates(d: date) -> list[date]:
 
 def is_favourite(user, rota_id: int) -> bool:
     return rota_id in (user.favourite_rotas or [])
+
+def buffered(chunks: Iterator[str], size: int = 64 * 1024) -> Iterator[str]:
+    # Generators yield many tiny strings; batch them so each streamed write
+    # (and threadpool hop) carries a useful amount of data.
+    buf: list[str] = []
+    n = 0
+    for chunk in chunks:
+        buf.append(chunk)
+        n += len(chunk)
+        if n >= size:
+            yield "".join(buf)
+            buf, n = [], 0
+    if buf:
+        yield "".join(buf)
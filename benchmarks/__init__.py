@@ -0,0 +1,4 @@
+"""
+Benchmarks and load tools. Each module runs standalone from the repo root,
+e.g. `python -m benchmarks.suite`; see the module docstrings.
+"""
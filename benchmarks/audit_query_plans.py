@@ -0,0 +1,220 @@
+"""
+Query-plan audit: drive every page through the app, capture each distinct
+SELECT the routers issue, and print SQLite's EXPLAIN QUERY PLAN for it.
+
+Plans that scan one of the large tables without an index, or sort rows
+from one through a temporary B-tree, are flagged and make the script exit
+non-zero, so a new query without a matching index shows up here before it
+shows up in production. Walking a whole table in index order (an
+unfiltered list page), and sorting a subquery's result (the matches of
+a report such as /conflicts), are not flagged.
+
+Run from the repo root (uses a throwaway SQLite database):
+    python -m benchmarks.audit_query_plans [-v]
+"""
+from __future__ import annotations
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+from datetime import date, timedelta
+
+os.environ["APP_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "audit.db")
+os.environ["APP_BOOTSTRAP_ADMIN_EMAIL"] = "audit@example.com"
+os.environ["APP_BOOTSTRAP_ADMIN_PASSWORD"] = "audit"
+os.environ["APP_UPDATE_CHECK"] = "0"
+os.environ["APP_AUTH_CACHE_TTL"] = "0"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+from app.db import SessionLocal, get_db_path  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Rota, ShiftType, Staff, RotaEntry, TimeOff  # noqa: E402
+from app.utils import start_of_week  # noqa: E402
+
+# Tables that grow with use; the rest stay small enough to scan
+LARGE_TABLES = {"rota_entries", "time_off", "staff", "shift_types"}
+
+_TABLE = re.compile(r"^(SCAN|SEARCH) (\w+)")
+_SOURCE = re.compile(r"^(SCAN|SEARCH) (\(?[\w-]+\)?)")
+
+captured: dict[str, tuple] = {}
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _capture(conn, cursor, statement, parameters, context, executemany):
+    if statement.lstrip().upper().startswith(("SELECT", "WITH")) and statement not in captured:
+        captured[statement] = parameters
+
+
+def seed(
+    week_start: date,
+    n_staff: int = 200,
+    n_rotas: int = 5,
+    n_shift_types: int = 10,
+    n_weeks: int = 8,
+) -> int:
+    db = SessionLocal()
+    try:
+        rotas = [Rota(name=f"Audit rota {i}", active=True) for i in range(n_rotas)]
+        db.add_all(rotas)
+        db.flush()
+        rota = rotas[0]
+        db.add_all(Staff(full_name=f"Staff {i:04d}", active=i % 10 != 0) for i in range(n_staff))
+        db.add_all(
+            ShiftType(rota_id=r.id, name=f"Shift {i:02d}", active=i % 5 != 0)
+            for r in rotas
+            for i in range(n_shift_types)
+        )
+        db.flush()
+        staff_ids = [s for (s,) in db.query(Staff.id)]
+        st_ids = [s for (s,) in db.query(ShiftType.id).filter(ShiftType.rota_id == rota.id)]
+        first = week_start - timedelta(days=7 * n_weeks)
+        days = [first + timedelta(days=i) for i in range(7 * n_weeks * 2)]
+        db.add_all(
+            RotaEntry(
+                rota_id=rota.id,
+                shift_date=d,
+                shift_type_id=st,
+                staff_id=staff_ids[(i * 7 + j) % len(staff_ids)],
+            )
+            for i, st in enumerate(st_ids)
+            for j, d in enumerate(days)
+        )
+        db.add_all(
+            TimeOff(
+                staff_id=sid,
+                start_date=first + timedelta(days=k * 9 + i % 7),
+                end_date=first + timedelta(days=k * 9 + i % 7 + 2),
+            )
+            for i, sid in enumerate(staff_ids)
+            for k in range(6)
+        )
+        db.commit()
+        return rota.id
+    finally:
+        db.close()
+
+
+def exercise(client: TestClient, rota_id: int, week_start: date) -> None:
+    end = week_start + timedelta(days=27)
+    paths = [
+        "/",
+        f"/rota?rota_id={rota_id}&week={week_start.isoformat()}",
+        f"/rota/range?rota_id={rota_id}&start={week_start.isoformat()}&end={end.isoformat()}",
+        "/time-off",
+        "/time-off?view=past",
+        "/time-off?view=past&staff_id=2",
+        "/staff",
+        "/staff/2",
+        "/users",
+        "/users?q=audit",
+        "/staff?q=a",
+        "/rotas",
+        f"/shift-types?rota_id={rota_id}",
+        "/settings",
+        "/patterns",
+        "/autoschedule",
+        "/conflicts",
+        f"/conflicts?rota_id={rota_id}&start={week_start.isoformat()}&end={(week_start + timedelta(days=364)).isoformat()}",
+        f"/calendar/rota/{rota_id}.ics",
+        "/calendar/staff/2.ics",
+    ]
+    for path in paths:
+        r = client.get(path)
+        assert r.status_code == 200, (path, r.status_code)
+
+    # Background tasks run inline under TestClient, so this also captures
+    # the planner's queries
+    r = client.post(
+        "/autoschedule",
+        data={"rota_id": rota_id, "start_date": week_start.isoformat(), "end_date": end.isoformat()},
+        follow_redirects=False,
+    )
+    assert r.status_code == 303, r.status_code
+    r = client.get(r.headers["location"])
+    assert r.status_code == 200, r.status_code
+
+    later = end + timedelta(days=1)
+    r = client.post(
+        "/patterns",
+        data={
+            "rota_id": rota_id,
+            "start_date": later.isoformat(),
+            "end_date": (later + timedelta(days=27)).isoformat(),
+            "shift_type_ids": [2, 3],
+            "staff_ids": ["2", "3", "4"],
+        },
+        follow_redirects=False,
+    )
+    assert r.status_code == 303, r.status_code
+
+    r = client.post(
+        "/rota/assign/bulk",
+        json={
+            "entries": [
+                {
+                    "rota_id": rota_id,
+                    "shift_date": week_start.isoformat(),
+                    "shift_type_id": 1,
+                    "staff_id": 2,
+                }
+            ]
+        },
+    )
+    assert r.status_code == 200, r.status_code
+
+
+def audit(verbose: bool = False) -> int:
+    conn = sqlite3.connect(get_db_path())
+    flagged = 0
+    for statement, params in captured.items():
+        if statement.startswith("SELECT schema_version") or "sqlite_" in statement:
+            continue
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + statement, params or ())]
+        tables = {m.group(2) for line in plan if (m := _TABLE.match(line))}
+        problems = []
+        source = None
+        for line in plan:
+            if m := _SOURCE.match(line):
+                source = m.group(2)
+            # A sort straight after reading a subquery or CTE sorts that
+            # result (the matches of a report), not a table
+            if "TEMP B-TREE" in line and tables & LARGE_TABLES and source in LARGE_TABLES:
+                problems.append(line)
+            elif line.startswith("SCAN ") and " USING " not in line and line.split()[1] in LARGE_TABLES:
+                problems.append(line)
+        if problems or verbose:
+            print("-" * 72)
+            print(" ".join(statement.split()))
+            for line in plan:
+                print(("  !! " if line in problems else "     ") + line)
+        flagged += bool(problems)
+    conn.close()
+    print("=" * 72)
+    print(f"{len(captured)} distinct queries, {flagged} flagged")
+    return flagged
+
+
+def main(verbose: bool = False) -> int:
+    week_start = start_of_week(date.today())
+    with TestClient(app) as client:
+        rota_id = seed(week_start)
+        with sqlite3.connect(get_db_path()) as conn:
+            conn.execute("ANALYZE")
+        r = client.post(
+            "/login",
+            data={"email": "audit@example.com", "password": "audit"},
+            follow_redirects=False,
+        )
+        client.cookies.set("oncall_session", r.cookies["oncall_session"])
+        captured.clear()
+        exercise(client, rota_id, week_start)
+    return audit(verbose)
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main("-v" in sys.argv[1:]) else 0)
@@ -0,0 +1,57 @@
+"""
+Benchmark: authenticated request throughput with and without the user
+cache (APP_AUTH_CACHE_TTL=0 reproduces the old per-request SELECT).
+
+Run from the repo root (uses a throwaway SQLite database):
+    python -m benchmarks.bench_auth [requests]
+"""
+from __future__ import annotations
+import os
+import sys
+import tempfile
+import time
+
+os.environ["APP_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["APP_BOOTSTRAP_ADMIN_EMAIL"] = "bench@example.com"
+os.environ["APP_BOOTSTRAP_ADMIN_PASSWORD"] = "bench"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+
+from app.auth import get_current_user, invalidate_user  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+def _resolve_loop(cookie: str, n: int) -> float:
+    headers = [(b"cookie", f"oncall_session={cookie}".encode())]
+    t0 = time.perf_counter()
+    for _ in range(n):
+        request = Request({"type": "http", "headers": headers, "state": {}})
+        assert get_current_user(request) is not None
+    return time.perf_counter() - t0
+
+
+def _request_loop(client: TestClient, n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        assert client.get("/settings").status_code == 200
+    return time.perf_counter() - t0
+
+
+def main(n: int = 2000) -> None:
+    with TestClient(app) as client:
+        client.post("/login", data={"email": "bench@example.com", "password": "bench"})
+        cookie = client.cookies["oncall_session"]
+
+        print(f"requests={n}")
+        for label, ttl in (("uncached (ttl=0)", "0"), ("cached (ttl=60)", "60")):
+            os.environ["APP_AUTH_CACHE_TTL"] = ttl
+            invalidate_user()
+            resolve = _resolve_loop(cookie, n)
+            full = _request_loop(client, n // 4)
+            print(f"  {label:18s} get_current_user {n / resolve:9.0f}/s   GET /settings {(n // 4) / full:7.0f}/s")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*args)
@@ -0,0 +1,49 @@
+"""
+Benchmark: auto-schedule a quarter for a rota with many shift types and
+hundreds of staff, entirely in memory.
+
+Run from the repo root:
+    python -m benchmarks.bench_autoschedule [staff] [shift_types] [days] [min_rest_days]
+"""
+from __future__ import annotations
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from app.availability import Availability
+from app.autoschedule import AutoScheduler
+
+
+def main(n_staff: int = 300, n_shift_types: int = 20, n_days: int = 91, min_rest: int = 2) -> None:
+    rnd = random.Random(1)
+    start = date(2026, 1, 5)
+    staff_ids = list(range(1, n_staff + 1))
+    cells = [
+        (start + timedelta(days=d), st)
+        for d in range(n_days)
+        for st in range(1, n_shift_types + 1)
+    ]
+    leave = []
+    for sid in staff_ids:
+        for _ in range(2):
+            s = start + timedelta(days=rnd.randrange(n_days))
+            leave.append((sid, s, s + timedelta(days=rnd.choice([1, 4, 9]))))
+    # Some pre-existing shifts on other rotas
+    busy = {sid: {start + timedelta(days=rnd.randrange(n_days)) for _ in range(3)} for sid in staff_ids}
+
+    t0 = time.perf_counter()
+    scheduler = AutoScheduler(1, cells, staff_ids, busy, {}, Availability(leave), min_rest_days=min_rest)
+    rows = scheduler.solve()
+    elapsed = time.perf_counter() - t0
+
+    loads = sorted(scheduler.load.values())
+    print(f"staff={n_staff} shift_types={n_shift_types} days={n_days} min_rest={min_rest}")
+    print(f"  solve          {elapsed * 1000:8.1f} ms")
+    print(f"  filled         {len(rows)} / {len(cells)}")
+    print(f"  load min/max   {loads[0]} / {loads[-1]}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*args)
@@ -0,0 +1,83 @@
+"""
+Micro-benchmark: interval-indexed Availability vs the old per-day expansion
+that rota_week used to build its `unavailable` set.
+
+Run from the repo root:
+    python -m benchmarks.bench_availability [rows] [staff]
+"""
+from __future__ import annotations
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from app.availability import Availability
+
+
+def legacy_unavailable(rows, week_start: date, week_end: date) -> set[tuple[int, date]]:
+    unavailable: set[tuple[int, date]] = set()
+    for staff_id, start, end in rows:
+        cur = start
+        while cur <= end:
+            if week_start <= cur <= week_end:
+                unavailable.add((staff_id, cur))
+            cur += timedelta(days=1)
+    return unavailable
+
+
+def make_rows(n: int, staff: int, seed: int = 1) -> list[tuple[int, date, date]]:
+    rnd = random.Random(seed)
+    base = date(2020, 1, 1)
+    rows = []
+    for _ in range(n):
+        start = base + timedelta(days=rnd.randrange(365 * 6))
+        # Mostly short leave, with the occasional long absence
+        length = rnd.choice([1, 2, 5, 10, 14]) if rnd.random() < 0.95 else rnd.randrange(90, 366)
+        rows.append((rnd.randrange(1, staff + 1), start, start + timedelta(days=length - 1)))
+    return rows
+
+
+def timed(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(n: int = 10_000, staff: int = 400) -> None:
+    rows = make_rows(n, staff)
+    week_start = date(2023, 6, 5)
+    days = [week_start + timedelta(days=i) for i in range(7)]
+    # Rows rota_week would fetch: everything overlapping the week, plus the
+    # worst case where the whole table is scanned (e.g. a quarter view).
+    staff_ids = range(1, staff + 1)
+
+    legacy = timed(lambda: legacy_unavailable(rows, days[0], days[-1]))
+    build = timed(lambda: Availability(rows))
+    index = Availability(rows)
+
+    def legacy_lookups():
+        un = legacy_unavailable(rows, days[0], days[-1])
+        return sum((s, d) in un for s in staff_ids for d in days)
+
+    def index_lookups():
+        idx = Availability(rows)
+        return sum(idx.is_off(s, d) for s in staff_ids for d in days)
+
+    assert legacy_lookups() == index_lookups()
+    assert legacy_unavailable(rows, days[0], days[-1]) == {
+        (s, d) for s in staff_ids for d in days if (s, d) in index
+    }
+
+    print(f"rows={n} staff={staff}")
+    print(f"  legacy per-day expansion      {legacy * 1000:8.2f} ms")
+    print(f"  Availability build            {build * 1000:8.2f} ms")
+    print(f"  legacy expand + week lookups  {timed(legacy_lookups) * 1000:8.2f} ms")
+    print(f"  index build + week lookups    {timed(index_lookups) * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*args)
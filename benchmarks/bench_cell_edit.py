@@ -0,0 +1,67 @@
+"""
+One rota cell edit, two ways: the form post to /rota/assign (303, then
+the whole week fetched and rendered again) against the JSON post to
+/rota/cell that app.js makes, which answers with just that cell's state.
+
+Run from the repo root (uses a throwaway SQLite database):
+    python -m benchmarks.bench_cell_edit [staff] [shift_types] [edits]
+"""
+from __future__ import annotations
+import statistics
+import sys
+import time
+from datetime import date
+
+# Sets up the throwaway database before the app is imported
+from benchmarks.bench_rota_week import seed
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.db import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import ShiftType, Staff  # noqa: E402
+from app.utils import start_of_week  # noqa: E402
+
+
+def main(n_staff: int = 500, n_shift_types: int = 30, edits: int = 20) -> None:
+    week_start = start_of_week(date.today())
+    with TestClient(app) as client:
+        rota_id = seed(n_staff, n_shift_types, week_start)
+        db = SessionLocal()
+        try:
+            st_id = db.query(ShiftType.id).filter(ShiftType.rota_id == rota_id).first()[0]
+            staff_ids = [s for (s,) in db.query(Staff.id).limit(edits).all()]
+        finally:
+            db.close()
+        client.post("/login", data={"email": "bench@example.com", "password": "bench"})
+
+        def edit_form(staff_id: int):
+            return client.post(
+                "/rota/assign",
+                data={"rota_id": rota_id, "shift_date": week_start.isoformat(),
+                      "shift_type_id": st_id, "staff_id": staff_id, "notes": ""},
+            )
+
+        def edit_json(staff_id: int):
+            return client.post(
+                "/rota/cell",
+                json={"rota_id": rota_id, "shift_date": week_start.isoformat(),
+                      "shift_type_id": st_id, "staff_id": staff_id, "notes": ""},
+            )
+
+        for name, edit in (("form + reload", edit_form), ("json /rota/cell", edit_json)):
+            edit(staff_ids[0])  # warm up
+            timings, sizes = [], []
+            for sid in staff_ids:
+                t0 = time.perf_counter()
+                r = edit(sid)
+                timings.append(time.perf_counter() - t0)
+                assert r.status_code == 200, r.status_code
+                sizes.append(len(r.content))
+            print(f"{name:16s} median {statistics.median(timings) * 1000:8.1f} ms"
+                  f"   {statistics.median(sizes):10.0f} bytes per edit")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*args)
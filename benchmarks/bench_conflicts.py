@@ -0,0 +1,133 @@
+"""
+The conflicts report (/conflicts) over twelve months of 50 rotas.
+
+Times find_conflicts() for every active rota and for one rota, with the
+number of statements each sends, against the obvious alternative of
+loading the range's entries and time off and checking them in Python.
+Both must agree on the counts. The target is under a second on SQLite.
+
+Run from the repo root (generates a throwaway database unless --db names
+one that already has data):
+    python -m benchmarks.bench_conflicts
+    python -m benchmarks.bench_conflicts --db /tmp/conflicts.db --analyze
+"""
+from __future__ import annotations
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from benchmarks.generator import generate
+from benchmarks.suite import QueryCounter, _configure
+
+SIZES = {
+    "rotas": 50,
+    "shift_types_per_rota": 5,
+    "staff": 1000,
+    "users": 10,
+    "history_days": 180,
+    "future_days": 365,
+    "time_off_per_staff": 12,
+    "fill": 0.9,
+}
+
+
+def python_counts(db, first: date, last: date) -> dict[str, int]:
+    """The same three counts, from rows loaded into Python."""
+    from app.models import Rota, RotaEntry, ShiftType, TimeOff
+
+    active = {rid for (rid,) in db.query(Rota.id).filter(Rota.active)}
+    entries = (
+        db.query(RotaEntry.rota_id, RotaEntry.shift_date, RotaEntry.shift_type_id, RotaEntry.staff_id)
+        .filter(RotaEntry.shift_date >= first, RotaEntry.shift_date <= last, RotaEntry.staff_id.is_not(None))
+        .all()
+    )
+    entries = [e for e in entries if e.rota_id in active]
+    leave: dict[int, list] = {}
+    for t in db.query(TimeOff).filter(TimeOff.end_date >= first, TimeOff.start_date <= last):
+        leave.setdefault(t.staff_id, []).append((t.start_date, t.end_date))
+    per_day = Counter((e.shift_date, e.staff_id) for e in entries)
+    staffed = {(e.rota_id, e.shift_date, e.shift_type_id) for e in entries}
+    shift_types = db.query(ShiftType).filter(ShiftType.active, ShiftType.rota_id.in_(active)).all()
+    n_days = (last - first).days + 1
+    return {
+        "time_off": sum(
+            1 for e in entries for s, t in leave.get(e.staff_id, ()) if s <= e.shift_date <= t
+        ),
+        "double_booked": sum(1 for n in per_day.values() if n > 1),
+        "unstaffed": sum(
+            1
+            for i in range(n_days)
+            for st in shift_types
+            if (st.rota_id, first + timedelta(days=i), st.id) not in staffed
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", help="database file to use (generated if empty)")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--analyze", action="store_true", help="run ANALYZE first")
+    args = parser.parse_args()
+
+    _configure(args.db or os.path.join(tempfile.mkdtemp(), "conflicts.db"))
+
+    from sqlalchemy import func, select, text
+
+    from app.conflicts import find_conflicts
+    from app.db import SessionLocal, engine
+    from app.migrations import run_migrations
+    from app.models import RotaEntry, TimeOff
+
+    run_migrations(engine)
+    with engine.connect() as conn:
+        seeded = conn.execute(select(func.count()).select_from(RotaEntry.__table__)).scalar()
+    if not seeded:
+        generate(engine, **SIZES)
+    if args.analyze:
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+    with engine.connect() as conn:
+        n_entries = conn.execute(select(func.count()).select_from(RotaEntry.__table__)).scalar()
+        n_time_off = conn.execute(select(func.count()).select_from(TimeOff.__table__)).scalar()
+
+    first = date.today()
+    last = first + timedelta(days=args.days - 1)
+    print(f"{n_entries} rota entries, {n_time_off} time off; {first} to {last}")
+
+    counter = QueryCounter()
+    counter.install()
+    db = SessionLocal()
+    try:
+        one_rota = db.execute(select(func.min(RotaEntry.rota_id))).scalar()
+        runs = {
+            "all rotas": lambda: find_conflicts(db, first, last).counts,
+            "one rota": lambda: find_conflicts(db, first, last, rota_id=one_rota).counts,
+            "python loop": lambda: python_counts(db, first, last),
+        }
+        results = {}
+        for name, run in runs.items():
+            run()  # warm the reference-data caches
+            timings = []
+            for _ in range(args.repeat):
+                counter.count = 0
+                t0 = time.perf_counter()
+                results[name] = run()
+                timings.append(time.perf_counter() - t0)
+            print(
+                f"{name:12s} median {statistics.median(timings) * 1000:8.1f} ms"
+                f"  {counter.count:3d} statements  {results[name]}"
+            )
+            db.expunge_all()
+    finally:
+        db.close()
+    assert results["all rotas"] == results["python loop"], "counts differ"
+
+
+if __name__ == "__main__":
+    main()
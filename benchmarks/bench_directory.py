@@ -0,0 +1,111 @@
+"""
+Directory pages and staff pickers as headcount grows: response size and
+median time of /staff, /users, /time-off and /patterns, and of the
+/staff/search typeahead, for a given number of staff (each with a login).
+
+Run from the repo root:
+    python -m benchmarks.bench_directory --staff 500 5000 20000
+"""
+from __future__ import annotations
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.suite import EMAIL, PASSWORD, _configure
+
+FIRST = ["Alex", "Sam", "Jo", "Priya", "Chen", "Fatima", "Tom", "Aisha", "Luca", "Niamh", "Kwame", "Olga"]
+LAST = ["Smith", "Patel", "Jones", "Khan", "Williams", "Brown", "Taylor", "Wilson", "Evans", "Thomas"]
+
+
+def _seed(n_staff: int) -> None:
+    from sqlalchemy import insert
+    from app.db import engine
+    from app.migrations import run_migrations
+    from app.models import Staff, User
+
+    run_migrations(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Staff.__table__),
+            [
+                {
+                    "full_name": f"{FIRST[i % len(FIRST)]} {LAST[i // len(FIRST) % len(LAST)]} {i}",
+                    "email": f"staff{i}@trust.example",
+                    "team": f"Team {i % 40:02d}",
+                    "active": i % 20 != 0,
+                    "created_at": now,
+                }
+                for i in range(n_staff)
+            ],
+        )
+        conn.execute(
+            insert(User.__table__),
+            [
+                {"email": f"staff{i}@trust.example", "password_hash": "x", "role": "Staff",
+                 "staff_id": i + 1, "active": True, "created_at": now}
+                for i in range(n_staff)
+            ],
+        )
+
+
+def run(n_staff: int, repeat: int) -> None:
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    _seed(n_staff)
+    with TestClient(app) as client:
+        r = client.post("/login", data={"email": EMAIL, "password": PASSWORD}, follow_redirects=False)
+        if "oncall_session" not in r.cookies:
+            sys.exit(f"login failed ({r.status_code})")
+        client.cookies.set("oncall_session", r.cookies["oncall_session"])
+
+        for name, url in (
+            ("/staff", "/staff"),
+            ("/staff?q=", "/staff?q=priya+khan"),
+            ("/users", "/users"),
+            ("/users?q=", "/users?q=priya+khan"),
+            ("/users?q=email", "/users?q=staff12"),
+            ("/time-off", "/time-off"),
+            ("/patterns", "/patterns"),
+            ("search (common)", "/staff/search?q=sam"),
+            ("search (rare)", f"/staff/search?q=staff{n_staff - 1}@"),
+            ("search (none)", "/staff/search?q=zzz"),
+        ):
+            client.get(url)
+            timings = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                r = client.get(url)
+                timings.append(time.perf_counter() - t0)
+            assert r.status_code == 200, (url, r.status_code)
+            print(f"  {n_staff:6d} staff  {name:16s} {len(r.content) / 1024:8.1f} KiB {statistics.median(timings) * 1000:8.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--staff", type=int, nargs="+", default=[500, 5000, 20000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    # The engine is bound to APP_DB_PATH at import, so each size gets its
+    # own interpreter (and database)
+    if len(args.staff) > 1:
+        for n in args.staff:
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_directory", "--staff", str(n), "--repeat", str(args.repeat)],
+                check=True,
+            )
+        return
+
+    _configure(os.path.join(tempfile.mkdtemp(), "directory.db"))
+    run(args.staff[0], args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Full render vs. conditional GET for the pages that send ETags.
+
+Each page is fetched once to get its ETag, then timed both ways: a plain
+GET (grid load and render) and a GET with If-None-Match, which should be
+answered 304 from a few aggregate queries.
+
+Run from the repo root:
+    python -m benchmarks.bench_etag --scale medium --db /tmp/medium.db
+"""
+from __future__ import annotations
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks.generator import SCALES, generate
+from benchmarks.suite import EMAIL, PASSWORD, QueryCounter, _configure
+
+
+def _time(client, counter: QueryCounter, path: str, headers: dict, repeat: int) -> tuple[float, int, int]:
+    timings = []
+    status = queries = 0
+    for _ in range(repeat):
+        counter.count = 0
+        t0 = time.perf_counter()
+        r = client.get(path, headers=headers)
+        timings.append(time.perf_counter() - t0)
+        status, queries = r.status_code, counter.count
+    return statistics.median(timings) * 1000, status, queries
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", help="database file to use (generated if empty)")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="medium")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    _configure(args.db or os.path.join(tempfile.mkdtemp(), "etag.db"))
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func, select
+
+    from app.db import engine
+    from app.main import app
+    from app.migrations import run_migrations
+    from app.models import Rota, RotaEntry
+
+    run_migrations(engine)
+    with engine.connect() as conn:
+        seeded = conn.execute(select(func.count()).select_from(RotaEntry.__table__)).scalar()
+    if not seeded:
+        generate(engine, **SCALES[args.scale])
+    with engine.connect() as conn:
+        rota_id = conn.execute(
+            select(Rota.id).where(Rota.active == True).order_by(Rota.id.desc()).limit(1)
+        ).scalar()
+
+    week = date.today() - timedelta(days=date.today().weekday())
+    pages = {
+        "dashboard": "/",
+        "rota week": f"/rota?rota_id={rota_id}&week={week.isoformat()}",
+        "rota range 4 weeks": f"/rota/range?rota_id={rota_id}&start={week.isoformat()}",
+    }
+
+    counter = QueryCounter()
+    counter.install()
+    with TestClient(app) as client:
+        r = client.post("/login", data={"email": EMAIL, "password": PASSWORD}, follow_redirects=False)
+        if "oncall_session" not in r.cookies:
+            sys.exit(f"login failed ({r.status_code})")
+        client.cookies.set("oncall_session", r.cookies["oncall_session"])
+
+        print(f"{'page':20s} {'full':>10s} {'304':>10s} {'ratio':>7s} {'queries':>9s}")
+        for name, path in pages.items():
+            etag = client.get(path).headers.get("etag")
+            if not etag:
+                sys.exit(f"{path} sent no ETag (APP_ETAGS=0?)")
+            full_ms, full_status, full_q = _time(client, counter, path, {}, args.repeat)
+            cond_ms, cond_status, cond_q = _time(client, counter, path, {"If-None-Match": etag}, args.repeat)
+            if (full_status, cond_status) != (200, 304):
+                sys.exit(f"{path}: expected 200/304, got {full_status}/{cond_status}")
+            print(
+                f"{name:20s} {full_ms:8.2f}ms {cond_ms:8.2f}ms {cond_ms / full_ms:6.0%}"
+                f" {full_q:>4d}/{cond_q:<4d}"
+            )
+
+
+if __name__ == "__main__":
+    main()
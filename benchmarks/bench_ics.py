@@ -0,0 +1,169 @@
+"""
+Calendar feed streaming: peak memory and time for rota and staff feeds
+as history grows, plus the cost of a conditional (304) poll.
+
+Peak memory is traced with tracemalloc while the response body is
+consumed; it should stay flat as the number of years (and the size of
+the feed) grows.
+
+Run from the repo root:
+    python -m benchmarks.bench_ics --years 1 2 5 --shift-types 40
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+
+def _seed(years: int, n_shift_types: int, n_staff: int) -> tuple[int, int, int]:
+    """A rota with `years` of fully staffed history; staff 1 is on every day."""
+    from sqlalchemy import insert
+    from app.db import engine
+    from app.migrations import run_migrations
+    from app.models import Rota, ShiftType, Staff, RotaEntry, User
+
+    run_migrations(engine)
+    now = datetime.utcnow()
+    first = date.today() - timedelta(days=365 * years)
+    with engine.begin() as conn:
+        rota_id = conn.execute(insert(Rota.__table__).values(name="Feed bench", active=True, created_at=now)).inserted_primary_key[0]
+        st_ids = [
+            conn.execute(
+                insert(ShiftType.__table__).values(rota_id=rota_id, name=f"Shift {i:02d}", active=True)
+            ).inserted_primary_key[0]
+            for i in range(n_shift_types)
+        ]
+        conn.execute(
+            insert(Staff.__table__),
+            [
+                {"full_name": f"Staff {i:04d}", "phone": f"0{i:09d}", "active": True, "created_at": now}
+                for i in range(n_staff)
+            ],
+        )
+        staff_id = 1
+        # The feed links are signed for a user
+        user_id = conn.execute(
+            insert(User.__table__).values(
+                email="feeds@example.com", password_hash="-", role="Staff", active=True,
+                staff_id=staff_id, feed_version=0, created_at=now,
+            )
+        ).inserted_primary_key[0]
+        rows = []
+        for d in range(365 * years + 1):
+            for i, st in enumerate(st_ids):
+                rows.append(
+                    {
+                        "rota_id": rota_id,
+                        "shift_date": first + timedelta(days=d),
+                        "shift_type_id": st,
+                        "staff_id": staff_id if i == 0 else 2 + (d + i) % (n_staff - 1),
+                        "updated_at": now,
+                    }
+                )
+            if len(rows) >= 10_000:
+                conn.execute(insert(RotaEntry.__table__), rows)
+                rows = []
+        if rows:
+            conn.execute(insert(RotaEntry.__table__), rows)
+    return rota_id, staff_id, user_id
+
+
+async def _drain(response) -> int:
+    size = 0
+    async for chunk in response.body_iterator:
+        size += len(chunk)
+    return size
+
+
+def _measure(call) -> tuple[float, float, int]:
+    """(seconds, peak MiB, bytes) to produce and consume one feed."""
+    t0 = time.perf_counter()
+    size = asyncio.run(_drain(call()))
+    elapsed = time.perf_counter() - t0
+    # Separate pass: tracing slows everything down several times
+    tracemalloc.start()
+    asyncio.run(_drain(call()))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, size
+
+
+def run(years: int, shift_types: int, staff: int) -> None:
+    from starlette.requests import Request
+    from app.db import SessionLocal
+    from app.routers.calendar import rota_feed, staff_feed
+    from app.auth import sign_feed
+    from app.models import User
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    rota_id, staff_id, user_id = _seed(years, shift_types, staff)
+    with SessionLocal() as db:
+        user = db.get(User, user_id)
+        tokens = {"rota": sign_feed(user, "rota", rota_id), "staff": sign_feed(user, "staff", staff_id)}
+
+    def request(headers=()):
+        return Request({"type": "http", "method": "GET", "path": "/", "headers": list(headers)})
+
+    def feed(fn, item_id, kind):
+        def call():
+            db = SessionLocal()
+            try:
+                return fn(request(), item_id, tokens[kind], db)
+            finally:
+                db.close()
+        return call
+
+    for name, call in (
+        ("rota", feed(rota_feed, rota_id, "rota")),
+        ("staff", feed(staff_feed, staff_id, "staff")),
+    ):
+        call()  # warm the reference-data cache
+        elapsed, peak, size = _measure(call)
+        print(f"  {years}y {name:6s} {size / 2**20:7.1f} MiB feed in {elapsed * 1000:7.0f} ms, peak {peak:5.2f} MiB")
+
+    with TestClient(app) as client:
+        url = f"/calendar/rota/{rota_id}.ics?token={tokens['rota']}"
+        etag = client.get(url).headers["etag"]
+        timings = []
+        for _ in range(50):
+            t0 = time.perf_counter()
+            r = client.get(url, headers={"If-None-Match": etag})
+            timings.append(time.perf_counter() - t0)
+        assert r.status_code == 304, r.status_code
+        print(f"  {years}y rota   304 poll {statistics.median(timings) * 1000:.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 2, 5])
+    parser.add_argument("--shift-types", type=int, default=40)
+    parser.add_argument("--staff", type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ["APP_UPDATE_CHECK"] = "0"
+    os.environ.setdefault("APP_SLOW_REQUEST_MS", "0")
+    # The engine is bound to APP_DB_PATH at import, so each size gets its
+    # own interpreter (and database)
+    if len(args.years) > 1:
+        for years in args.years:
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_ics", "--years", str(years),
+                 "--shift-types", str(args.shift_types), "--staff", str(args.staff)],
+                check=True,
+            )
+        return
+
+    os.environ["APP_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "ics.db")
+    run(args.years[0], args.shift_types, args.staff)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Bulk import: time to validate and write a CSV of staff and of rota
+entries, with and without --dry-run, and the peak memory while doing so.
+
+Rows refer to rotas, shift types and staff by name, as a spreadsheet
+would; the file is generated up front on a fresh database.
+
+Run from the repo root:
+    python -m benchmarks.bench_import --rows 100000 --staff 2000
+"""
+from __future__ import annotations
+import argparse
+import csv
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+
+def _seed(n_rotas: int, n_shift_types: int) -> list[tuple[str, list[str]]]:
+    from sqlalchemy import insert
+    from app.db import engine
+    from app.migrations import run_migrations
+    from app.models import Rota, ShiftType
+
+    run_migrations(engine)
+    now = datetime.utcnow()
+    rotas = []
+    with engine.begin() as conn:
+        for r in range(n_rotas):
+            name = f"Rota {r:02d}"
+            rota_id = conn.execute(insert(Rota.__table__).values(name=name, active=True, created_at=now)).inserted_primary_key[0]
+            names = [f"Shift {i:02d}" for i in range(n_shift_types)]
+            conn.execute(insert(ShiftType.__table__), [{"rota_id": rota_id, "name": n, "active": True} for n in names])
+            rotas.append((name, names))
+    return rotas
+
+
+def _write_staff_csv(path: str, n_staff: int) -> None:
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["Full name", "Email", "Phone", "Team", "Extension", "Bleep", "Active"])
+        for i in range(n_staff):
+            w.writerow([f"Staff {i:05d}", f"staff{i}@example.com", f"0{i:09d}", f"Team {i % 12}", str(1000 + i), "", "yes"])
+
+
+def _write_rota_csv(path: str, rows: int, rotas: list[tuple[str, list[str]]], n_staff: int) -> None:
+    first = date.today() - timedelta(days=365)
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["Rota", "Date", "Shift type", "Staff", "Notes"])
+        i = 0
+        day = 0
+        while i < rows:
+            for rota, shift_types in rotas:
+                for st in shift_types:
+                    if i >= rows:
+                        break
+                    # Mix of names and emails, with the odd unassigned cell
+                    if i % 50 == 0:
+                        staff = ""
+                    elif i % 2:
+                        staff = f"Staff {i % n_staff:05d}"
+                    else:
+                        staff = f"staff{i % n_staff}@example.com"
+                    w.writerow([rota, (first + timedelta(days=day)).strftime("%d/%m/%Y"), st, staff, ""])
+                    i += 1
+            day += 1
+
+
+def _timed(fn, path: str, dry_run: bool):
+    from app.db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        with open(path, "rb") as f:
+            t0 = time.perf_counter()
+            result = fn(db, path, f, dry_run=dry_run)
+            elapsed = time.perf_counter() - t0
+    finally:
+        db.close()
+    return result, elapsed
+
+
+def _peak(fn, path: str) -> float:
+    from app.db import SessionLocal
+
+    tracemalloc.start()
+    db = SessionLocal()
+    try:
+        with open(path, "rb") as f:
+            fn(db, path, f, dry_run=True)
+    finally:
+        db.close()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--staff", type=int, default=2000)
+    parser.add_argument("--rotas", type=int, default=10)
+    parser.add_argument("--shift-types", type=int, default=12)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["APP_DB_PATH"] = os.path.join(tmp, "import.db")
+    os.environ["APP_UPDATE_CHECK"] = "0"
+
+    from app.importer import import_rota_entries, import_staff
+
+    rotas = _seed(args.rotas, args.shift_types)
+    staff_csv = os.path.join(tmp, "staff.csv")
+    rota_csv = os.path.join(tmp, "rota.csv")
+    _write_staff_csv(staff_csv, args.staff)
+    _write_rota_csv(rota_csv, args.rows, rotas, args.staff)
+
+    for label, fn, path in (
+        ("staff", import_staff, staff_csv),
+        ("rota entries", import_rota_entries, rota_csv),
+    ):
+        for dry_run in (True, False):
+            result, elapsed = _timed(fn, path, dry_run)
+            print(
+                f"  {label:12s} {'dry run' if dry_run else 'write':7s} {result.rows:7d} rows"
+                f" {result.written:7d} ok {result.error_count:4d} errors"
+                f" in {elapsed * 1000:7.0f} ms ({result.rows / elapsed:,.0f} rows/s)"
+            )
+    # Re-importing the same file updates every row in place
+    result, elapsed = _timed(import_rota_entries, rota_csv, False)
+    print(f"  {'rota entries':12s} {'rewrite':7s} {result.rows:7d} rows in {elapsed * 1000:7.0f} ms")
+    print(f"  rota entries dry run peak memory {_peak(import_rota_entries, rota_csv):.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Before/after timing of the hot queries on a 1M-entry database, with the
+single-column indexes the schema used to have and then with the composite
+indexes added by migration 0004.
+
+Run from the repo root (uses a throwaway SQLite database; seeding takes a
+little while):
+    python -m benchmarks.bench_indexes [rotas] [days]
+
+The defaults, 50 rotas x 10 shift types x 2000 days, give 1,000,000
+rota entries.
+"""
+from __future__ import annotations
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+os.environ["APP_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from sqlalchemy import insert, select, text  # noqa: E402
+
+from app.db import engine  # noqa: E402
+from app.migrations.versions import m0004_composite_indexes  # noqa: E402
+from app.models import Base, Rota, ShiftType, Staff, RotaEntry, TimeOff  # noqa: E402
+from app.utils import start_of_week  # noqa: E402
+
+SHIFT_TYPES_PER_ROTA = 10
+N_STAFF = 2000
+TIME_OFF_PER_STAFF = 30
+
+# The indexes models.py declared before 0004
+LEGACY_INDEXES = [
+    "CREATE INDEX ix_rota_entries_rota_id ON rota_entries (rota_id)",
+    "CREATE INDEX ix_rota_entries_shift_date ON rota_entries (shift_date)",
+    "CREATE INDEX ix_time_off_staff_id ON time_off (staff_id)",
+    "CREATE INDEX ix_time_off_start_date ON time_off (start_date)",
+    "CREATE INDEX ix_time_off_end_date ON time_off (end_date)",
+]
+
+
+def create_legacy_schema() -> None:
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for model in (Staff, ShiftType, RotaEntry, TimeOff):
+            for index in model.__table__.indexes:
+                index.drop(bind=conn)
+
+
+def seed(n_rotas: int, n_days: int, today: date) -> None:
+    rnd = random.Random(1)
+    first = today - timedelta(days=n_days - 120)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Rota.__table__),
+            [{"id": r + 1, "name": f"Rota {r:03d}", "active": True, "created_at": now} for r in range(n_rotas)],
+        )
+        conn.execute(
+            insert(ShiftType.__table__),
+            [
+                {
+                    "id": r * SHIFT_TYPES_PER_ROTA + i + 1,
+                    "rota_id": r + 1,
+                    "name": f"Shift {i:02d}",
+                    "active": True,
+                }
+                for r in range(n_rotas)
+                for i in range(SHIFT_TYPES_PER_ROTA)
+            ],
+        )
+        conn.execute(
+            insert(Staff.__table__),
+            [
+                {"id": i + 1, "full_name": f"Staff {i:05d}", "active": i % 20 != 0, "created_at": now}
+                for i in range(N_STAFF)
+            ],
+        )
+        conn.execute(
+            insert(TimeOff.__table__),
+            [
+                {
+                    "staff_id": sid,
+                    "start_date": (s := first + timedelta(days=rnd.randrange(n_days))),
+                    "end_date": s + timedelta(days=rnd.choice([0, 1, 4, 9, 13])),
+                    "created_at": now,
+                }
+                for sid in range(1, N_STAFF + 1)
+                for _ in range(TIME_OFF_PER_STAFF)
+            ],
+        )
+        stmt = insert(RotaEntry.__table__)
+        for d in range(n_days):
+            day = first + timedelta(days=d)
+            conn.execute(
+                stmt,
+                [
+                    {
+                        "rota_id": r + 1,
+                        "shift_date": day,
+                        "shift_type_id": r * SHIFT_TYPES_PER_ROTA + i + 1,
+                        "staff_id": rnd.randrange(1, N_STAFF + 1),
+                        "updated_at": now,
+                    }
+                    for r in range(n_rotas)
+                    for i in range(SHIFT_TYPES_PER_ROTA)
+                ],
+            )
+    with engine.begin() as conn:
+        for sql in LEGACY_INDEXES:
+            conn.execute(text(sql))
+        conn.execute(text("ANALYZE"))
+
+
+def timed(stmt, repeat: int = 20) -> float:
+    best = float("inf")
+    with engine.connect() as conn:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            conn.execute(stmt).fetchall()
+            best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def workload(n_rotas: int, today: date) -> dict:
+    """The query shapes the routers issue, as plain statements so the
+    timings reflect the database rather than ORM object loading."""
+    week = start_of_week(today)
+    week_end = week + timedelta(days=6)
+    quarter_end = week + timedelta(days=90)
+    rota_id = n_rotas // 2
+    entries = RotaEntry.__table__
+    time_off = TimeOff.__table__
+    staff = Staff.__table__
+    shift_types = ShiftType.__table__
+    return {
+        "rota grid entries, 1 week": select(entries).where(
+            entries.c.rota_id == rota_id,
+            entries.c.shift_date.between(week, week_end),
+        ),
+        "time off overlap, 1 week": select(
+            time_off.c.staff_id, time_off.c.start_date, time_off.c.end_date
+        ).where(time_off.c.start_date <= week_end, time_off.c.end_date >= week),
+        "time off overlap, 40 staff, 1 qtr": select(
+            time_off.c.staff_id, time_off.c.start_date, time_off.c.end_date
+        ).where(
+            time_off.c.start_date <= quarter_end,
+            time_off.c.end_date >= week,
+            time_off.c.staff_id.in_(range(1, 41)),
+        ),
+        "busy staff, all rotas, 4 weeks": select(
+            entries.c.staff_id, entries.c.shift_date, entries.c.rota_id
+        ).where(
+            entries.c.shift_date.between(week, week + timedelta(days=27)),
+            entries.c.staff_id.isnot(None),
+        ),
+        "time off newest first, 50": select(time_off)
+        .order_by(time_off.c.start_date.desc(), time_off.c.end_date.desc())
+        .limit(50),
+        "active staff by name": select(staff.c.id, staff.c.full_name)
+        .where(staff.c.active == True)
+        .order_by(staff.c.full_name.asc()),
+        "/staff list, first 50": select(staff)
+        .order_by(staff.c.active.desc(), staff.c.full_name.asc())
+        .limit(50),
+        "active shift types of a rota": select(shift_types)
+        .where(shift_types.c.rota_id == rota_id, shift_types.c.active == True)
+        .order_by(shift_types.c.name.asc()),
+    }
+
+
+def main(n_rotas: int = 50, n_days: int = 2000) -> None:
+    today = date.today()
+    create_legacy_schema()
+    t0 = time.perf_counter()
+    seed(n_rotas, n_days, today)
+    with engine.connect() as conn:
+        n_entries = conn.execute(text("SELECT count(*) FROM rota_entries")).scalar()
+    print(f"seeded {n_entries:,} rota entries in {time.perf_counter() - t0:.1f}s")
+
+    queries = workload(n_rotas, today)
+    before = {name: timed(stmt) for name, stmt in queries.items()}
+
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        m0004_composite_indexes(conn)
+    print(f"migration 0004 took {time.perf_counter() - t0:.1f}s")
+
+    after = {name: timed(stmt) for name, stmt in queries.items()}
+
+    print(f"{'query':36} {'before':>10} {'after':>10}")
+    for name in queries:
+        print(f"{name:36} {before[name] * 1000:8.2f}ms {after[name] * 1000:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,68 @@
+"""
+Benchmark: generate and write a year of entries for a 10-shift rota.
+
+Run from the repo root (uses a throwaway SQLite database):
+    python -m benchmarks.bench_patterns [shift_types] [staff] [days]
+"""
+from __future__ import annotations
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+os.environ["APP_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from app.db import SessionLocal, engine  # noqa: E402
+from app.models import Base, Rota, ShiftType, Staff, RotaEntry, TimeOff  # noqa: E402
+from app.availability import load_availability  # noqa: E402
+from app.patterns import generate_pattern, apply_pattern  # noqa: E402
+
+
+def main(n_shift_types: int = 10, n_staff: int = 40, n_days: int = 365) -> None:
+    Base.metadata.create_all(bind=engine)
+    rnd = random.Random(1)
+    start = date(2026, 1, 5)
+    end = start + timedelta(days=n_days - 1)
+
+    db = SessionLocal()
+    try:
+        rota = Rota(name="Bench rota", active=True)
+        db.add(rota)
+        db.flush()
+        db.add_all(ShiftType(rota_id=rota.id, name=f"Shift {i:02d}") for i in range(n_shift_types))
+        db.add_all(Staff(full_name=f"Staff {i:03d}") for i in range(n_staff))
+        db.flush()
+        st_ids = [i for (i,) in db.query(ShiftType.id).order_by(ShiftType.id)]
+        staff_ids = [i for (i,) in db.query(Staff.id).order_by(Staff.id)]
+        # A fortnight of leave for everyone, scattered through the year
+        db.add_all(
+            TimeOff(staff_id=sid, start_date=d, end_date=d + timedelta(days=13))
+            for sid in staff_ids
+            for d in [start + timedelta(days=rnd.randrange(n_days))]
+        )
+        db.commit()
+
+        unavailable = load_availability(db, start, end, staff_ids)
+        t0 = time.perf_counter()
+        rows = generate_pattern(rota.id, st_ids, staff_ids, start, end, unavailable)
+        t_generate = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        written = apply_pattern(db, rota.id, st_ids, staff_ids, start, end, overwrite=True)
+        t_apply = time.perf_counter() - t0
+
+        assert written == len(rows)
+        assert db.query(RotaEntry).count() == written
+    finally:
+        db.close()
+
+    print(f"shift_types={n_shift_types} staff={n_staff} days={n_days}")
+    print(f"  generate in memory      {t_generate * 1000:8.1f} ms ({len(rows)} rows)")
+    print(f"  apply (load + write)    {t_apply * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*args)
@@ -0,0 +1,96 @@
+"""
+Timing check for the /rota week view at 500 staff x 30 shift types, or
+the /rota/range view when more than one week is requested.
+
+Run from the repo root (uses a throwaway SQLite database):
+    python -m benchmarks.bench_rota_week [staff] [shift_types] [weeks]
+"""
+from __future__ import annotations
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+os.environ["APP_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["APP_BOOTSTRAP_ADMIN_EMAIL"] = "bench@example.com"
+os.environ["APP_BOOTSTRAP_ADMIN_PASSWORD"] = "bench"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.db import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Rota, ShiftType, Staff, RotaEntry, TimeOff  # noqa: E402
+from app.utils import start_of_week  # noqa: E402
+
+
+def seed(n_staff: int, n_shift_types: int, week_start: date, n_weeks: int = 1) -> int:
+    db = SessionLocal()
+    try:
+        rota = Rota(name="Bench rota", active=True)
+        db.add(rota)
+        db.flush()
+        db.add_all(
+            Staff(full_name=f"Staff {i:04d}", phone=f"0700{i:06d}", bleep=str(i), active=True)
+            for i in range(n_staff)
+        )
+        db.add_all(
+            ShiftType(rota_id=rota.id, name=f"Shift {i:02d}", active=True)
+            for i in range(n_shift_types)
+        )
+        db.flush()
+        staff_ids = [s for (s,) in db.query(Staff.id).all()]
+        st_ids = [s for (s,) in db.query(ShiftType.id).filter(ShiftType.rota_id == rota.id).all()]
+        days = [week_start + timedelta(days=i) for i in range(7 * n_weeks)]
+        db.add_all(
+            RotaEntry(
+                rota_id=rota.id,
+                shift_date=d,
+                shift_type_id=st,
+                staff_id=staff_ids[(i * 7 + j) % len(staff_ids)],
+            )
+            for i, st in enumerate(st_ids)
+            for j, d in enumerate(days)
+        )
+        db.add_all(
+            TimeOff(staff_id=sid, start_date=week_start, end_date=week_start + timedelta(days=2))
+            for sid in staff_ids[::10]
+        )
+        db.commit()
+        return rota.id
+    finally:
+        db.close()
+
+
+def main(n_staff: int = 500, n_shift_types: int = 30, n_weeks: int = 1, repeat: int = 5) -> None:
+    week_start = start_of_week(date.today())
+    with TestClient(app) as client:
+        rota_id = seed(n_staff, n_shift_types, week_start, n_weeks)
+        client.post(
+            "/login",
+            data={"email": "bench@example.com", "password": "bench"},
+        )
+        if n_weeks > 1:
+            end = week_start + timedelta(days=7 * n_weeks - 1)
+            url = f"/rota/range?rota_id={rota_id}&start={week_start.isoformat()}&end={end.isoformat()}"
+        else:
+            url = f"/rota?rota_id={rota_id}&week={week_start.isoformat()}"
+        r = client.get(url)
+        assert r.status_code == 200, r.status_code
+
+        timings = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            r = client.get(url)
+            timings.append(time.perf_counter() - t0)
+        timings.sort()
+
+    print(f"{url.split('?')[0]} staff={n_staff} shift_types={n_shift_types} cells={n_shift_types * 7 * n_weeks}")
+    print(f"  best   {timings[0] * 1000:8.1f} ms")
+    print(f"  median {timings[len(timings) // 2] * 1000:8.1f} ms")
+    print(f"  bytes  {len(r.content):8d}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*args)
@@ -0,0 +1,169 @@
+"""
+Time-off list at scale: the paged /time-off views against the old
+unpaged query, on a table with many years of history.
+
+Reports the median page time for the default "current and upcoming"
+view, the past view (first page and a page deep in history), and the
+staff / team / date-window filters, with each query's plan, plus how long
+the old load-everything query took on its own.
+
+Run from the repo root:
+    python -m benchmarks.bench_time_off --rows 100000 --staff 2000
+"""
+from __future__ import annotations
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.suite import EMAIL, PASSWORD, QueryCounter, _configure
+
+
+def _seed(rows: int, n_staff: int, years: int, seed: int = 1) -> None:
+    from sqlalchemy import insert
+    from app.db import engine
+    from app.migrations import run_migrations
+    from app.models import Staff, TimeOff
+
+    run_migrations(engine)
+    rnd = random.Random(seed)
+    now = datetime.utcnow()
+    # History runs up to a year ahead of today, as booked leave does
+    first = date.today() - timedelta(days=365 * (years - 1))
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Staff.__table__),
+            [
+                {"full_name": f"Staff {i:05d}", "team": f"Team {i % 20:02d}", "active": True, "created_at": now}
+                for i in range(n_staff)
+            ],
+        )
+        batch = []
+        for _ in range(rows):
+            start = first + timedelta(days=rnd.randrange(365 * years))
+            length = rnd.choice([1, 2, 5, 10, 14]) if rnd.random() < 0.95 else rnd.randrange(30, 120)
+            batch.append(
+                {
+                    "staff_id": rnd.randrange(1, n_staff + 1),
+                    "start_date": start,
+                    "end_date": start + timedelta(days=length - 1),
+                    "reason": "Annual leave",
+                    "created_at": now,
+                }
+            )
+            if len(batch) >= 10_000:
+                conn.execute(insert(TimeOff.__table__), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(TimeOff.__table__), batch)
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+
+
+def _legacy(repeat: int) -> tuple[float, int]:
+    """The old list query: every row, newest first."""
+    from sqlalchemy import select
+    from app.db import SessionLocal
+    from app.models import TimeOff
+
+    timings = []
+    n = 0
+    for _ in range(repeat):
+        db = SessionLocal()
+        try:
+            t0 = time.perf_counter()
+            n = len(db.execute(select(TimeOff).order_by(TimeOff.start_date.desc(), TimeOff.end_date.desc())).scalars().all())
+            timings.append(time.perf_counter() - t0)
+        finally:
+            db.close()
+    return statistics.median(timings), n
+
+
+class _PlanLogger:
+    """Keeps the last SELECT on time_off so its plan can be shown."""
+
+    def __init__(self):
+        self.last = None
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if "FROM time_off" in statement:
+            self.last = (statement, parameters)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--staff", type=int, default=2000)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    _configure(os.path.join(tempfile.mkdtemp(), "time_off.db"))
+    _seed(args.rows, args.staff, args.years)
+
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from fastapi.testclient import TestClient
+    from app.db import engine
+    from app.main import app
+
+    legacy, n = _legacy(3)
+    print(f"  {'old query (all rows)':28s} {legacy * 1000:8.1f} ms  ({n} rows, before rendering)")
+
+    counter = QueryCounter()
+    counter.install()
+    plans = _PlanLogger()
+    event.listen(Engine, "before_cursor_execute", plans)
+
+    with TestClient(app) as client:
+        r = client.post("/login", data={"email": EMAIL, "password": PASSWORD}, follow_redirects=False)
+        if "oncall_session" not in r.cookies:
+            sys.exit(f"login failed ({r.status_code})")
+        client.cookies.set("oncall_session", r.cookies["oncall_session"])
+
+        # A cursor deep into history: walk the past view 20 pages in
+        url = "/time-off?view=past"
+        for _ in range(20):
+            r = client.get(url)
+            marker = 'href="/time-off?'
+            nxt = [part.split('"')[0] for part in r.text.split(marker)[1:] if "after=" in part.split('"')[0]]
+            url = "/time-off?" + nxt[0].replace("&amp;", "&")
+        deep = url
+
+        window = date.today() + timedelta(days=30)
+        cases = [
+            ("current & upcoming", "/time-off"),
+            ("past, first page", "/time-off?view=past"),
+            ("past, page 21", deep),
+            ("one staff member", "/time-off?view=past&staff_id=7"),
+            ("one team", "/time-off?team=Team+03"),
+            ("date window", f"/time-off?view=past&start={window - timedelta(days=400)}&end={window - timedelta(days=393)}"),
+        ]
+        for name, url in cases:
+            client.get(url)
+            timings = []
+            for _ in range(args.repeat):
+                counter.count = 0
+                t0 = time.perf_counter()
+                r = client.get(url)
+                timings.append(time.perf_counter() - t0)
+            assert r.status_code == 200, (url, r.status_code)
+            rows = r.text.count("/delete")
+            print(
+                f"  {name:28s} {statistics.median(timings) * 1000:8.1f} ms  ({rows} rows, {counter.count} queries)"
+                f"  {r.headers.get('server-timing', '')}"
+            )
+            if plans.last and engine.dialect.name == "sqlite":
+                statement, params = plans.last
+                with engine.connect() as conn:
+                    for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, params):
+                        print(f"      {row[-1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Seeded synthetic data for every model, at configurable sizes.
+
+Rows are written with Core bulk inserts in chunks, so a few hundred
+thousand rota entries take seconds rather than minutes. The same seed and
+sizes always produce the same data, which keeps benchmark runs comparable.
+
+Populate a database (migrating it first) from the repo root:
+    python -m benchmarks.generator path/to/bench.db --scale medium
+"""
+from __future__ import annotations
+import argparse
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.engine import Engine
+
+# Sizes per preset. "large" is roughly the biggest deployment we plan
+# for: hundreds of rotas, thousands of staff, years of history.
+SCALES: dict[str, dict[str, int | float]] = {
+    "small": {
+        "rotas": 3,
+        "shift_types_per_rota": 4,
+        "staff": 100,
+        "users": 20,
+        "history_days": 90,
+        "future_days": 28,
+        "time_off_per_staff": 4,
+        "fill": 0.9,
+    },
+    "medium": {
+        "rotas": 40,
+        "shift_types_per_rota": 5,
+        "staff": 1000,
+        "users": 200,
+        "history_days": 365,
+        "future_days": 90,
+        "time_off_per_staff": 12,
+        "fill": 0.9,
+    },
+    "large": {
+        "rotas": 300,
+        "shift_types_per_rota": 5,
+        "staff": 5000,
+        "users": 1000,
+        "history_days": 3 * 365,
+        "future_days": 180,
+        "time_off_per_staff": 30,
+        "fill": 0.85,
+    },
+}
+
+CHUNK = 10_000
+
+TEAMS = ["Medicine", "Surgery", "Paediatrics", "Radiology", "Theatres", "ICU", "ED", "Estates"]
+ROLES = ["Admin", "Manager", "Staff"]
+
+
+def _next_id(conn, table) -> int:
+    return (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+
+def _insert_chunked(conn, table, rows) -> int:
+    n = 0
+    chunk: list[dict] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK:
+            conn.execute(insert(table), chunk)
+            n += len(chunk)
+            chunk = []
+    if chunk:
+        conn.execute(insert(table), chunk)
+        n += len(chunk)
+    return n
+
+
+def generate(
+    engine: Engine,
+    seed: int = 1,
+    today: date | None = None,
+    *,
+    rotas: int,
+    shift_types_per_rota: int,
+    staff: int,
+    users: int,
+    history_days: int,
+    future_days: int,
+    time_off_per_staff: int,
+    fill: float,
+) -> dict[str, int]:
+    """
+    Add a synthetic data set to an already-migrated database, next to
+    whatever it holds. Returns the number of rows written per table.
+    """
+    from app.models import Rota, ShiftType, Staff, User, RotaEntry, TimeOff
+    from app.security import hash_password
+
+    rnd = random.Random(seed)
+    today = today or date.today()
+    first = today - timedelta(days=history_days)
+    n_days = history_days + future_days + 1
+    now = datetime.utcnow()
+    counts: dict[str, int] = {}
+
+    with engine.begin() as conn:
+        rota_id0 = _next_id(conn, Rota.__table__)
+        rota_ids = list(range(rota_id0, rota_id0 + rotas))
+        counts["rotas"] = _insert_chunked(
+            conn,
+            Rota.__table__,
+            (
+                {
+                    "id": rid,
+                    "name": f"Bench rota {rid:04d}",
+                    "description": f"{TEAMS[i % len(TEAMS)]} on call",
+                    "active": i % 25 != 24,
+                    "created_at": now,
+                }
+                for i, rid in enumerate(rota_ids)
+            ),
+        )
+
+        st_id0 = _next_id(conn, ShiftType.__table__)
+        cells: list[tuple[int, int]] = []
+        st_rows = []
+        for i, rid in enumerate(rota_ids):
+            for j in range(shift_types_per_rota):
+                st_id = st_id0 + i * shift_types_per_rota + j
+                st_rows.append(
+                    {
+                        "id": st_id,
+                        "rota_id": rid,
+                        "name": f"Shift {j + 1}",
+                        "description": None,
+                        "active": True,
+                    }
+                )
+                cells.append((rid, st_id))
+        counts["shift_types"] = _insert_chunked(conn, ShiftType.__table__, st_rows)
+
+        staff_id0 = _next_id(conn, Staff.__table__)
+        staff_ids = list(range(staff_id0, staff_id0 + staff))
+        counts["staff"] = _insert_chunked(
+            conn,
+            Staff.__table__,
+            (
+                {
+                    "id": sid,
+                    "full_name": f"Staff Member {sid:05d}",
+                    "email": f"staff{sid}@example.com",
+                    "phone": f"07{rnd.randrange(10**9):09d}",
+                    "team": rnd.choice(TEAMS),
+                    "extension": str(rnd.randrange(1000, 9999)),
+                    "bleep": str(rnd.randrange(100, 999)) if rnd.random() < 0.5 else None,
+                    # A few leavers, as in any real list
+                    "active": rnd.random() > 0.05,
+                    "created_at": now,
+                }
+                for sid in staff_ids
+            ),
+        )
+
+        # bcrypt is deliberately slow; every synthetic user shares one hash
+        password_hash = hash_password("bench")
+        user_id0 = _next_id(conn, User.__table__)
+        counts["users"] = _insert_chunked(
+            conn,
+            User.__table__,
+            (
+                {
+                    "id": uid,
+                    "email": f"user{uid}@example.com",
+                    "password_hash": password_hash,
+                    "role": ROLES[0] if i == 0 else ROLES[1] if i % 10 == 0 else ROLES[2],
+                    "active": True,
+                    "staff_id": staff_ids[i % len(staff_ids)] if staff_ids else None,
+                    "created_at": now,
+                    "favourite_rotas": rnd.sample(rota_ids, min(3, len(rota_ids))),
+                }
+                for i, uid in enumerate(range(user_id0, user_id0 + users))
+            ),
+        )
+
+        counts["time_off"] = _insert_chunked(
+            conn,
+            TimeOff.__table__,
+            (
+                {
+                    "staff_id": sid,
+                    "start_date": (start := first + timedelta(days=rnd.randrange(n_days))),
+                    # Mostly short leave with the occasional long absence
+                    "end_date": start + timedelta(days=rnd.choice([0, 0, 1, 2, 4, 9, 13, 27])),
+                    "reason": rnd.choice(["Annual leave", "Training", "Sick", None]),
+                    "created_at": now,
+                }
+                for sid in staff_ids
+                for _ in range(time_off_per_staff)
+            ),
+        )
+
+        counts["rota_entries"] = _insert_chunked(
+            conn,
+            RotaEntry.__table__,
+            (
+                {
+                    "rota_id": rid,
+                    "shift_date": first + timedelta(days=d),
+                    "shift_type_id": st_id,
+                    "staff_id": rnd.choice(staff_ids) if staff_ids else None,
+                    "notes": None,
+                    "updated_at": now,
+                }
+                for d in range(n_days)
+                for rid, st_id in cells
+                if rnd.random() < fill
+            ),
+        )
+
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("db_path")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ["APP_DB_PATH"] = args.db_path
+    from app.db import engine
+    from app.migrations import run_migrations
+
+    run_migrations(engine)
+    t0 = time.perf_counter()
+    counts = generate(engine, args.seed, **SCALES[args.scale])
+    print(", ".join(f"{n:,} {table}" for table, n in counts.items()))
+    print(f"generated in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Live rota updates (/rota/events): N idle Server-Sent Events subscribers
+held open against real uvicorn workers, then a series of cell edits.
+
+Reports each worker's memory and thread count with and without the
+subscribers (an idle stream should hold no database connection or
+thread), and the time from an edit being saved to every subscriber
+having its event.
+
+Run from the repo root; throwaway servers are started on a fresh
+database. With --workers 2 the subscribers are split between two
+processes and edits go to the first, so the second only hears of them
+through the --backend (poll, or notify on PostgreSQL):
+    python -m benchmarks.load_live --subscribers 1000
+    python -m benchmarks.load_live --subscribers 1000 --workers 2 --backend poll
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+import httpx
+
+from benchmarks.load_test import _free_port, _percentile
+
+
+def _proc_status(pid: int) -> tuple[int, int]:
+    """(resident KiB, threads) of a process."""
+    rss = threads = 0
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss = int(line.split()[1])
+            elif line.startswith("Threads:"):
+                threads = int(line.split()[1])
+    return rss, threads
+
+
+def _prepare(db_path: str) -> None:
+    os.environ["APP_DB_PATH"] = db_path
+    from sqlalchemy import insert
+    from app.db import engine
+    from app.migrations import run_migrations
+    from app.models import Staff, User
+    from app.security import hash_password
+
+    run_migrations(engine)
+    with engine.begin() as conn:
+        # Created here rather than by each worker's bootstrap, which race
+        conn.execute(
+            insert(User.__table__).values(
+                email="bench@example.com", password_hash=hash_password("bench"), role="Admin", active=True
+            )
+        )
+        conn.execute(insert(Staff.__table__), [{"full_name": f"Staff {i:02d}", "active": True} for i in range(20)])
+
+
+async def _run(urls: list[str], subscribers: int, edits: int, pids: list[int]) -> None:
+    from app.utils import now_local, start_of_week
+
+    week = start_of_week(now_local().date())
+    query = f"rota_id=1&start={week.isoformat()}&end={(week + timedelta(days=6)).isoformat()}"
+
+    login = httpx.post(urls[0] + "/login", data={"email": "bench@example.com", "password": "bench"})
+    cookies = dict(login.cookies)
+
+    def status(label: str) -> None:
+        for i, pid in enumerate(pids):
+            rss, threads = _proc_status(pid)
+            print(f"  worker {i} {label:18s} {rss / 1024:7.1f} MiB  {threads:3d} threads")
+
+    status("idle")
+
+    received: list[float] = []
+    connected = 0
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=0)
+    clients = [httpx.AsyncClient(base_url=url, cookies=cookies, timeout=None, limits=limits) for url in urls]
+    try:
+        async def subscribe(n: int) -> None:
+            nonlocal connected
+            client = clients[n % len(clients)]
+            async with client.stream("GET", f"/rota/events?{query}&client=bench{n}") as r:
+                connected += 1
+                async for line in r.aiter_lines():
+                    if line.startswith("data:"):
+                        received.append(time.perf_counter())
+
+        tasks = [asyncio.create_task(subscribe(n)) for n in range(subscribers)]
+        while connected < subscribers:
+            await asyncio.sleep(0.05)
+        # Let every stream reach its first wait
+        await asyncio.sleep(1)
+        status(f"{subscribers} subscribers")
+
+        latencies = []
+        async with httpx.AsyncClient(base_url=urls[0], cookies=cookies) as editor:
+            for i in range(edits):
+                received.clear()
+                t0 = time.perf_counter()
+                r = await editor.post(
+                    "/rota/cell",
+                    json={"rota_id": 1, "shift_date": (week + timedelta(days=i % 7)).isoformat(),
+                          "shift_type_id": 1, "staff_id": 1 + i % 20},
+                )
+                assert r.status_code == 200, r.text
+                deadline = t0 + 10
+                while len(received) < subscribers and time.perf_counter() < deadline:
+                    await asyncio.sleep(0.005)
+                if len(received) < subscribers:
+                    print(f"  edit {i}: only {len(received)} of {subscribers} subscribers heard")
+                    continue
+                latencies.append(max(received) - t0)
+
+        if latencies:
+            print(
+                f"  edit -> last subscriber  p50 {_percentile(latencies, 0.50) * 1000:7.1f} ms"
+                f"  max {max(latencies) * 1000:7.1f} ms  ({len(latencies)} edits)"
+            )
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        for client in clients:
+            await client.aclose()
+
+    await asyncio.sleep(1)
+    status("after disconnect")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--backend", choices=("memory", "poll", "notify"), default="memory")
+    parser.add_argument("--edits", type=int, default=20)
+    args = parser.parse_args()
+
+    # Each subscriber is a socket on both ends
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    want = min(hard, max(soft, args.subscribers * 2 + 256))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (want, hard))
+
+    db_path = os.path.join(tempfile.mkdtemp(), "live.db")
+    os.environ["APP_UPDATE_CHECK"] = "0"
+    os.environ.setdefault("APP_SLOW_REQUEST_MS", "0")
+    os.environ["APP_LIVE_BACKEND"] = args.backend
+    _prepare(db_path)
+
+    env = {**os.environ, "APP_DB_PATH": db_path}
+    ports = [_free_port() for _ in range(args.workers)]
+    servers = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning",
+             "--limit-concurrency", str(args.subscribers * 2), "--backlog", str(args.subscribers * 2)],
+            env=env,
+        )
+        for port in ports
+    ]
+    try:
+        urls = [f"http://127.0.0.1:{port}" for port in ports]
+        for url in urls:
+            for _ in range(100):
+                try:
+                    httpx.get(url + "/login", timeout=1)
+                    break
+                except httpx.HTTPError:
+                    time.sleep(0.2)
+        print(f"subscribers={args.subscribers} workers={args.workers} backend={args.backend}")
+        asyncio.run(_run(urls, args.subscribers, args.edits, [s.pid for s in servers]))
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
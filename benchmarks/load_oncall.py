@@ -0,0 +1,168 @@
+"""
+Load test for the on-call JSON API: N concurrent clients polling
+/api/oncall/now and /api/oncall against a real uvicorn server, the way
+paging integrations and ward displays do.
+
+Reports client-side p50/p99 per endpoint and the server's own time per
+request (the `total` of the Server-Timing header), and, before the load
+starts, the handler's in-process time with no HTTP in the way.
+
+Run from the repo root; a throwaway server is started on a generated
+data set:
+    python -m benchmarks.load_oncall --scale medium --clients 100 --seconds 20
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+import httpx
+
+from benchmarks.generator import SCALES, generate
+from benchmarks.load_test import _free_port, _percentile
+
+_TOTAL = re.compile(r"total;dur=([0-9.]+)")
+
+
+def _prepare(db_path: str, scale: str) -> tuple[str, list[int]]:
+    """Generate data and an API token; returns (token, active rota ids)."""
+    os.environ["APP_DB_PATH"] = db_path
+    from sqlalchemy import insert, select
+    from app.auth import new_api_token
+    from app.db import engine
+    from app.migrations import run_migrations
+    from app.models import ApiToken, Rota
+
+    run_migrations(engine)
+    generate(engine, **SCALES[scale])
+    token, token_hash = new_api_token()
+    with engine.begin() as conn:
+        conn.execute(insert(ApiToken.__table__).values(name="load test", token_hash=token_hash, active=True))
+        rota_ids = list(conn.execute(select(Rota.id).where(Rota.active == True).order_by(Rota.id)).scalars())
+    return token, rota_ids
+
+
+def _handler_time(token: str, rota_id: int, repeat: int = 2000) -> float:
+    """Median in-process time of the /api/oncall/now handler body, in ms."""
+    from starlette.requests import Request
+    from app.db import SessionLocal
+    from app.routers.api import _oncall_response
+
+    request = Request(
+        {"type": "http", "method": "GET", "path": "/", "headers": [(b"authorization", f"Bearer {token}".encode())]}
+    )
+    timings = []
+    db = SessionLocal()
+    try:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            _oncall_response(db, request, rota_id, None)
+            timings.append(time.perf_counter() - t0)
+    finally:
+        db.close()
+    return statistics.median(timings) * 1000
+
+
+async def _run(url: str, token: str, rota_ids: list[int], clients: int, seconds: float) -> None:
+    from app.utils import now_local
+
+    today = now_local().date()
+    paths = []
+    for i, rota_id in enumerate(rota_ids):
+        paths.append(("now", f"/api/oncall/now?rota_id={rota_id}"))
+        day = today + timedelta(days=i % 14)
+        paths.append(("by date", f"/api/oncall?rota_id={rota_id}&date={day.isoformat()}"))
+
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies: dict[str, list[float]] = {"now": [], "by date": []}
+    server: list[float] = []
+    errors = 0
+    async with httpx.AsyncClient(base_url=url, limits=limits, headers=headers, timeout=60) as client:
+        deadline = time.perf_counter() + seconds
+
+        async def worker(n: int) -> None:
+            nonlocal errors
+            i = n
+            while time.perf_counter() < deadline:
+                name, path = paths[i % len(paths)]
+                i += 1
+                t0 = time.perf_counter()
+                try:
+                    resp = await client.get(path)
+                    ok = resp.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if not ok:
+                    errors += 1
+                    continue
+                latencies[name].append(time.perf_counter() - t0)
+                m = _TOTAL.search(resp.headers.get("server-timing", ""))
+                if m:
+                    server.append(float(m.group(1)) / 1000)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(clients)))
+        elapsed = time.perf_counter() - t0
+
+    total = sum(len(v) for v in latencies.values())
+    print(f"clients={clients} seconds={elapsed:.1f} requests={total} ({total / elapsed:.0f}/s) errors={errors}")
+    for name, values in latencies.items():
+        if values:
+            print(
+                f"  {name:10s} n={len(values):6d}  p50 {_percentile(values, 0.50) * 1000:7.2f} ms"
+                f"  p99 {_percentile(values, 0.99) * 1000:7.2f} ms"
+            )
+    if server:
+        print(
+            f"  {'server':10s} n={len(server):6d}  p50 {_percentile(server, 0.50) * 1000:7.2f} ms"
+            f"  p99 {_percentile(server, 0.99) * 1000:7.2f} ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=20)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "oncall.db")
+    os.environ["APP_UPDATE_CHECK"] = "0"
+    os.environ.setdefault("APP_SLOW_REQUEST_MS", "0")
+    token, rota_ids = _prepare(db_path, args.scale)
+    if not rota_ids:
+        sys.exit("no active rotas")
+
+    _handler_time(token, rota_ids[0], 50)  # warm the caches
+    print(f"handler (in-process) median {_handler_time(token, rota_ids[0]) * 1000:.1f} us")
+
+    port = _free_port()
+    env = {**os.environ, "APP_DB_PATH": db_path}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        url = f"http://127.0.0.1:{port}"
+        for _ in range(100):
+            try:
+                httpx.get(url + "/login", timeout=1)
+                break
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        asyncio.run(_run(url, token, rota_ids, args.clients, args.seconds))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
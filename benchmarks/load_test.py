@@ -0,0 +1,157 @@
+"""
+Load test: N concurrent clients hammering the read-heavy pages of a real
+uvicorn server, reporting p50/p99 latency per path.
+
+Run from the repo root. By default a throwaway server is started on a
+seeded SQLite database; pass --url to target an existing deployment
+(with --email/--password for a login on it).
+
+    python -m benchmarks.load_test --clients 200 --seconds 20
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import httpx
+
+PATHS = ["/", "/rota", "/time-off"]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _seed(db_path: str, n_staff: int, n_shift_types: int) -> None:
+    os.environ["APP_DB_PATH"] = db_path
+    from app.db import SessionLocal, engine
+    from app.models import Base, Rota, ShiftType, Staff, RotaEntry, TimeOff
+    from app.utils import start_of_week
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        rota = Rota(name="Load test", active=True)
+        db.add(rota)
+        db.flush()
+        db.add_all(Staff(full_name=f"Staff {i:04d}", phone=str(i)) for i in range(n_staff))
+        db.add_all(ShiftType(rota_id=rota.id, name=f"Shift {i:02d}") for i in range(n_shift_types))
+        db.flush()
+        staff_ids = [i for (i,) in db.query(Staff.id)]
+        st_ids = [i for (i,) in db.query(ShiftType.id)]
+        week = start_of_week(date.today())
+        db.add_all(
+            RotaEntry(rota_id=rota.id, shift_date=week + timedelta(days=d), shift_type_id=st,
+                      staff_id=staff_ids[(d * 7 + i) % len(staff_ids)])
+            for d in range(7)
+            for i, st in enumerate(st_ids)
+        )
+        db.add_all(
+            TimeOff(staff_id=sid, start_date=week, end_date=week + timedelta(days=3))
+            for sid in staff_ids[::5]
+        )
+        db.commit()
+    finally:
+        db.close()
+    engine.dispose()
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+async def _run(url: str, email: str, password: str, clients: int, seconds: float) -> None:
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        r = await client.post("/login", data={"email": email, "password": password})
+        if "oncall_session" not in client.cookies:
+            sys.exit(f"login failed ({r.status_code})")
+
+        latencies: dict[str, list[float]] = {p: [] for p in PATHS}
+        errors = 0
+        deadline = time.perf_counter() + seconds
+
+        async def worker(n: int) -> None:
+            nonlocal errors
+            i = n
+            while time.perf_counter() < deadline:
+                path = PATHS[i % len(PATHS)]
+                i += 1
+                t0 = time.perf_counter()
+                try:
+                    resp = await client.get(path)
+                    ok = resp.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies[path].append(time.perf_counter() - t0)
+                else:
+                    errors += 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(clients)))
+        elapsed = time.perf_counter() - t0
+
+    total = sum(len(v) for v in latencies.values())
+    print(f"clients={clients} seconds={elapsed:.1f} requests={total} ({total / elapsed:.0f}/s) errors={errors}")
+    for path, values in latencies.items():
+        if values:
+            print(
+                f"  {path:10s} n={len(values):6d}  p50 {_percentile(values, 0.50) * 1000:7.1f} ms"
+                f"  p99 {_percentile(values, 0.99) * 1000:7.1f} ms"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url")
+    parser.add_argument("--email", default="load@example.com")
+    parser.add_argument("--password", default="load")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--staff", type=int, default=100)
+    parser.add_argument("--shift-types", type=int, default=6)
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(_run(args.url, args.email, args.password, args.clients, args.seconds))
+        return
+
+    db_path = os.path.join(tempfile.mkdtemp(), "load.db")
+    _seed(db_path, args.staff, args.shift_types)
+    port = _free_port()
+    env = {
+        **os.environ,
+        "APP_DB_PATH": db_path,
+        "APP_BOOTSTRAP_ADMIN_EMAIL": args.email,
+        "APP_BOOTSTRAP_ADMIN_PASSWORD": args.password,
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        url = f"http://127.0.0.1:{port}"
+        for _ in range(100):
+            try:
+                httpx.get(url + "/login", timeout=1)
+                break
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        asyncio.run(_run(url, args.email, args.password, args.clients, args.seconds))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
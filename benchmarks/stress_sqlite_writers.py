@@ -0,0 +1,98 @@
+"""
+Concurrent write stress test: N threads, each with its own SQLite
+connection, repeatedly read then upsert rota entries and commit (the shape
+of /rota/assign). Reports any "database is locked" failures.
+
+Run from the repo root (uses a throwaway SQLite database, or APP_DB_URL
+if set, which should point at an empty database); the APP_SQLITE_*
+environment variables are honoured, e.g. to compare against the old
+rollback-journal setup:
+    python -m benchmarks.stress_sqlite_writers [writers] [commits_each]
+    APP_SQLITE_JOURNAL_MODE=DELETE APP_SQLITE_SYNCHRONOUS=FULL \\
+    APP_SQLITE_BUSY_TIMEOUT_MS=5000 python -m benchmarks.stress_sqlite_writers
+"""
+from __future__ import annotations
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+os.environ["APP_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "stress.db")
+
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import NullPool  # noqa: E402
+
+from app.db import create_app_engine, get_db_url, get_sqlite_pragmas, is_sqlite  # noqa: E402
+from app.models import Base, Rota, ShiftType, Staff, RotaEntry  # noqa: E402
+from app.assignments import upsert_assignments  # noqa: E402
+
+
+def main(writers: int = 50, commits_each: int = 20) -> None:
+    # NullPool: every session gets its own connection, so all writers
+    # really do contend for the database lock at once.
+    eng = create_app_engine(poolclass=NullPool)
+    Base.metadata.create_all(bind=eng)
+    Session = sessionmaker(bind=eng, autoflush=False)
+
+    with Session() as db:
+        db.add(Rota(id=1, name="Stress"))
+        db.add_all(ShiftType(id=i, rota_id=1, name=f"S{i}") for i in range(1, 7))
+        db.add_all(Staff(id=i, full_name=f"Staff {i}") for i in range(1, 51))
+        db.commit()
+
+    errors: list[str] = []
+    barrier = threading.Barrier(writers)
+    start_day = date(2026, 1, 1)
+
+    def writer(n: int) -> None:
+        barrier.wait()
+        for i in range(commits_each):
+            db = Session()
+            try:
+                db.query(RotaEntry.id).filter(RotaEntry.rota_id == 1).limit(1).all()
+                upsert_assignments(
+                    db,
+                    [
+                        {
+                            "rota_id": 1,
+                            "shift_date": start_day + timedelta(days=(n * commits_each + i) % 365),
+                            "shift_type_id": 1 + (n + i) % 6,
+                            "staff_id": 1 + n % 50,
+                            "notes": f"w{n}",
+                        }
+                    ],
+                )
+                db.commit()
+            except OperationalError as e:
+                errors.append(str(e.orig))
+                db.rollback()
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    total = writers * commits_each
+    if is_sqlite(get_db_url()):
+        print(f"pragmas={get_sqlite_pragmas()}")
+    else:
+        print(f"backend={eng.dialect.name}")
+    print(f"writers={writers} commits={total} elapsed={elapsed:.2f}s ({total / elapsed:.0f} commits/s)")
+    print(f"lock errors: {len(errors)}")
+    for msg in sorted(set(errors))[:5]:
+        print(f"  {msg}")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*args)
@@ -0,0 +1,252 @@
+"""
+Request-level benchmark suite: times the main pages through the ASGI app
+on a generated data set and records how many SQL statements each request
+issues. Results are written as JSON so two runs (say, two releases) can
+be diffed.
+
+Run from the repo root:
+    python -m benchmarks.suite --scale medium --out before.json
+    python -m benchmarks.suite --scale medium --out after.json --compare before.json
+
+--db reuses a database file between runs; it is generated on first use.
+--compare exits non-zero when a request got more than --threshold slower
+(median) or issues more queries than in the baseline.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.generator import SCALES, generate
+
+EMAIL = "bench@example.com"
+PASSWORD = "bench"
+
+
+def _configure(db_path: str) -> None:
+    # Must happen before anything imports app.db
+    os.environ["APP_DB_PATH"] = db_path
+    os.environ["APP_BOOTSTRAP_ADMIN_EMAIL"] = EMAIL
+    os.environ["APP_BOOTSTRAP_ADMIN_PASSWORD"] = PASSWORD
+    os.environ["APP_UPDATE_CHECK"] = "0"
+    # Keep request logging out of the JSON report on stdout
+    os.environ.setdefault("APP_SLOW_REQUEST_MS", "0")
+    os.environ.setdefault("APP_N_PLUS_ONE_THRESHOLD", "0")
+
+
+class QueryCounter:
+    """Counts statements sent to any engine (sync or async) while active."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def install(self) -> None:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        event.listen(Engine, "before_cursor_execute", self)
+
+
+def _cases(rota_id: int, shift_type_id: int, staff_ids: list[int], today: date) -> list[dict]:
+    week = today - timedelta(days=today.weekday())
+    assign_day = week + timedelta(days=2)
+    n = len(staff_ids)
+    return [
+        {"name": "dashboard", "method": "GET", "path": "/"},
+        {"name": "rota week", "method": "GET", "path": f"/rota?rota_id={rota_id}&week={week.isoformat()}"},
+        {
+            "name": "rota range 4 weeks",
+            "method": "GET",
+            "path": f"/rota/range?rota_id={rota_id}&start={week.isoformat()}"
+            f"&end={(week + timedelta(days=27)).isoformat()}",
+        },
+        {
+            "name": "rota assign",
+            "method": "POST",
+            "path": "/rota/assign",
+            # Cycle through staff so every iteration is a real write
+            "data": lambda i: {
+                "rota_id": rota_id,
+                "shift_date": assign_day.isoformat(),
+                "shift_type_id": shift_type_id,
+                "staff_id": str(staff_ids[i % n]) if n else "",
+            },
+        },
+        {"name": "time off", "method": "GET", "path": "/time-off"},
+        {"name": "staff", "method": "GET", "path": "/staff"},
+        {"name": "users", "method": "GET", "path": "/users"},
+    ]
+
+
+def _run_case(client, counter: QueryCounter, case: dict, repeat: int, warmup: int) -> dict:
+    timings: list[float] = []
+    queries: list[int] = []
+    status = None
+    size = 0
+    for i in range(warmup + repeat):
+        kwargs = {"follow_redirects": False}
+        if "data" in case:
+            kwargs["data"] = case["data"](i)
+        counter.count = 0
+        t0 = time.perf_counter()
+        r = client.request(case["method"], case["path"], **kwargs)
+        elapsed = time.perf_counter() - t0
+        if i >= warmup:
+            timings.append(elapsed)
+            queries.append(counter.count)
+        status, size = r.status_code, len(r.content)
+
+    timings.sort()
+    return {
+        "method": case["method"],
+        "path": case["path"],
+        "status": status,
+        "bytes": size,
+        "n": len(timings),
+        "min_ms": round(timings[0] * 1000, 3),
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 3),
+        "mean_ms": round(statistics.fmean(timings) * 1000, 3),
+        "queries": max(queries),
+    }
+
+
+def run(db_path: str, scale: str, seed: int, repeat: int, warmup: int) -> dict:
+    _configure(db_path)
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func, select
+    import sqlalchemy
+
+    from app.db import engine
+    from app.main import app
+    from app.migrations import run_migrations
+    from app.models import Rota, RotaEntry, ShiftType, Staff
+    from app.version import APP_VERSION, APP_BUILD
+
+    run_migrations(engine)
+    with engine.connect() as conn:
+        seeded = conn.execute(select(func.count()).select_from(RotaEntry.__table__)).scalar()
+    generated = None
+    if not seeded:
+        t0 = time.perf_counter()
+        generated = generate(engine, seed, **SCALES[scale])
+        print(f"generated {scale} data set in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+    # Benchmark the rota with the most history, as the worst case
+    with engine.connect() as conn:
+        rota_id = conn.execute(
+            select(RotaEntry.rota_id)
+            .join(Rota, Rota.id == RotaEntry.rota_id)
+            .where(Rota.active == True)
+            .group_by(RotaEntry.rota_id)
+            .order_by(func.count().desc(), RotaEntry.rota_id)
+            .limit(1)
+        ).scalar()
+        shift_type_id = conn.execute(
+            select(ShiftType.id).where(ShiftType.rota_id == rota_id).order_by(ShiftType.id).limit(1)
+        ).scalar()
+        staff_ids = list(
+            conn.execute(select(Staff.id).where(Staff.active == True).order_by(Staff.id).limit(50)).scalars()
+        )
+
+    counter = QueryCounter()
+    counter.install()
+
+    results = {}
+    with TestClient(app) as client:
+        r = client.post("/login", data={"email": EMAIL, "password": PASSWORD}, follow_redirects=False)
+        if "oncall_session" not in r.cookies:
+            sys.exit(f"login failed ({r.status_code})")
+        client.cookies.set("oncall_session", r.cookies["oncall_session"])
+
+        for case in _cases(rota_id, shift_type_id, staff_ids, date.today()):
+            results[case["name"]] = _run_case(client, counter, case, repeat, warmup)
+            print(f"  {case['name']:20s} {results[case['name']]['median_ms']:9.2f} ms", file=sys.stderr)
+
+    with engine.connect() as conn:
+        sizes = {
+            table.name: conn.execute(select(func.count()).select_from(table)).scalar()
+            for table in (Rota.__table__, ShiftType.__table__, Staff.__table__, RotaEntry.__table__)
+        }
+
+    return {
+        "meta": {
+            "app_version": APP_VERSION,
+            "app_build": APP_BUILD,
+            "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "platform": platform.platform(),
+            "database": engine.dialect.name,
+            "scale": scale,
+            "seed": seed,
+            "generated": generated,
+            "rows": sizes,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> int:
+    """Print median/query deltas against a baseline; returns the number of regressions."""
+    regressions = 0
+    print(f"{'request':20s} {'baseline':>10s} {'current':>10s} {'change':>8s} {'queries':>9s}")
+    for name, cur in report["results"].items():
+        base = baseline["results"].get(name)
+        if not base:
+            print(f"{name:20s} {'-':>10s} {cur['median_ms']:8.2f}ms {'new':>8s} {cur['queries']:>9d}")
+            continue
+        change = cur["median_ms"] / base["median_ms"] - 1 if base["median_ms"] else 0.0
+        slower = change > threshold
+        more_queries = cur["queries"] > base["queries"]
+        regressions += slower or more_queries
+        print(
+            f"{name:20s} {base['median_ms']:8.2f}ms {cur['median_ms']:8.2f}ms {change:+7.0%}"
+            f" {base['queries']:>4d}->{cur['queries']:<4d}"
+            + ("  REGRESSION" if slower or more_queries else "")
+        )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", help="database file to use (generated if empty)")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="baseline JSON report to diff against")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), "suite.db")
+    report = run(db_path, args.scale, args.seed, args.repeat, args.warmup)
+
+    text = json.dumps(report, indent=2, default=str)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    elif not args.compare:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()